@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
+from core.paginacao import AdminEscalavelMixin
 from .models import Usuario
 
 
 @admin.register(Usuario)
-class UsuarioAdmin(BaseUserAdmin):
+class UsuarioAdmin(AdminEscalavelMixin, BaseUserAdmin):
     """
     Classe personalizada para gerenciamento de usuários no admin do Django
     """
@@ -15,8 +16,9 @@ class UsuarioAdmin(BaseUserAdmin):
     list_filter = ['is_staff', 'is_active', 'date_joined', 'is_superuser']
     search_fields = ['username', 'email', 'first_name', 'last_name']
     
-    # Ordenação padrão
+    # Ordenação padrão (também a chave do keyset: core/paginacao.py)
     ordering = ['-date_joined']
+    campo_keyset = '-date_joined'
     
     # Configuração dos fieldsets (seções do formulário de edição)
     fieldsets = (
@@ -35,13 +37,13 @@ class UsuarioAdmin(BaseUserAdmin):
             'classes': ('collapse',)
         }),
         (_('Datas Importantes'), {
-            'fields': ('last_login', 'date_joined', 'criado_em', 'atualizado_em'),
+            'fields': ('last_login', 'date_joined', 'criado_em', 'atualizado_em', 'excluido_em'),
             'classes': ('collapse',)
         }),
     )
     
     # Campos somente leitura
-    readonly_fields = ('date_joined', 'last_login', 'criado_em', 'atualizado_em')
+    readonly_fields = ('date_joined', 'last_login', 'criado_em', 'atualizado_em', 'excluido_em')
     
     # Fieldsets para criação de novo usuário
     add_fieldsets = (
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+Usuario = get_user_model()
+
+
+class EmailOuUsernameBackend(ModelBackend):
+    """
+    Login pelo username ou pelo email institucional.
+
+    Com '@' tenta primeiro o email (sem diferenciar maiúsculas, pelo índice
+    único em lower(email)) e, se não achar, o username, que também pode conter '@'.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Usuario.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        usuario = None
+        if '@' in username:
+            usuario = Usuario._default_manager.por_identidade('email', [username]).first()
+        if usuario is None:
+            usuario = Usuario._default_manager.filter(username=username).first()
+        if usuario is None:
+            # Mesmo custo de hash de quando o usuário existe (não revela quem está cadastrado)
+            Usuario().set_password(password)
+            return None
+        if usuario.check_password(password) and self.user_can_authenticate(usuario):
+            return usuario
+        return None
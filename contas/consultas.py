@@ -0,0 +1,14 @@
+"""Consultas quentes de contas, analisadas pelo comando `analisar_consultas`."""
+from core.consultas import consulta, queryset_da_view
+
+from .views import ListarUsuariosView
+
+
+@consulta('contas.usuarios', 'GET /api/contas/usuarios/')
+def usuarios(contexto):
+    return queryset_da_view(ListarUsuariosView, contexto)
+
+
+@consulta('contas.usuarios_ativos', 'GET /api/contas/usuarios/?is_active=true')
+def usuarios_ativos(contexto):
+    return queryset_da_view(ListarUsuariosView, contexto, {'is_active': 'true'})
@@ -0,0 +1,21 @@
+"""Leitor do caminho rápido (core/leitura.py) para a listagem de usuários."""
+from core.leitura import Leitor, data_hora
+
+
+class LeitorUsuarios(Leitor):
+    """Espelha UsuarioSerializer."""
+
+    colunas = ('id', 'username', 'email', 'saldo_moedas', 'is_staff', 'is_active', 'date_joined')
+
+    @staticmethod
+    def linha(id, username, email, saldo_moedas, is_staff, is_active, date_joined):
+        return {
+            'id': id,
+            'username': username,
+            'email': email,
+            'saldo_moedas': saldo_moedas,
+            'is_staff': is_staff,
+            'is_active': is_active,
+            'role': "Admin" if is_staff else "Usuário",
+            'date_joined': data_hora(date_joined),
+        }
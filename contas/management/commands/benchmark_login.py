@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.hashers import Argon2Configuravel, ScryptConfiguravel, memoria_por_hash
+
+# chave curta do --config -> setting
+PARAMETROS = {
+    'argon2': {'t': 'SENHA_ARGON2_TEMPO', 'm': 'SENHA_ARGON2_MEMORIA_KIB', 'p': 'SENHA_ARGON2_PARALELISMO'},
+    'scrypt': {'n': 'SENHA_SCRYPT_N', 'r': 'SENHA_SCRYPT_R', 'p': 'SENHA_SCRYPT_P'},
+    'pbkdf2': {'i': None},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede logins/s por worker (verificação de senha, que domina o custo do login) "
+        "para cada configuração de hash. Sem --config mede as settings atuais de cada algoritmo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config', action='append', default=[],
+            help="Configuração a medir, repetível: 'argon2:t=2,m=19456,p=1', 'scrypt:n=16384,r=8,p=1', 'pbkdf2:i=1000000'.",
+        )
+        parser.add_argument('--segundos', type=float, default=2.0, help="Tempo mínimo medindo cada configuração (padrão: 2).")
+
+    def handle(self, *args, **options):
+        if options['segundos'] <= 0:
+            raise CommandError("--segundos deve ser maior que zero.")
+        configuracoes = [self._interpretar(c) for c in options['config']] or self._padrao()
+
+        self.stdout.write(f"Algoritmo atual: {settings.SENHA_ALGORITMO}. Um processo, sem banco (= um worker síncrono).")
+        for algoritmo, valores in configuracoes:
+            rotulo = f"{algoritmo}:" + ','.join(f"{k}={v}" for k, v in valores.items())
+            try:
+                with override_settings(**self._settings(algoritmo, valores)):
+                    hasher = self._hasher(algoritmo, valores)
+                    hash_ms, por_segundo = self._medir(hasher, options['segundos'])
+                    memoria = memoria_por_hash(hasher) / 2 ** 20
+            except ValueError as erro:
+                # Ex.: argon2-cffi não instalado
+                self.stdout.write(self.style.WARNING(f"  {rotulo:<36} indisponível: {erro}"))
+                continue
+            self.stdout.write(
+                f"  {rotulo:<36} {por_segundo:8.1f} logins/s por worker | "
+                f"{hash_ms:7.1f} ms por hash | {memoria:5.1f} MiB por login simultâneo"
+            )
+
+    def _padrao(self):
+        return [
+            ('argon2', {'t': settings.SENHA_ARGON2_TEMPO, 'm': settings.SENHA_ARGON2_MEMORIA_KIB,
+                        'p': settings.SENHA_ARGON2_PARALELISMO}),
+            ('scrypt', {'n': settings.SENHA_SCRYPT_N, 'r': settings.SENHA_SCRYPT_R, 'p': settings.SENHA_SCRYPT_P}),
+            ('pbkdf2', {'i': PBKDF2PasswordHasher.iterations}),
+        ]
+
+    def _interpretar(self, texto):
+        algoritmo, _, resto = texto.partition(':')
+        if algoritmo not in PARAMETROS:
+            raise CommandError(f"Algoritmo desconhecido em --config '{texto}'. Use: {', '.join(PARAMETROS)}.")
+        valores = {}
+        for par in filter(None, resto.split(',')):
+            chave, _, valor = par.partition('=')
+            if chave not in PARAMETROS[algoritmo] or not valor.isdigit() or int(valor) < 1:
+                raise CommandError(f"Parâmetro inválido '{par}' em --config '{texto}'.")
+            valores[chave] = int(valor)
+        return algoritmo, valores
+
+    def _settings(self, algoritmo, valores):
+        return {PARAMETROS[algoritmo][k]: v for k, v in valores.items() if PARAMETROS[algoritmo][k]}
+
+    def _hasher(self, algoritmo, valores):
+        if algoritmo == 'argon2':
+            return Argon2Configuravel()
+        if algoritmo == 'scrypt':
+            return ScryptConfiguravel()
+        hasher = PBKDF2PasswordHasher()
+        if 'i' in valores:
+            hasher.iterations = valores['i']
+        return hasher
+
+    def _medir(self, hasher, segundos):
+        senha = 'SenhaDeBenchmark123'
+        inicio = time.perf_counter()
+        codificado = hasher.encode(senha, hasher.salt())
+        hash_ms = (time.perf_counter() - inicio) * 1000
+
+        logins = 0
+        inicio = time.perf_counter()
+        while True:
+            if not hasher.verify(senha, codificado):
+                raise CommandError(f"{hasher.algorithm}: verificação falhou.")
+            logins += 1
+            decorrido = time.perf_counter() - inicio
+            if decorrido >= segundos and logins >= 3:
+                return hash_ms, logins / decorrido
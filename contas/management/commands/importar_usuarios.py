@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contas.services import ImportacaoUsuariosService
+
+
+class Command(BaseCommand):
+    help = "Importa usuários em massa a partir de um CSV com as colunas username,email,password."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do CSV de entrada.")
+        parser.add_argument('--lote', type=int, default=500, help="Usuários por lote de inserção (padrão: 500).")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Processos para o hash das senhas (padrão: nº de CPUs; 0 = no próprio processo).",
+        )
+        parser.add_argument('--rejeitados', help="Grava as linhas rejeitadas, com o motivo, neste CSV.")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote deve ser maior que zero.")
+
+        try:
+            linhas = ImportacaoUsuariosService.ler_csv(options['arquivo'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{len(linhas)} linha(s) lida(s) de {options['arquivo']}.")
+        inicio = time.monotonic()
+
+        def progresso(processadas, total):
+            self.stdout.write(f"  {processadas}/{total} processada(s)")
+
+        resultado = ImportacaoUsuariosService.importar(
+            linhas, lote=options['lote'], workers=options['workers'], progresso=progresso
+        )
+
+        rejeitados = resultado['rejeitados']
+        for r in rejeitados[:20]:
+            self.stdout.write(self.style.WARNING(f"  linha {r['linha']} ({r['username'] or '-'}): {r['motivo']}"))
+        if len(rejeitados) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... e mais {len(rejeitados) - 20} linha(s) rejeitada(s)."))
+
+        if options['rejeitados'] and rejeitados:
+            ImportacaoUsuariosService.escrever_rejeitados(options['rejeitados'], rejeitados)
+            self.stdout.write(f"Linhas rejeitadas gravadas em {options['rejeitados']}.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['criados']} usuário(s) criado(s), {len(rejeitados)} rejeitado(s) "
+            f"em {time.monotonic() - inicio:.1f}s."
+        ))
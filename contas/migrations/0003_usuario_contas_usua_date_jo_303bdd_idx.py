@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contas', '0002_alter_usuario_options_usuario_atualizado_em_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['date_joined'], name='contas_usua_date_jo_303bdd_idx'),
+        ),
+    ]
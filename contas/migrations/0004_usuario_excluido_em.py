@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0003_usuario_contas_usua_date_jo_303bdd_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='excluido_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Excluído em'),
+        ),
+    ]
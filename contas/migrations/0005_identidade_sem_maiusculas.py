@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:35
+
+import contas.models
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def verificar_duplicados(apps, schema_editor):
+    """Os índices únicos em lower() falhariam sem dizer quem: aponta as contas a unificar antes."""
+    Usuario = apps.get_model('contas', 'Usuario')
+    for campo in ('username', 'email'):
+        duplicados = list(
+            Usuario.objects.exclude(**{campo: ''}).annotate(valor=Lower(campo))
+            .values('valor').annotate(total=Count('id')).filter(total__gt=1)
+            .values_list('valor', flat=True)[:20]
+        )
+        if duplicados:
+            raise RuntimeError(
+                f"{campo} repetido(s) ignorando maiúsculas: {', '.join(duplicados)}. "
+                "Unifique ou renomeie essas contas antes de migrar."
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contas', '0004_usuario_excluido_em'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='usuario',
+            managers=[
+                ('objects', contas.models.UsuarioManager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='usuario',
+            name='contas_usua_usernam_5d97a6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='usuario',
+            name='contas_usua_email_fc5f4a_idx',
+        ),
+        migrations.RunPython(verificar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usuario',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='contas_usuario_username_lower_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='usuario',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='contas_usuario_email_lower_uniq'),
+        ),
+    ]
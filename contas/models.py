@@ -1,5 +1,24 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models.functions import Lower
+
+
+class UsuarioQuerySet(models.QuerySet):
+    def por_identidade(self, campo, valores):
+        """
+        Usuários cujo `campo` ('username' ou 'email') está em `valores`, sem
+        diferenciar maiúsculas. Filtra por lower(campo), a expressão dos índices
+        únicos; no email repete a condição do índice parcial (só preenchidos).
+        """
+        qs = self.annotate(_identidade=Lower(campo)).filter(_identidade__in=[v.lower() for v in valores])
+        if campo == 'email':
+            qs = qs.exclude(email='')
+        return qs
+
+
+class UsuarioManager(UserManager.from_queryset(UsuarioQuerySet)):
+    pass
+
 
 class Usuario(AbstractUser):
     #abstractuser já tem username, email, password, first_name, last_name
@@ -8,15 +27,25 @@ class Usuario(AbstractUser):
     saldo_moedas = models.IntegerField(default=0, verbose_name="Saldo de Moedas")
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    # Exclusão agendada: o usuário some da API e os dados são removidos em segundo plano
+    excluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Excluído em")
+
+    objects = UsuarioManager()
 
     class Meta:
         ordering = ['-date_joined']
         verbose_name = "Usuário"
         verbose_name_plural = "Usuários"
         indexes = [
-            models.Index(fields=['username']),
-            models.Index(fields=['email']),
             models.Index(fields=['is_staff']),
+            models.Index(fields=['date_joined']),
+        ]
+        constraints = [
+            # Cadastro, perfil e login comparam sem diferenciar maiúsculas (por_identidade)
+            models.UniqueConstraint(Lower('username'), name='contas_usuario_username_lower_uniq'),
+            models.UniqueConstraint(
+                Lower('email'), condition=~models.Q(email=''), name='contas_usuario_email_lower_uniq',
+            ),
         ]
 
     def __str__(self):
@@ -4,12 +4,25 @@ from doacoes.serializers import BadgeSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
+from core.campos import CamposDinamicosMixin
 
 Usuario = get_user_model()
+
+
+def _erros_de_identidade(dados, exceto=None):
+    """Erros por campo para o IntegrityError dos índices únicos em lower(username)/lower(email)."""
+    erros = {}
+    for campo in ("username", "email"):
+        valor = dados.get(campo)
+        if valor and Usuario.objects.por_identidade(campo, [valor]).exclude(pk=exceto).exists():
+            erros[campo] = [f"{campo.capitalize()} já está em uso."]
+    return erros or {"non_field_errors": ["Username ou email já está em uso."]}
+
 class EcoTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -41,16 +54,23 @@ class MeuPerfilSerializer(serializers.ModelSerializer):
         if not value.lower().endswith("@ufrpe.br"):
             raise serializers.ValidationError("O email deve ser institucional da UFRPE (@ufrpe.br).")
         user = self.context["request"].user
-        if Usuario.objects.filter(email__iexact=value).exclude(pk=user.pk).exists():
+        if Usuario.objects.por_identidade("email", [value]).exclude(pk=user.pk).exists():
             raise serializers.ValidationError("Email já está em uso.")
         return value
 
     def validate_username(self, value):
         user = self.context["request"].user
-        if Usuario.objects.filter(username__iexact=value).exclude(pk=user.pk).exists():
+        if Usuario.objects.por_identidade("username", [value]).exclude(pk=user.pk).exists():
             raise serializers.ValidationError("Username já está em uso.")
         return value
 
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(_erros_de_identidade(validated_data, exceto=instance.pk))
+
 class AlterarSenhaSerializer(serializers.Serializer):
     senha_atual = serializers.CharField(write_only=True)
     nova_senha = serializers.CharField(write_only=True)
@@ -72,7 +92,9 @@ class AlterarSenhaSerializer(serializers.Serializer):
         user.save(update_fields=["password"])
         return user
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    colunas_por_campo = {'role': ['is_staff']}
+
     role = serializers.SerializerMethodField()
     
     class Meta:
@@ -91,7 +113,7 @@ class CadastroSerializer(serializers.ModelSerializer):
     def validate_email(self, value):
         if not value.lower().endswith("@ufrpe.br"):
             raise serializers.ValidationError("O email deve ser institucional da UFRPE (@ufrpe.br).")
-        if Usuario.objects.filter(email__iexact=value).exists():
+        if Usuario.objects.por_identidade("email", [value]).exists():
             raise serializers.ValidationError("Email já está em uso.")
         return value
 
@@ -101,13 +123,17 @@ class CadastroSerializer(serializers.ModelSerializer):
             except DjangoValidationError as e:
                 raise serializers.ValidationError({"password": e.messages})
             username = attrs.get("username")
-            if username and Usuario.objects.filter(username__iexact=username).exists():
+            if username and Usuario.objects.por_identidade("username", [username]).exists():
                 raise serializers.ValidationError({"username": "Username já está em uso."})
             return attrs
 
     def create(self, validated_data):
-        usuario = Usuario.objects.create_user(**validated_data)
-        return usuario
+        try:
+            with transaction.atomic():
+                return Usuario.objects.create_user(**validated_data)
+        except IntegrityError:
+            # Outro cadastro com o mesmo username/email passou pela validação ao mesmo tempo
+            raise serializers.ValidationError(_erros_de_identidade(validated_data))
 
 class DashboardUsuarioSerializer(serializers.ModelSerializer):
     badges_conquistados = BadgeSerializer(many=True, read_only=True, source='badges_conquistados.badge')
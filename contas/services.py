@@ -0,0 +1,301 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+from core.tarefas import batimento, enfileirar, reabrir
+from doacoes.models import AssinaturaImagem, Doacao, DoacaoArquivada, UsuarioBadge
+
+Usuario = get_user_model()
+
+DOMINIO_INSTITUCIONAL = "@ufrpe.br"
+
+
+def _inicializar_worker():
+    """Garante o Django configurado nos processos filhos (start method 'spawn')."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+        django.setup()
+
+
+class ImportacaoUsuariosService:
+    """
+    Provisionamento em massa de usuários a partir de um CSV (username,email,password).
+
+    A validação de unicidade é feita por conjuntos (uma consulta por bloco de
+    valores, não uma por linha), o hash das senhas roda em um pool de processos
+    (PBKDF2 é limitado por CPU) e a inserção usa bulk_create em lotes.
+    """
+
+    COLUNAS = ('username', 'email', 'password')
+    TAMANHO_CONSULTA = 1000
+
+    @staticmethod
+    def ler_csv(caminho):
+        with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+            leitor = csv.DictReader(arquivo)
+            faltando = [c for c in ImportacaoUsuariosService.COLUNAS if c not in (leitor.fieldnames or [])]
+            if faltando:
+                raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}")
+            # A linha 1 é o cabeçalho
+            return [
+                {'linha': numero, **{c: (registro.get(c) or '').strip() for c in ImportacaoUsuariosService.COLUNAS}}
+                for numero, registro in enumerate(leitor, start=2)
+            ]
+
+    @staticmethod
+    def _existentes(campo, valores):
+        """Retorna o subconjunto (em minúsculas) de `valores` já cadastrado em `campo`."""
+        valores = list(valores)
+        existentes = set()
+        for inicio in range(0, len(valores), ImportacaoUsuariosService.TAMANHO_CONSULTA):
+            bloco = valores[inicio:inicio + ImportacaoUsuariosService.TAMANHO_CONSULTA]
+            existentes.update(
+                Usuario.objects.por_identidade(campo, bloco).values_list('_identidade', flat=True)
+            )
+        return existentes
+
+    @staticmethod
+    def _erros_de_campo(username, email):
+        """
+        Mensagens dos validadores dos campos do modelo (caracteres e tamanho do
+        username, formato do email), como no cadastro pela API; '' se válidos.
+        """
+        erros = []
+        for campo, valor in (
+            ('username', Usuario.normalize_username(username)),
+            ('email', Usuario.objects.normalize_email(email)),
+        ):
+            try:
+                Usuario._meta.get_field(campo).clean(valor, None)
+            except DjangoValidationError as e:
+                erros.extend(f"{campo}: {mensagem}" for mensagem in e.messages)
+        return " ".join(erros)
+
+    @staticmethod
+    def validar(linhas):
+        """Separa as linhas em (válidas, rejeitadas). Rejeitadas recebem a chave 'motivo'."""
+        validas, rejeitadas = [], []
+        usernames_vistos, emails_vistos = set(), set()
+
+        for linha in linhas:
+            username, email, senha = linha['username'], linha['email'], linha['password']
+            motivo = None
+            if not (username and email and senha):
+                motivo = "Campos username, email e password são obrigatórios."
+            elif erros := ImportacaoUsuariosService._erros_de_campo(username, email):
+                motivo = erros
+            elif not email.lower().endswith(DOMINIO_INSTITUCIONAL):
+                motivo = "O email deve ser institucional da UFRPE (@ufrpe.br)."
+            elif username.lower() in usernames_vistos:
+                motivo = "Username duplicado no arquivo."
+            elif email.lower() in emails_vistos:
+                motivo = "Email duplicado no arquivo."
+            else:
+                try:
+                    validate_password(senha, user=Usuario(username=username, email=email))
+                except DjangoValidationError as e:
+                    motivo = " ".join(e.messages)
+
+            if motivo:
+                rejeitadas.append({**linha, 'motivo': motivo})
+                continue
+            usernames_vistos.add(username.lower())
+            emails_vistos.add(email.lower())
+            validas.append(linha)
+
+        usernames_em_uso = ImportacaoUsuariosService._existentes('username', usernames_vistos)
+        emails_em_uso = ImportacaoUsuariosService._existentes('email', emails_vistos)
+
+        aceitas = []
+        for linha in validas:
+            if linha['username'].lower() in usernames_em_uso:
+                rejeitadas.append({**linha, 'motivo': "Username já está em uso."})
+            elif linha['email'].lower() in emails_em_uso:
+                rejeitadas.append({**linha, 'motivo': "Email já está em uso."})
+            else:
+                aceitas.append(linha)
+
+        rejeitadas.sort(key=lambda r: r['linha'])
+        return aceitas, rejeitadas
+
+    @staticmethod
+    def _instanciar(linha, senha_hash):
+        return Usuario(
+            username=Usuario.normalize_username(linha['username']),
+            email=Usuario.objects.normalize_email(linha['email']),
+            password=senha_hash,
+        )
+
+    @staticmethod
+    def _inserir_lote(linhas, hashes, rejeitadas):
+        usuarios = [ImportacaoUsuariosService._instanciar(l, h) for l, h in zip(linhas, hashes)]
+        try:
+            with transaction.atomic():
+                Usuario.objects.bulk_create(usuarios, batch_size=len(usuarios))
+            return len(usuarios)
+        except (IntegrityError, DataError):
+            pass
+
+        # Alguém se cadastrou entre a validação e a inserção (ou o banco recusou
+        # um valor): insere linha a linha para isolar apenas as linhas com problema.
+        criados = 0
+        for linha, usuario in zip(linhas, usuarios):
+            usuario.pk = None
+            try:
+                with transaction.atomic():
+                    usuario.save(force_insert=True)
+                criados += 1
+            except IntegrityError:
+                rejeitadas.append({**linha, 'motivo': "Username ou email já está em uso."})
+            except DataError as e:
+                rejeitadas.append({**linha, 'motivo': f"Valor recusado pelo banco: {e}"})
+        return criados
+
+    @staticmethod
+    def importar(linhas, lote=500, workers=None, progresso=None):
+        """
+        Importa as linhas já lidas do CSV.
+
+        `workers=0` calcula os hashes no próprio processo; `None` usa um processo
+        por CPU. `progresso(processadas, total)` é chamado ao fim de cada lote.
+        """
+        aceitas, rejeitadas = ImportacaoUsuariosService.validar(linhas)
+        total = len(aceitas)
+        criados = 0
+
+        executor = None
+        if workers != 0 and total:
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker)
+        try:
+            for inicio in range(0, total, lote):
+                bloco = aceitas[inicio:inicio + lote]
+                senhas = [l['password'] for l in bloco]
+                if executor:
+                    tamanho_tarefa = max(1, len(senhas) // (workers * 4))
+                    hashes = list(executor.map(make_password, senhas, chunksize=tamanho_tarefa))
+                else:
+                    hashes = [make_password(s) for s in senhas]
+                criados += ImportacaoUsuariosService._inserir_lote(bloco, hashes, rejeitadas)
+                if progresso:
+                    progresso(inicio + len(bloco), total)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        rejeitadas.sort(key=lambda r: r['linha'])
+        return {'criados': criados, 'rejeitados': rejeitadas}
+
+    @staticmethod
+    def escrever_rejeitados(caminho, rejeitadas):
+        with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=['linha', 'username', 'email', 'motivo'], extrasaction='ignore')
+            escritor.writeheader()
+            escritor.writerows(rejeitadas)
+
+
+class ExclusaoUsuarioService:
+    """
+    Exclusão de usuários em duas etapas.
+
+    A API só marca o usuário (excluido_em, is_active=False) e enfileira
+    `contas.purgar_usuario`. A tarefa remove os dados dependentes em lotes de
+    EXCLUSAO_USUARIO_LOTE linhas, cada lote em sua própria transação, para não
+    segurar bloqueios em Doacao; o DELETE final do usuário já não tem o que
+    cascatear. Se o worker cair, a tarefa é retomada de onde parou.
+    """
+
+    @staticmethod
+    def chave(usuario_id):
+        return f'purgar-usuario:{usuario_id}'
+
+    @staticmethod
+    def agendar(usuario):
+        """
+        Marca o usuário como excluído e devolve a Tarefa da purga (a mesma, se já
+        agendada). Uma purga que FALHOU volta à fila: pedir de novo é o retry.
+        """
+        if usuario.excluido_em is None:
+            usuario.excluido_em = timezone.now()
+            usuario.is_active = False
+            usuario.save(update_fields=['excluido_em', 'is_active'])
+        tarefa = enfileirar(
+            'contas.purgar_usuario', {'usuario_id': usuario.pk}, chave=ExclusaoUsuarioService.chave(usuario.pk)
+        )
+        return reabrir(tarefa)
+
+    @staticmethod
+    def _em_lotes(queryset, acao, lote):
+        """Aplica `acao(ids)` a blocos de até `lote` ids do queryset até esgotá-lo."""
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:lote])
+                if not ids:
+                    return total
+                acao(ids)
+            total += len(ids)
+            # Usuário com muito histórico pode passar do TAREFAS_TEMPO_LIMITE
+            batimento()
+
+    @staticmethod
+    def _excluir_com_imagens(modelo):
+        def acao(ids):
+            imagens = [
+                foto.public_id for foto in
+                modelo.objects.filter(pk__in=ids).values_list('evidencia_foto', flat=True)
+                if foto and getattr(foto, 'public_id', None)
+            ]
+            modelo.objects.filter(pk__in=ids).delete()
+            AssinaturaImagem.objects.filter(doacao_id__in=ids).delete()
+            if imagens:
+                # Na mesma transação do DELETE: sem exclusão confirmada, sem remoção de arquivo
+                enfileirar('doacoes.remover_imagens', {'public_ids': imagens},
+                           chave=f'remover-imagens:{modelo._meta.model_name}:{ids[0]}')
+        return acao
+
+    @staticmethod
+    def purgar(usuario_id, lote=None):
+        """Remove o usuário e seus dados. Retorna a contagem por tipo de linha."""
+        lote = lote or getattr(settings, 'EXCLUSAO_USUARIO_LOTE', 500)
+        em_lotes = ExclusaoUsuarioService._em_lotes
+        contagem = {
+            # update() não aciona o auto_now: atualizado_em é posto à mão para o
+            # modo ?since= reenviar as doações sem o validador
+            'validacoes': em_lotes(
+                Doacao.objects.filter(validado_por_id=usuario_id),
+                lambda ids: Doacao.objects.filter(pk__in=ids).update(
+                    validado_por=None, atualizado_em=timezone.now()
+                ), lote,
+            ),
+            'validacoes_arquivadas': em_lotes(
+                DoacaoArquivada.objects.filter(validado_por_id=usuario_id),
+                lambda ids: DoacaoArquivada.objects.filter(pk__in=ids).update(
+                    validado_por=None, atualizado_em=timezone.now()
+                ), lote,
+            ),
+            'badges': em_lotes(
+                UsuarioBadge.objects.filter(usuario_id=usuario_id),
+                lambda ids: UsuarioBadge.objects.filter(pk__in=ids).delete(), lote,
+            ),
+            'doacoes': em_lotes(
+                Doacao.objects.filter(doador_id=usuario_id),
+                ExclusaoUsuarioService._excluir_com_imagens(Doacao), lote,
+            ),
+            'doacoes_arquivadas': em_lotes(
+                DoacaoArquivada.objects.filter(doador_id=usuario_id),
+                ExclusaoUsuarioService._excluir_com_imagens(DoacaoArquivada), lote,
+            ),
+        }
+        Usuario.objects.filter(pk=usuario_id).delete()
+        return contagem
@@ -0,0 +1,9 @@
+from core.tarefas import tarefa
+
+from .services import ExclusaoUsuarioService
+
+
+@tarefa('contas.purgar_usuario', atomica=False)
+def purgar_usuario(usuario_id):
+    """Remove em lotes os dados de um usuário marcado como excluído (cada lote é uma transação)."""
+    ExclusaoUsuarioService.purgar(usuario_id)
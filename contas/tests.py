@@ -1,9 +1,24 @@
+import csv
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework.reverse import reverse
 from rest_framework import status
-from .models import Usuario
+from .models import Usuario, UsuarioQuerySet
 from .factories import UsuarioFactory, AdminFactory, SuperuserFactory, UsuarioInativoFactory 
 from django.contrib.auth import get_user_model
+from core.models import Tarefa
+from core.tarefas import processar_lote
+from doacoes.factories import DoacaoAprovadaFactory, DoacaoPendenteFactory, UsuarioBadgeFactory
+from doacoes.models import Doacao, EventoDoacao, UsuarioBadge
 
 Usuario = get_user_model()
 
@@ -110,6 +125,26 @@ class ListarUsuariosTestCase(APITestCase):
         data = response.data.get('results', response.data)
         self.assertEqual(len(data), 3)  # Todos têm @ufrpe.br
 
+    def test_caminho_rapido_igual_ao_serializer(self):
+        """GET /usuarios/ sem serializer gera o mesmo JSON que com serializer"""
+        self.client.force_authenticate(user=self.admin)
+        with self.settings(API_LEITURA_RAPIDA=False):
+            esperado = self.client.get(self.url, {'search': 'ufrpe'})
+        response = self.client.get(self.url, {'search': 'ufrpe'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, esperado.content)
+    
+    def test_fields_retorna_apenas_campos_pedidos(self):
+        """GET /usuarios/?fields=username,role retorna só esses campos"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {'fields': 'username,role'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        data = response.data.get('results', response.data)
+        self.assertEqual(set(data[0]), {'username', 'role'})
+
 class DeletarUsuarioTestCase(APITestCase):
     """
     Testes de integração para deleção de usuários.
@@ -153,7 +188,9 @@ class DeletarUsuarioTestCase(APITestCase):
         url = self._get_url(self.usuario.id)
         response = self.client.delete(url)
         
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        # Exclusão agendada; com TAREFAS_SINCRONAS (testes) a purga já rodou
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'CONCLUIDA')
         self.assertFalse(Usuario.objects.filter(id=self.usuario.id).exists())
         
         self.assertIn('sucesso', response.data)
@@ -185,7 +222,7 @@ class DeletarUsuarioTestCase(APITestCase):
         url = self._get_url(self.admin2.id)
         response = self.client.delete(url)
         
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertFalse(Usuario.objects.filter(id=self.admin2.id).exists())
     
     def test_deletar_usuario_inexistente_retorna_404(self):
@@ -196,6 +233,100 @@ class DeletarUsuarioTestCase(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+@override_settings(TAREFAS_SINCRONAS=False, EXCLUSAO_USUARIO_LOTE=2)
+class ExclusaoAssincronaUsuarioTestCase(APITestCase):
+    """
+    Testes da exclusão de usuário em segundo plano.
+    
+    Cobre:
+    - DELETE responde 202, desativa o usuário e o tira da listagem
+    - Status da tarefa antes e depois da purga
+    - Purga em lotes: doações, badges, validações (validado_por vira NULL) e imagens
+    - Pedido repetido devolve a mesma tarefa; se ela falhou, volta à fila
+    - Doações que perdem o validador mudam atualizado_em (modo ?since=)
+    """
+    
+    def setUp(self):
+        self.superuser = SuperuserFactory()
+        self.admin = AdminFactory()
+        self.outro = UsuarioFactory()
+        # Doações do admin a ser excluído e doações de outro usuário que ele validou
+        self.doacoes = DoacaoPendenteFactory.create_batch(5, doador=self.admin)
+        self.validadas = DoacaoAprovadaFactory.create_batch(3, doador=self.outro, validado_por=self.admin)
+        UsuarioBadgeFactory(usuario=self.admin)
+        self.client.force_authenticate(user=self.superuser)
+        self.url = reverse('deletar-usuario', kwargs={'id': self.admin.id})
+    
+    def test_delete_agenda_e_desativa(self):
+        response = self.client.delete(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'PENDENTE')
+        self.admin.refresh_from_db()
+        self.assertFalse(self.admin.is_active)
+        self.assertIsNotNone(self.admin.excluido_em)
+        # Nada foi apagado ainda
+        self.assertEqual(Doacao.objects.filter(doador=self.admin).count(), 5)
+        
+        listagem = self.client.get(reverse('listar-usuarios'))
+        ids = [u['id'] for u in listagem.data['results']]
+        self.assertNotIn(self.admin.id, ids)
+        
+        andamento = self.client.get(response.data['acompanhar'])
+        self.assertEqual(andamento.status_code, status.HTTP_200_OK)
+        self.assertEqual(andamento.data['status'], 'PENDENTE')
+    
+    def test_purga_em_lotes(self):
+        response = self.client.delete(self.url)
+        while processar_lote():
+            pass
+        
+        self.assertFalse(Usuario.objects.filter(id=self.admin.id).exists())
+        self.assertFalse(Doacao.objects.filter(doador_id=self.admin.id).exists())
+        self.assertFalse(UsuarioBadge.objects.filter(usuario_id=self.admin.id).exists())
+        # As doações validadas pelo admin continuam, sem validador
+        self.assertEqual(Doacao.objects.filter(pk__in=[d.pk for d in self.validadas], validado_por__isnull=True).count(), 3)
+        # Lápides para o modo ?since= e remoção das imagens enfileirada por lote
+        self.assertEqual(EventoDoacao.objects.filter(tipo='DOACAO_EXCLUIDA', usuario_id=self.admin.id).count(), 5)
+        self.assertEqual(Tarefa.objects.filter(nome='doacoes.remover_imagens').count(), 3)
+        
+        andamento = self.client.get(response.data['acompanhar'])
+        self.assertEqual(andamento.data['status'], 'CONCLUIDA')
+    
+    def test_pedido_repetido_devolve_a_mesma_tarefa(self):
+        primeira = self.client.delete(self.url)
+        segunda = self.client.delete(self.url)
+        
+        self.assertEqual(segunda.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(primeira.data['tarefa'], segunda.data['tarefa'])
+    
+    def test_pedido_repetido_reabre_purga_que_falhou(self):
+        tarefa_id = self.client.delete(self.url).data['tarefa']
+        Tarefa.objects.filter(pk=tarefa_id).update(status='FALHOU', tentativas=5, erro='Traceback ...')
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.data['tarefa'], tarefa_id)
+        self.assertEqual(response.data['status'], 'PENDENTE')
+        self.assertEqual(Tarefa.objects.get(pk=tarefa_id).tentativas, 0)
+
+        while processar_lote():
+            pass
+        self.assertFalse(Usuario.objects.filter(id=self.admin.id).exists())
+
+    def test_purga_atualiza_doacoes_validadas(self):
+        antes = dict(Doacao.objects.filter(pk__in=[d.pk for d in self.validadas]).values_list('pk', 'atualizado_em'))
+        self.client.delete(self.url)
+        while processar_lote():
+            pass
+
+        for pk, atualizado_em in Doacao.objects.filter(pk__in=antes).values_list('pk', 'atualizado_em'):
+            self.assertGreater(atualizado_em, antes[pk])
+
+    def test_status_de_usuario_sem_exclusao_retorna_404(self):
+        response = self.client.get(reverse('exclusao-usuario', kwargs={'id': self.outro.id}))
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 class MeuPerfilTests(APITestCase):
     def setUp(self):
         self.user = Usuario.objects.create_user(username="rodrigo", email="rod@example.com", password="S3nha!Segura")
@@ -413,4 +544,215 @@ class AtualizarUsuarioTestCase(APITestCase):
         # Email inválido
         response = self.client.patch(url, {'email': 'email_invalido'})
         
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ImportarUsuariosTestCase(TestCase):
+    """
+    Testes do comando de importação em massa de usuários.
+
+    Cobre:
+    - Criação em lote
+    - Rejeição por domínio, duplicidade no arquivo e no banco
+    - Rejeição pelos validadores dos campos (formato e tamanho)
+    - Hash das senhas no pool de processos (--workers >= 1)
+    """
+
+    def setUp(self):
+        self.existente = UsuarioFactory(username='ja_existe', email='ja_existe@ufrpe.br')
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+    def _csv(self, linhas):
+        caminho = os.path.join(self.diretorio, 'usuarios.csv')
+        with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+            arquivo.write("username,email,password\n")
+            for linha in linhas:
+                arquivo.write(",".join(linha) + "\n")
+        return caminho
+
+    def test_importa_usuarios_validos(self):
+        caminho = self._csv([
+            ('aluno1', 'aluno1@ufrpe.br', 'Senha123'),
+            ('aluno2', 'ALUNO2@ufrpe.br', 'Senha456'),
+        ])
+        call_command('importar_usuarios', caminho, '--workers', '0', '--lote', '1', stdout=StringIO())
+
+        aluno = Usuario.objects.get(username='aluno1')
+        self.assertTrue(aluno.check_password('Senha123'))
+        self.assertTrue(Usuario.objects.filter(username='aluno2').exists())
+
+    def test_rejeita_linhas_invalidas(self):
+        caminho = self._csv([
+            ('externo', 'externo@gmail.com', 'Senha123'),
+            ('JA_EXISTE', 'outro@ufrpe.br', 'Senha123'),
+            ('novo', 'Ja_Existe@ufrpe.br', 'Senha123'),
+            ('repetido', 'repetido@ufrpe.br', 'Senha123'),
+            ('repetido', 'repetido2@ufrpe.br', 'Senha123'),
+            ('fraca', 'fraca@ufrpe.br', 'abc'),
+        ])
+        rejeitados = os.path.join(self.diretorio, 'rejeitados.csv')
+        call_command('importar_usuarios', caminho, '--workers', '0', '--rejeitados', rejeitados, stdout=StringIO())
+
+        self.assertEqual(Usuario.objects.count(), 2)  # existente + 'repetido'
+        with open(rejeitados, encoding='utf-8') as arquivo:
+            linhas = {int(r['linha']): r['motivo'] for r in csv.DictReader(arquivo)}
+        self.assertEqual(sorted(linhas), [2, 3, 4, 6, 7])
+        self.assertIn('institucional', linhas[2])
+        self.assertIn('Username já está em uso', linhas[3])
+        self.assertIn('Email já está em uso', linhas[4])
+        self.assertIn('duplicado no arquivo', linhas[6])
+
+    def test_rejeita_username_e_email_fora_do_formato_do_modelo(self):
+        caminho = self._csv([
+            ('com espaco', 'espaco@ufrpe.br', 'Senha123'),
+            ('x' * 151, 'longo@ufrpe.br', 'Senha123'),
+            ('semarroba', 'sem arroba@ufrpe.br', 'Senha123'),
+            ('valido', 'valido@ufrpe.br', 'Senha123'),
+        ])
+        rejeitados = os.path.join(self.diretorio, 'rejeitados.csv')
+        call_command('importar_usuarios', caminho, '--workers', '0', '--rejeitados', rejeitados, stdout=StringIO())
+
+        self.assertTrue(Usuario.objects.filter(username='valido').exists())
+        self.assertEqual(Usuario.objects.count(), 2)
+        with open(rejeitados, encoding='utf-8') as arquivo:
+            linhas = {int(r['linha']): r['motivo'] for r in csv.DictReader(arquivo)}
+        self.assertEqual(sorted(linhas), [2, 3, 4])
+        self.assertTrue(linhas[2].startswith('username:'))
+        self.assertIn('150', linhas[3])
+        self.assertTrue(linhas[4].startswith('email:'))
+
+    def test_hash_em_pool_de_processos(self):
+        caminho = self._csv([(f'pool{i}', f'pool{i}@ufrpe.br', f'Senha{i}abc') for i in range(4)])
+
+        call_command('importar_usuarios', caminho, '--workers', '2', '--lote', '2', stdout=StringIO())
+
+        self.assertEqual(Usuario.objects.filter(username__startswith='pool').count(), 4)
+        self.assertTrue(Usuario.objects.get(username='pool3').check_password('Senha3abc'))
+
+
+class IdentidadeSemMaiusculasTestCase(APITestCase):
+    """
+    Testes de username/email únicos sem diferenciar maiúsculas e do login por email.
+
+    Cobre:
+    - Índices únicos em lower(username) e lower(email) no banco
+    - Cadastro e perfil recusam variações de maiúsculas
+    - Corrida no cadastro vira 400 em vez de 500
+    - Token JWT por username ou por email institucional
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='Maria', email='Maria@ufrpe.br', password='Senha123')
+
+    def test_banco_recusa_variacao_de_maiusculas(self):
+        for dados in ({'username': 'MARIA', 'email': 'outra@ufrpe.br'}, {'username': 'outra', 'email': 'maria@UFRPE.br'}):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Usuario.objects.create(**dados)
+        # Emails vazios (contas criadas pelo admin) não conflitam entre si
+        Usuario.objects.create(username='sem_email_1')
+        Usuario.objects.create(username='sem_email_2')
+
+    def test_por_identidade(self):
+        self.assertEqual(list(Usuario.objects.por_identidade('username', ['mARIA'])), [self.usuario])
+        self.assertEqual(list(Usuario.objects.por_identidade('email', ['MARIA@ufrpe.br'])), [self.usuario])
+        Usuario.objects.create(username='sem_email')
+        self.assertFalse(Usuario.objects.por_identidade('email', ['']).exists())
+
+    def test_cadastro_recusa_variacao(self):
+        url = reverse('cadastrar')
+        response = self.client.post(url, {'username': 'MARIA', 'email': 'nova@ufrpe.br', 'password': 'Senha123'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'username': 'nova', 'email': 'MARIA@UFRPE.BR', 'password': 'Senha123'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_corrida_no_cadastro_vira_400(self):
+        # Simula o concorrente: a validação não enxerga o usuário que o banco já tem
+        original = UsuarioQuerySet.por_identidade
+        chamadas = []
+
+        def sem_enxergar(qs, campo, valores):
+            chamadas.append(campo)
+            resultado = original(qs, campo, valores)
+            return resultado.none() if len(chamadas) <= 2 else resultado
+
+        with mock.patch.object(UsuarioQuerySet, 'por_identidade', sem_enxergar):
+            response = self.client.post(
+                reverse('cadastrar'), {'username': 'maria', 'email': 'nova@ufrpe.br', 'password': 'Senha123'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data['detalhes'])
+        self.assertEqual(Usuario.objects.count(), 1)
+
+    def test_perfil_recusa_variacao(self):
+        outro = Usuario.objects.create_user(username='joao', email='joao@ufrpe.br', password='Senha123')
+        self.client.force_authenticate(outro)
+        response = self.client.patch(reverse('meu-perfil'), {'username': 'maria'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # A própria conta pode trocar só as maiúsculas
+        response = self.client.patch(reverse('meu-perfil'), {'username': 'Joao'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_por_username_ou_email(self):
+        url = reverse('token_obtain_pair')
+        for login in ('Maria', 'maria@UFRPE.br'):
+            response = self.client.post(url, {'username': login, 'password': 'Senha123'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, login)
+            self.assertIn('access', response.data)
+        response = self.client.post(url, {'username': 'maria@ufrpe.br', 'password': 'errada'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(url, {'username': 'ninguem@ufrpe.br', 'password': 'Senha123'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['core.hashers.ScryptConfiguravel', 'django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+    SENHA_SCRYPT_N=2 ** 10,
+)
+class HashSenhaTestCase(APITestCase):
+    """
+    Testes do hash de senha configurável.
+
+    Cobre:
+    - Hash antigo (PBKDF2) regravado com o algoritmo preferido no login
+    - Mudança de parâmetros regrava o hash no próximo login
+    - Comando benchmark_login
+    """
+
+    def setUp(self):
+        pbkdf2 = PBKDF2PasswordHasher()
+        pbkdf2.iterations = 1000
+        self.usuario = Usuario.objects.create(
+            username='ana', email='ana@ufrpe.br', password=pbkdf2.encode('Senha123', pbkdf2.salt()),
+        )
+
+    def _login(self, senha='Senha123'):
+        return self.client.post(reverse('token_obtain_pair'), {'username': 'ana', 'password': senha})
+
+    def test_login_regrava_hash_antigo(self):
+        self.assertEqual(self._login('errada').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('pbkdf2_sha256$'))
+
+        self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('scrypt$1024$'))
+        self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+
+    def test_novos_parametros_regravam_no_login(self):
+        self._login()
+        with override_settings(SENHA_SCRYPT_N=2 ** 11):
+            self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('scrypt$2048$'))
+
+    def test_benchmark_login(self):
+        saida = StringIO()
+        call_command(
+            'benchmark_login', '--config', 'scrypt:n=1024,r=8', '--config', 'pbkdf2:i=1000',
+            '--segundos', '0.01', stdout=saida,
+        )
+        self.assertIn('scrypt:n=1024,r=8', saida.getvalue())
+        self.assertIn('pbkdf2:i=1000', saida.getvalue())
+        self.assertIn('logins/s por worker', saida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_login', '--config', 'scrypt:x=1', stdout=StringIO())
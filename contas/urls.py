@@ -4,6 +4,7 @@ from .views import (
     DashboardUsuarioView,
     ListarUsuariosView,
     DeletarUsuarioView,
+    StatusExclusaoUsuarioView,
     AtualizarUsuarioView,
     CustomTokenObtainPairView,
     CustomTokenRefreshView,
@@ -27,6 +28,8 @@ urlpatterns = [
     
     # Nova rota para deletar usuário (apenas admin)
     path('usuarios/<int:id>/deletar/', DeletarUsuarioView.as_view(), name='deletar-usuario'),
+    # Acompanhamento da exclusão (feita em segundo plano)
+    path('usuarios/<int:id>/exclusao/', StatusExclusaoUsuarioView.as_view(), name='exclusao-usuario'),
     
     # Nova rota para atualizar usuário (apenas admin)
     path('usuarios/<int:id>/atualizar/', AtualizarUsuarioView.as_view(), name='atualizar-usuario'),
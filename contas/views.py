@@ -2,6 +2,8 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
+from rest_framework.generics import get_object_or_404
+from rest_framework.reverse import reverse
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
@@ -10,6 +12,12 @@ from .serializers import CadastroSerializer, DashboardUsuarioSerializer, Usuario
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from .models import Usuario
+from .leitura import LeitorUsuarios
+from .services import ExclusaoUsuarioService
+from core.campos import CamposEsparsosMixin, PARAMETROS_CAMPOS
+from core.leitura import LeituraRapidaMixin
+from core.models import Tarefa
+from core.throttling import BaldeTokensThrottle
 
 Usuario = get_user_model()
 
@@ -22,7 +30,7 @@ class IsAdmin(IsAuthenticated):
 @extend_schema(
     tags=['Autenticação'],
     summary='Obter token JWT',
-    description='Retorna um par de tokens (access e refresh) usando usuario e senha',
+    description='Retorna um par de tokens (access e refresh) usando username ou email institucional e senha',
     request=TokenObtainPairSerializer,
     responses={
         200: {
@@ -67,6 +75,9 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     Sobrescreve a view padrão para adicionar documentação do Swagger.
     """
     serializer_class = EcoTokenObtainPairSerializer
+    # Cada tentativa custa um hash de senha: limite por IP
+    throttle_classes = [BaldeTokensThrottle]
+    throttle_scope = 'contas_token'
     pass  # A lógica continua a mesma da classe pai
 
 @extend_schema(
@@ -122,6 +133,8 @@ class CadastroUsuarioView(generics.CreateAPIView):
     queryset = Usuario.objects.all()
     serializer_class = CadastroSerializer
     permission_classes = [AllowAny] 
+    throttle_classes = [BaldeTokensThrottle]
+    throttle_scope = 'contas_cadastro'
 
 @extend_schema(
     tags=['Contas'],
@@ -179,6 +192,7 @@ class DashboardUsuarioView(generics.RetrieveAPIView):
                 OpenApiExample('Busca por email', value='@gmail.com'),
             ]
         ),
+        *PARAMETROS_CAMPOS,
     ],
     responses={
         200: UsuarioSerializer(many=True),
@@ -187,9 +201,10 @@ class DashboardUsuarioView(generics.RetrieveAPIView):
     }
 )
 # Lista todos os usuários (apenas admin)
-class ListarUsuariosView(generics.ListAPIView):
-    queryset = Usuario.objects.all()
+class ListarUsuariosView(CamposEsparsosMixin, LeituraRapidaMixin, generics.ListAPIView):
+    queryset = Usuario.objects.filter(excluido_em__isnull=True)
     serializer_class = UsuarioSerializer
+    leitor_rapido = LeitorUsuarios
     permission_classes = [IsAdmin]
     
     def get_queryset(self):
@@ -222,9 +237,13 @@ class ListarUsuariosView(generics.ListAPIView):
 @extend_schema(
     tags=['Contas'],
     summary='Deletar usuário',
-    description='Deleta um usuário específico pelo ID (apenas para administradores)',
+    description=(
+        'Agenda a exclusão de um usuário pelo ID (apenas para administradores). O usuário é '
+        'desativado na hora e seus dados são removidos em segundo plano; acompanhe pelo '
+        'endereço em `acompanhar`. Repetir o pedido devolve a mesma tarefa.'
+    ),
     responses={
-        204: OpenApiTypes.OBJECT,
+        202: OpenApiTypes.OBJECT,
         400: OpenApiTypes.OBJECT,
         403: OpenApiTypes.OBJECT
     }
@@ -253,14 +272,41 @@ class DeletarUsuarioView(generics.DestroyAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        username_deletado = usuario.username
-        usuario.delete()
+        tarefa = ExclusaoUsuarioService.agendar(usuario)
         
         return Response(
-            {"sucesso": f"Usuário '{username_deletado}' deletado com sucesso."},
-            status=status.HTTP_204_NO_CONTENT
+            {
+                "sucesso": f"Exclusão do usuário '{usuario.username}' agendada.",
+                "tarefa": tarefa.id,
+                "status": tarefa.status,
+                "acompanhar": reverse('exclusao-usuario', kwargs={'id': usuario.id}, request=request),
+            },
+            status=status.HTTP_202_ACCEPTED
         )
 
+@extend_schema(
+    tags=['Contas'],
+    summary='Status da exclusão de usuário',
+    description='Situação da tarefa que remove os dados de um usuário excluído (apenas para administradores)',
+    responses={
+        200: OpenApiTypes.OBJECT,
+        404: OpenApiTypes.OBJECT
+    }
+)
+class StatusExclusaoUsuarioView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, id):
+        tarefa = get_object_or_404(Tarefa, chave=ExclusaoUsuarioService.chave(id))
+        return Response({
+            "usuario": id,
+            "tarefa": tarefa.id,
+            "status": tarefa.status,
+            "tentativas": tarefa.tentativas,
+            "concluida_em": tarefa.concluida_em,
+            "erro": tarefa.erro,
+        })
+
 @extend_schema(
     tags=['Contas'],
     summary='Atualizar usuário',
@@ -273,7 +319,7 @@ class DeletarUsuarioView(generics.DestroyAPIView):
 )
 # Atualizar usuário (promover/rebaixar ou desativar) - apenas admin
 class AtualizarUsuarioView(generics.UpdateAPIView):
-    queryset = Usuario.objects.all()
+    queryset = Usuario.objects.filter(excluido_em__isnull=True)
     serializer_class = UsuarioSerializer
     permission_classes = [IsAdmin]
     lookup_field = 'id'
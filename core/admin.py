@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import ChaveIdempotencia, Tarefa
+from .paginacao import AdminEscalavelMixin
+
+
+@admin.register(Tarefa)
+class TarefaAdmin(AdminEscalavelMixin, admin.ModelAdmin):
+    list_display = ['id', 'nome', 'chave', 'status', 'tentativas', 'executar_apos', 'concluida_em']
+    list_filter = ['status', 'nome']
+    search_fields = ['chave']
+    readonly_fields = ['criado_em', 'iniciada_em', 'concluida_em']
+    ordering = ['-id']
+    campo_keyset = '-id'
+
+
+@admin.register(ChaveIdempotencia)
+class ChaveIdempotenciaAdmin(AdminEscalavelMixin, admin.ModelAdmin):
+    list_display = ['id', 'escopo', 'chave', 'usuario', 'status', 'status_http', 'criado_em', 'expira_em']
+    list_filter = ['escopo', 'status']
+    list_select_related = ['usuario']
+    search_fields = ['chave']
+    raw_id_fields = ['usuario']
+    readonly_fields = ['impressao', 'resposta', 'criado_em']
+    ordering = ['-id']
+    campo_keyset = '-id'
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        # Registra as tarefas declaradas em <app>/tarefas.py e as consultas
+        # analisadas por `analisar_consultas` em <app>/consultas.py
+        autodiscover_modules('tarefas')
+        autodiscover_modules('consultas')
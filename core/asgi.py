@@ -3,6 +3,10 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Endpoints de streaming, como o fluxo SSE em /api/doacoes/eventos/stream/, só
+escalam sob este entrypoint (ex.: `uvicorn core.asgi:application`), onde cada
+conexão ociosa custa uma corrotina em vez de um worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Depois do setup: avisa se os limites de requisição estão sem cache compartilhado
+from core.throttling import verificar_cache  # noqa: E402
+
+verificar_cache()
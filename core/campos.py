@@ -0,0 +1,147 @@
+"""
+Campos esparsos: ?fields= / ?omit= nas listagens.
+
+    GET /api/doacoes/historico/?fields=id,status,data_submissao
+    GET /api/badges/minhas/?fields=data_conquista,badge.nome
+    GET /api/doacoes/admin/pendentes/?omit=descricao,evidencia_foto
+
+O corte vale para o serializer e para o SQL: a view carrega só as colunas
+dos campos pedidos (only()) e só faz select_related das relações usadas.
+Nomes aninhados usam ponto (`badge.nome`); nomes desconhecidos são ignorados.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from drf_spectacular.utils import OpenApiParameter
+
+PARAMETROS_CAMPOS = [
+    OpenApiParameter(
+        name='fields', type=str, location=OpenApiParameter.QUERY, required=False,
+        description='Campos a retornar, separados por vírgula (ex.: id,status,badge.nome).',
+    ),
+    OpenApiParameter(
+        name='omit', type=str, location=OpenApiParameter.QUERY, required=False,
+        description='Campos a remover da resposta, separados por vírgula.',
+    ),
+]
+
+
+def _separar(nomes):
+    """Divide ['a', 'b.c'] em ({'a'}, {'b': ['c']})."""
+    diretos, aninhados = set(), {}
+    for nome in nomes:
+        raiz, _, resto = nome.partition('.')
+        if resto:
+            aninhados.setdefault(raiz, []).append(resto)
+        else:
+            diretos.add(raiz)
+    return diretos, aninhados
+
+
+class CamposDinamicosMixin:
+    """
+    Serializer que aceita `campos` e `omitir` (listas de nomes) no construtor.
+
+    `colunas_por_campo` diz quais caminhos do ORM cada campo lê, para os campos
+    cujo `source` não é uma coluna (SerializerMethodField, get_*_display...).
+    """
+
+    colunas_por_campo = {}
+
+    def __init__(self, *args, campos=None, omitir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.podar(campos, omitir)
+
+    def podar(self, campos=None, omitir=None):
+        if campos:
+            diretos, aninhados = _separar(campos)
+            for nome in list(self.fields):
+                if nome not in diretos and nome not in aninhados:
+                    self.fields.pop(nome)
+            for nome, sub_campos in aninhados.items():
+                campo = self.fields.get(nome)
+                if nome not in diretos and isinstance(campo, CamposDinamicosMixin):
+                    campo.podar(campos=sub_campos)
+        if omitir:
+            diretos, aninhados = _separar(omitir)
+            for nome in diretos:
+                self.fields.pop(nome, None)
+            for nome, sub_omitir in aninhados.items():
+                campo = self.fields.get(nome)
+                if isinstance(campo, CamposDinamicosMixin):
+                    campo.podar(omitir=sub_omitir)
+
+    def caminhos_orm(self, prefixo=''):
+        """
+        Caminhos (`coluna` ou `relacao__coluna`) lidos pelos campos restantes,
+        ou None se algum campo não puder ser mapeado (aí nada é cortado no SQL).
+        """
+        modelo = self.Meta.model
+        caminhos = []
+        for campo in self._readable_fields:
+            origem = campo.source.replace('.', '__')
+            if isinstance(campo, CamposDinamicosMixin):
+                caminhos.append(prefixo + origem)
+                sub_caminhos = campo.caminhos_orm(f'{prefixo}{origem}__')
+                if sub_caminhos is None:
+                    return None
+                caminhos += sub_caminhos
+            elif campo.field_name in self.colunas_por_campo:
+                caminhos += [prefixo + c for c in self.colunas_por_campo[campo.field_name]]
+            else:
+                try:
+                    modelo._meta.get_field(origem.split('__')[0])
+                except FieldDoesNotExist:
+                    return None
+                caminhos.append(prefixo + origem)
+        return caminhos
+
+
+class CamposEsparsosMixin:
+    """
+    View de leitura que repassa ?fields=/?omit= ao serializer e corta o queryset.
+
+    Só atua em GET: num POST/PATCH os campos de entrada não podem sumir.
+    """
+
+    def selecao_campos(self):
+        if self.request is None or self.request.method != 'GET':
+            return {}
+        selecao = {}
+        for parametro, chave in (('fields', 'campos'), ('omit', 'omitir')):
+            valor = self.request.query_params.get(parametro, '')
+            nomes = [nome.strip() for nome in valor.split(',') if nome.strip()]
+            if nomes:
+                selecao[chave] = nomes
+        return selecao
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.selecao_campos())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        return self.podar_queryset(super().filter_queryset(queryset))
+
+    def podar_queryset(self, queryset, serializer_class=None, extras=()):
+        """
+        only() com as colunas dos campos pedidos; select_related só das relações usadas.
+        `extras` são colunas que a view lê por conta própria (ex.: chave do cursor).
+        """
+        selecao = self.selecao_campos()
+        if not selecao:
+            return queryset
+        serializer_class = serializer_class or self.get_serializer_class()
+        caminhos = serializer_class(**selecao).caminhos_orm()
+        if caminhos is None:
+            return queryset
+
+        colunas = {queryset.model._meta.pk.name, *caminhos, *extras}
+        relacoes = set()
+        for caminho in caminhos:
+            partes = caminho.split('__')[:-1]
+            for i in range(1, len(partes) + 1):
+                relacoes.add('__'.join(partes[:i]))
+        colunas |= relacoes
+        # select_related() sem argumentos seguiria todas as FKs
+        queryset = queryset.select_related(None)
+        if relacoes:
+            queryset = queryset.select_related(*sorted(relacoes))
+        return queryset.only(*sorted(colunas))
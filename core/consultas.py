@@ -0,0 +1,293 @@
+"""
+Registro das consultas quentes da aplicação e análise dos seus planos (EXPLAIN).
+
+Cada app declara as suas em `<app>/consultas.py` (carregado no ready() do core):
+
+    from core.consultas import consulta, queryset_da_view
+
+    @consulta('doacoes.pendentes', 'Fila de moderação')
+    def pendentes(contexto):
+        return queryset_da_view(AdminDoacoesPendentesView, contexto)
+
+O comando `analisar_consultas` roda cada uma por EXPLAIN no banco configurado,
+aponta varreduras sequenciais, ordenações e estimativas grandes e sugere
+índices (parciais/cobrindo) que ainda não existam no Meta do modelo.
+"""
+import json
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import Col
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual, In, LessThan, LessThanOrEqual, Range
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+_registro = {}
+
+
+def consulta(nome, descricao=''):
+    """Registra `funcao(contexto) -> QuerySet` sob `nome`."""
+    def decorador(funcao):
+        _registro[nome] = (funcao, descricao)
+        return funcao
+    return decorador
+
+
+def registradas():
+    return dict(sorted(_registro.items()))
+
+
+@dataclass
+class Contexto:
+    """Valores de exemplo para montar as consultas (o EXPLAIN não precisa de dados reais)."""
+    usuario: object
+    agora: object
+
+
+def queryset_da_view(view_class, contexto, parametros=None, action=None):
+    """
+    Queryset que a view executaria numa listagem: filtros, página e, quando a
+    view usa o caminho rápido (core/leitura.py), o values_list() dele.
+    """
+    http = HttpRequest()
+    http.method = 'GET'
+    http.GET = QueryDict(mutable=True)
+    http.GET.update(parametros or {})
+    request = Request(http)
+    request.user = contexto.usuario
+    view = view_class()
+    view.setup(request)
+    view.request, view.format_kwarg, view.action = request, None, action
+    queryset = view.filter_queryset(view.get_queryset())
+    if getattr(view, 'leitor_rapido', None) is not None and view.leitura_rapida_ativa():
+        queryset = view.leitor_rapido.consulta(queryset)
+    paginador = view.paginator
+    if paginador is not None and getattr(paginador, 'page_size', None):
+        queryset = queryset[:paginador.page_size]
+    return queryset
+
+
+# ============================================================================
+# LEITURA DO PLANO
+# ============================================================================
+
+@dataclass
+class Alerta:
+    tipo: str  # 'varredura', 'ordenacao' ou 'estimativa'
+    tabela: str
+    detalhe: str
+
+
+@dataclass
+class Analise:
+    nome: str
+    descricao: str
+    sql: str
+    plano: list
+    alertas: list = field(default_factory=list)
+    sugestoes: list = field(default_factory=list)
+
+
+def _plano_sqlite(queryset, limiar_linhas):
+    linhas, alertas = [], []
+    for linha in queryset.explain().splitlines():
+        detalhe = linha.split(' ', 3)[-1].strip()
+        linhas.append(detalhe)
+        if detalhe.startswith('SCAN ') and 'INDEX' not in detalhe:
+            alertas.append(Alerta('varredura', detalhe.split()[1], detalhe))
+        elif detalhe.startswith('USE TEMP B-TREE'):
+            alertas.append(Alerta('ordenacao', '', detalhe))
+    return linhas, alertas
+
+
+def _plano_postgres(queryset, limiar_linhas):
+    plano = json.loads(queryset.explain(format='json'))
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    linhas, alertas = [], []
+
+    def visitar(no, nivel):
+        tipo = no['Node Type']
+        tabela = no.get('Relation Name', '')
+        descricao = f"{'  ' * nivel}{tipo}"
+        if tabela:
+            descricao += f" em {tabela}"
+        if no.get('Index Name'):
+            descricao += f" usando {no['Index Name']}"
+        descricao += f" (linhas estimadas: {no.get('Plan Rows', 0)})"
+        linhas.append(descricao)
+        if tipo == 'Seq Scan':
+            alertas.append(Alerta('varredura', tabela, no.get('Filter', 'sem filtro')))
+        elif tipo in ('Sort', 'Incremental Sort'):
+            alertas.append(Alerta('ordenacao', '', ', '.join(no.get('Sort Key', []))))
+        if no.get('Plan Rows', 0) >= limiar_linhas and tabela:
+            alertas.append(Alerta('estimativa', tabela, f"{no['Plan Rows']} linhas estimadas"))
+        for filho in no.get('Plans', []):
+            visitar(filho, nivel + 1)
+
+    visitar(plano[0]['Plan'], 0)
+    return linhas, alertas
+
+
+# ============================================================================
+# SUGESTÃO DE ÍNDICES
+# ============================================================================
+
+_IGUALDADE = (Exact,)
+_INTERVALO = (GreaterThan, GreaterThanOrEqual, LessThan, LessThanOrEqual, Range, In)
+
+
+def _filtros(query):
+    """(igualdades, intervalos) sobre colunas da tabela principal, só nos ramos AND."""
+    igualdades, intervalos = [], []
+
+    def visitar(no):
+        if getattr(no, 'negated', False) or getattr(no, 'connector', 'AND') != 'AND':
+            return
+        for filho in no.children:
+            if hasattr(filho, 'children'):
+                visitar(filho)
+                continue
+            lhs = getattr(filho, 'lhs', None)
+            if not isinstance(lhs, Col) or lhs.alias != query.base_table:
+                continue
+            if isinstance(filho, _IGUALDADE) and not hasattr(filho.rhs, 'resolve_expression'):
+                igualdades.append((lhs.target, filho.rhs))
+            elif isinstance(filho, _INTERVALO):
+                intervalos.append(lhs.target)
+
+    visitar(query.where)
+    return igualdades, intervalos
+
+
+def _ordenacao(query, modelo):
+    ordem = list(query.order_by) or (list(modelo._meta.ordering) if query.default_ordering else [])
+    campos = []
+    for item in ordem:
+        if not isinstance(item, str) or '__' in item.lstrip('-') or item.lstrip('-') == '?':
+            return []
+        nome = item.lstrip('-')
+        campo = modelo._meta.pk if nome == 'pk' else modelo._meta.get_field(nome)
+        campos.append(('-' if item.startswith('-') else '') + campo.name)
+    return campos
+
+
+def _indices_existentes(modelo):
+    """(colunas, condição) de cada índice do modelo, incluindo PK, FKs, unique e unique_together."""
+    existentes = []
+    for campo in modelo._meta.concrete_fields:
+        if campo.primary_key or campo.unique or campo.db_index:
+            existentes.append(((campo.name,), None))
+    for indice in modelo._meta.indexes:
+        existentes.append((tuple(nome.lstrip('-') for nome in indice.fields), indice.condition))
+    for restricao in modelo._meta.constraints:
+        if getattr(restricao, 'fields', None):
+            existentes.append((tuple(restricao.fields), getattr(restricao, 'condition', None)))
+    for conjunto in modelo._meta.unique_together:
+        existentes.append((tuple(conjunto), None))
+    return existentes
+
+
+def _ja_atendida(existentes, chave, condicao):
+    condicao_campos = tuple(nome for nome, _ in condicao)
+    for colunas, cond in existentes:
+        if cond is None and colunas[:len(condicao_campos) + len(chave)] == condicao_campos + chave:
+            return True
+        if cond is not None and cond == _q(condicao) and colunas[:len(chave)] == chave:
+            return True
+    return False
+
+
+def _q(condicao):
+    return Q(**dict(condicao)) if condicao else None
+
+
+def sugerir_indice(queryset):
+    """
+    Índice que serviria a consulta: igualdades de baixa cardinalidade (choices,
+    booleanos) viram condição de índice parcial; as demais igualdades, os
+    intervalos e a ordenação viram as colunas; colunas lidas por values_list()
+    entram em `include` (índice cobrindo, só PostgreSQL). None se já existir.
+    """
+    query, modelo = queryset.query, queryset.model
+    igualdades, intervalos = _filtros(query)
+    ordenacao = _ordenacao(query, modelo)
+
+    condicao, colunas = [], []
+    for campo, valor in igualdades:
+        if (campo.choices or campo.get_internal_type() == 'BooleanField') and not isinstance(valor, (list, tuple)):
+            condicao.append((campo.name, valor))
+        elif campo.name not in colunas:
+            colunas.append(campo.name)
+    for nome in ordenacao:
+        if nome.lstrip('-') not in colunas:
+            colunas.append(nome)
+    if not ordenacao:
+        colunas += [campo.name for campo in intervalos if campo.name not in colunas]
+    if not colunas:
+        return None
+
+    chave = tuple(nome.lstrip('-') for nome in colunas)
+    if _ja_atendida(_indices_existentes(modelo), chave, condicao):
+        return None
+
+    incluir = []
+    for nome in query.values_select or ():
+        if '__' not in nome and nome not in chave and nome != modelo._meta.pk.name:
+            incluir.append(modelo._meta.get_field(nome).name)
+
+    partes = [f"fields={colunas!r}"]
+    if condicao:
+        partes.append('condition=Q(' + ', '.join(f'{nome}={valor!r}' for nome, valor in condicao) + ')')
+    if incluir:
+        partes.append(f"include={incluir!r}")
+    nome_indice = '_'.join([modelo._meta.model_name[:8], *(c.lstrip('-')[:6] for c in colunas)])[:26] + '_idx'
+    partes.append(f"name={nome_indice!r}")
+    return f"{modelo._meta.label}.Meta.indexes: models.Index({', '.join(partes)})"
+
+
+# ============================================================================
+# ANÁLISE
+# ============================================================================
+
+def analisar(contexto, nomes=None, limiar_linhas=10000, using='default'):
+    vendor = connections[using].vendor
+    leitor_plano = {'postgresql': _plano_postgres, 'sqlite': _plano_sqlite}.get(vendor)
+    resultados = []
+    for nome, (funcao, descricao) in registradas().items():
+        if nomes and nome not in nomes:
+            continue
+        queryset = funcao(contexto).using(using)
+        analise = Analise(nome, descricao, str(queryset.query), [])
+        if leitor_plano is None:
+            analise.plano = queryset.explain().splitlines()
+        else:
+            analise.plano, analise.alertas = leitor_plano(queryset, limiar_linhas)
+        if analise.alertas:
+            sugestao = sugerir_indice(queryset)
+            if sugestao:
+                analise.sugestoes.append(sugestao)
+        resultados.append(analise)
+    return resultados
+
+
+def relatorio(resultados, vendor):
+    """Texto estável (ordenado, sem horários) para versionar e comparar com diff."""
+    linhas = [f"# Análise de consultas ({vendor})", ""]
+    for analise in resultados:
+        linhas.append(f"## {analise.nome}")
+        if analise.descricao:
+            linhas.append(analise.descricao)
+        linhas += ["", "SQL:", f"    {analise.sql}", "", "Plano:"]
+        linhas += [f"    {linha}" for linha in analise.plano]
+        if analise.alertas:
+            linhas += ["", "Alertas:"]
+            for alerta in analise.alertas:
+                alvo = f" em {alerta.tabela}" if alerta.tabela else ''
+                linhas.append(f"    - {alerta.tipo}{alvo}: {alerta.detalhe}")
+        if analise.sugestoes:
+            linhas += ["", "Sugestões:"]
+            linhas += [f"    - {sugestao}" for sugestao in analise.sugestoes]
+        linhas.append("")
+    return '\n'.join(linhas)
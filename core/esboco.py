@@ -0,0 +1,69 @@
+"""
+Esboço de quantis com erro relativo garantido e mesclável (no estilo DDSketch).
+
+Cada valor positivo cai no balde ceil(log_γ(x)), com γ = (1 + α) / (1 - α):
+qualquer quantil devolvido fica a no máximo α (relativo) do valor real.
+Os baldes são só contagens, então dois esboços se somam balde a balde: o
+esboço de um mês é a soma dos esboços diários, sem guardar as amostras.
+
+    esboco = EsbocoQuantis()
+    esboco.adicionar(3600)            # ex.: segundos até a aprovação
+    esboco.mesclar(EsbocoQuantis.de_dict(outro))
+    esboco.quantil(0.9)
+
+Serializado como {"<balde>": contagem} (JSONField). Valores até 1 vão para o
+balde 0 e são devolvidos como 0.
+"""
+import math
+
+ERRO_RELATIVO = 0.02
+
+
+class EsbocoQuantis:
+    def __init__(self, baldes=None, erro_relativo=ERRO_RELATIVO):
+        self.gama = (1 + erro_relativo) / (1 - erro_relativo)
+        self._log_gama = math.log(self.gama)
+        self.baldes = dict(baldes or {})
+
+    @classmethod
+    def de_dict(cls, dados, erro_relativo=ERRO_RELATIVO):
+        return cls({int(balde): contagem for balde, contagem in (dados or {}).items()}, erro_relativo)
+
+    def para_dict(self):
+        return {str(balde): contagem for balde, contagem in sorted(self.baldes.items()) if contagem}
+
+    @property
+    def total(self):
+        return sum(self.baldes.values())
+
+    def balde(self, valor):
+        if valor <= 1:
+            return 0
+        return math.ceil(math.log(valor) / self._log_gama)
+
+    def adicionar(self, valor, contagem=1):
+        balde = self.balde(valor)
+        self.baldes[balde] = self.baldes.get(balde, 0) + contagem
+        return self
+
+    def mesclar(self, outro):
+        for balde, contagem in outro.baldes.items():
+            self.baldes[balde] = self.baldes.get(balde, 0) + contagem
+        return self
+
+    def quantil(self, q):
+        """Valor aproximado do quantil q (0..1), ou None sem amostras."""
+        total = self.total
+        if not total:
+            return None
+        # Posto mais próximo: a amostra de posição ceil(q * total)
+        alvo = max(1, math.ceil(q * total))
+        acumulado = 0
+        for balde in sorted(self.baldes):
+            acumulado += self.baldes[balde]
+            if acumulado >= alvo:
+                break
+        if balde == 0:
+            return 0.0
+        # Ponto do balde (γ^(i-1), γ^i] com erro relativo ≤ α para qualquer valor dele
+        return 2 * self.gama ** balde / (self.gama + 1)
@@ -0,0 +1,96 @@
+"""
+Esquema OpenAPI gerado uma vez por processo e servido da memória.
+
+O SpectacularAPIView percorre todas as views e serializers a cada GET de
+/api/schema/ (e o Swagger/Redoc buscam o esquema a cada carregamento). Aqui a
+geração acontece na primeira requisição de cada formato (YAML/JSON); o corpo
+fica em memória já comprimido (gzip e brotli), com um ETag do
+conteúdo, e as próximas respostas são só cópia de bytes ou 304.
+
+O esquema é o público (request=None), o mesmo do comando `spectacular` e do
+openapi.yaml versionado; `verificar_openapi` acusa quando o arquivo fica para trás.
+"""
+import gzip
+import hashlib
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from drf_spectacular.renderers import OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from .middleware import brotli, escolher_codificacao
+
+_cache = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class EsquemaRenderizado:
+    conteudo: bytes
+    content_type: str
+    etag: str
+    comprimidos: dict = field(default_factory=dict)
+
+    @classmethod
+    def de_bytes(cls, conteudo, content_type):
+        comprimidos = {'gzip': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            comprimidos['br'] = brotli.compress(conteudo, quality=11)
+        return cls(conteudo, content_type, hashlib.sha256(conteudo).hexdigest()[:32], comprimidos)
+
+
+def gerar(renderer_class=OpenApiYamlRenderer):
+    """Bytes do esquema público no formato do renderer (o mesmo que `manage.py spectacular` grava)."""
+    gerador = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    esquema = gerador.get_schema(request=None, public=True)
+    return renderer_class().render(esquema, renderer_context={})
+
+
+def renderizado(renderer):
+    """Esquema do formato do `renderer`, gerado na primeira chamada do processo."""
+    chave = type(renderer)
+    if chave not in _cache:
+        with _lock:
+            if chave not in _cache:
+                content_type = f'{renderer.media_type}; charset={renderer.charset}' if renderer.charset else renderer.media_type
+                _cache[chave] = EsquemaRenderizado.de_bytes(gerar(type(renderer)), content_type)
+    return _cache[chave]
+
+
+def limpar():
+    _cache.clear()
+
+
+class EsquemaEmCacheView(SpectacularAPIView):
+    """SpectacularAPIView com o esquema em memória, ETag/304 e corpo pré-comprimido."""
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        esquema = renderizado(request.accepted_renderer)
+        codificacao = escolher_codificacao(request.headers.get('Accept-Encoding', ''))
+        codificacao = codificacao if codificacao in esquema.comprimidos else None
+        # Cada codificação é uma representação diferente, com seu próprio ETag
+        etag = f'"{esquema.etag}-{codificacao}"' if codificacao else f'"{esquema.etag}"'
+
+        recebidas = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in recebidas or etag in [e.removeprefix('W/') for e in recebidas]:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                esquema.comprimidos[codificacao] if codificacao else esquema.conteudo,
+                content_type=esquema.content_type,
+            )
+            response['Content-Disposition'] = f'inline; filename="openapi.{request.accepted_renderer.format}"'
+            if codificacao:
+                # Já comprimido: o CompressaoApiMiddleware deixa passar
+                response['Content-Encoding'] = codificacao
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'OPENAPI_CACHE_SEGUNDOS', 300)}"
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
@@ -25,8 +25,9 @@ def drf_exception_handler(exc, context):
         msg = str(data)
         detalhes = {}
 
+    # Mantém os cabeçalhos do DRF (Retry-After, WWW-Authenticate)
     return Response({
         "erro": msg if isinstance(msg, str) else "Erro na requisição",
         "codigo": exc.__class__.__name__,
         "detalhes": data if isinstance(data, dict) else {}
-    }, status=resp.status_code)
\ No newline at end of file
+    }, status=resp.status_code, headers=dict(resp.items()))
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Hashers de senha com o custo nas settings (SENHA_*).
+
+O PBKDF2 padrão do Django (1 milhão de iterações) ocupa um worker síncrono por
+centenas de milissegundos a cada login. Argon2id e scrypt gastam memória em
+vez de só CPU, então o mesmo custo para um atacante sai bem mais barato para
+nós. O algoritmo preferido é o primeiro de PASSWORD_HASHERS (SENHA_ALGORITMO);
+os outros continuam lá só para verificar hashes antigos.
+
+Migração transparente: no login, `check_password` regrava o hash quando ele
+foi feito por outro algoritmo ou com parâmetros diferentes dos atuais
+(`must_update`). Os parâmetros são lidos a cada uso, então mudar uma setting
+vale para o próximo login. Escolha os valores pelo `benchmark_login`.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+class Argon2Configuravel(Argon2PasswordHasher):
+    """Argon2id com tempo, memória (KiB) e paralelismo das settings. Requer argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return settings.SENHA_ARGON2_TEMPO
+
+    @property
+    def memory_cost(self):
+        return settings.SENHA_ARGON2_MEMORIA_KIB
+
+    @property
+    def parallelism(self):
+        return settings.SENHA_ARGON2_PARALELISMO
+
+
+class ScryptConfiguravel(ScryptPasswordHasher):
+    """scrypt (hashlib, sem dependência) com N, r e p das settings."""
+
+    @property
+    def work_factor(self):
+        return settings.SENHA_SCRYPT_N
+
+    @property
+    def block_size(self):
+        return settings.SENHA_SCRYPT_R
+
+    @property
+    def parallelism(self):
+        return settings.SENHA_SCRYPT_P
+
+    @property
+    def maxmem(self):
+        # scrypt usa ~128 * r * N bytes; o limite padrão do OpenSSL (32 MiB) barraria N >= 2^15
+        return 2 * 128 * self.block_size * self.work_factor
+
+
+def memoria_por_hash(hasher):
+    """Memória aproximada (bytes) de um hash: o que cada login simultâneo ocupa no worker."""
+    if isinstance(hasher, Argon2PasswordHasher):
+        return hasher.memory_cost * 1024
+    if isinstance(hasher, ScryptPasswordHasher):
+        return 128 * hasher.block_size * hasher.work_factor
+    return 0
@@ -0,0 +1,147 @@
+"""
+Cabeçalho Idempotency-Key nos POSTs que clientes móveis repetem.
+
+    @idempotente('doacoes_submeter')
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+Sem o cabeçalho nada muda. Com ele:
+- primeira vez: grava a chave EM_ANDAMENTO, roda a view e guarda a resposta;
+- repetição com o mesmo corpo: devolve a resposta guardada, sem rodar a view
+  (nem reenviar a imagem ao Cloudinary), com `Idempotent-Replayed: true`;
+- repetição enquanto a primeira ainda roda: 409;
+- mesma chave com outro corpo: 422.
+
+Exceções e respostas 5xx apagam a chave, para que o cliente possa tentar de
+novo. As chaves expiram após IDEMPOTENCIA_TTL_HORAS (`limpar_idempotencia`).
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import ChaveIdempotencia
+
+CABECALHO = 'Idempotency-Key'
+
+PARAMETRO_IDEMPOTENCIA = OpenApiParameter(
+    name=CABECALHO, type=str, location=OpenApiParameter.HEADER, required=False,
+    description='Chave única por operação (ex.: UUID). Repetir a requisição com a mesma chave '
+                'devolve a resposta original sem executar a operação de novo.',
+)
+
+
+class RequisicaoEmAndamento(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Uma requisição com esta Idempotency-Key ainda está em andamento.'
+    default_code = 'idempotencia_em_andamento'
+
+
+class ChaveIdempotenciaReutilizada(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Esta Idempotency-Key já foi usada com outra requisição.'
+    default_code = 'idempotencia_reutilizada'
+
+
+def impressao_requisicao(request):
+    """sha256 de método, caminho e corpo (arquivos pelo conteúdo)."""
+    resumo = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    dados = request.data
+    if hasattr(dados, 'lists'):
+        itens = sorted(dados.lists())
+    elif isinstance(dados, dict):
+        itens = sorted((nome, [valor]) for nome, valor in dados.items())
+    else:
+        itens = [('', [dados])]
+    for nome, valores in itens:
+        resumo.update(f'{nome}='.encode())
+        for valor in valores:
+            if hasattr(valor, 'chunks'):
+                for pedaco in valor.chunks():
+                    resumo.update(pedaco)
+                valor.seek(0)
+            else:
+                resumo.update(json.dumps(valor, sort_keys=True, default=str).encode())
+            resumo.update(b'\0')
+    return resumo.hexdigest()
+
+
+def _reservar(request, escopo, chave, impressao):
+    """Cria a chave EM_ANDAMENTO e devolve (registro, None), ou (None, resposta) se já existir."""
+    agora = timezone.now()
+    ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+    abandono = timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_ANDAMENTO_SEGUNDOS', 120))
+    filtro = {'usuario': request.user, 'escopo': escopo, 'chave': chave}
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return ChaveIdempotencia.objects.create(
+                    **filtro, impressao=impressao, criado_em=agora, expira_em=agora + ttl
+                ), None
+        except IntegrityError:
+            pass
+        existente = ChaveIdempotencia.objects.filter(**filtro).first()
+        if existente is not None:
+            break
+    else:
+        # Apagada e recriada entre as tentativas: outra requisição está com ela
+        raise RequisicaoEmAndamento()
+
+    # Expirada, ou EM_ANDAMENTO há tempo demais (processo morreu): esta requisição assume a chave
+    assumivel = existente.expira_em <= agora or (
+        existente.status == 'EM_ANDAMENTO' and existente.criado_em <= agora - abandono
+    )
+    if assumivel:
+        assumidas = ChaveIdempotencia.objects.filter(pk=existente.pk, criado_em=existente.criado_em).update(
+            impressao=impressao, status='EM_ANDAMENTO', status_http=None, resposta=None,
+            criado_em=agora, expira_em=agora + ttl,
+        )
+        if assumidas:
+            existente.refresh_from_db()
+            return existente, None
+        existente.refresh_from_db()
+
+    if existente.impressao != impressao:
+        raise ChaveIdempotenciaReutilizada()
+    if existente.status == 'EM_ANDAMENTO':
+        raise RequisicaoEmAndamento()
+    return None, Response(existente.resposta, status=existente.status_http, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotente(escopo):
+    """Decorador de métodos de view (POST) autenticados."""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltorio(self, request, *args, **kwargs):
+            chave = request.headers.get(CABECALHO)
+            if not chave:
+                return metodo(self, request, *args, **kwargs)
+            if len(chave) > 255:
+                raise serializers.ValidationError({CABECALHO: 'Use no máximo 255 caracteres.'})
+
+            registro, repeticao = _reservar(request, escopo, chave, impressao_requisicao(request))
+            if repeticao is not None:
+                return repeticao
+            try:
+                response = metodo(self, request, *args, **kwargs)
+            except Exception:
+                registro.delete()
+                raise
+            if response.status_code >= 500:
+                registro.delete()
+            else:
+                registro.status = 'CONCLUIDA'
+                registro.status_http = response.status_code
+                registro.resposta = response.data
+                registro.save(update_fields=['status', 'status_http', 'resposta'])
+            return response
+        return envoltorio
+    return decorador
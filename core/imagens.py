@@ -0,0 +1,125 @@
+"""
+Variantes das imagens do Cloudinary servidas pela API.
+
+Listagens devolviam a foto original em cada linha: a fila de moderação e o
+histórico baixavam fotos inteiras para desenhar cards pequenos. As variantes
+ficam definidas só aqui; o Cloudinary gera (e guarda em cache na CDN) cada
+uma a partir da transformação na URL:
+
+    thumb  quadrado de 200px, recorte no ponto de interesse (padrão das listagens)
+    card   600x450, para cards grandes e pré-visualização
+    full   a URL original, a mesma que a API sempre devolveu
+
+O cliente escolhe com ?variante=.
+
+Sem Cloudinary configurado (dev e instalações próprias) as evidências são
+gravadas no MEDIA_ROOT (`salvar_local`) e as variantes são geradas com o
+Pillow na primeira leitura, em variantes/<largura>x<altura>/<arquivo>; as
+seguintes só conferem que o arquivo existe. O MEDIA_URL precisa ser servido
+(em DEBUG pelo próprio Django, ver core/urls.py). Sem o arquivo local, None.
+"""
+import logging
+import os
+from io import BytesIO
+from uuid import uuid4
+
+import cloudinary
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+VARIANTES = {
+    'thumb': {'width': 200, 'height': 200, 'crop': 'fill', 'gravity': 'auto', 'quality': 'auto:eco', 'fetch_format': 'auto'},
+    'card': {'width': 600, 'height': 450, 'crop': 'fill', 'gravity': 'auto', 'quality': 'auto', 'fetch_format': 'auto'},
+    'full': {},
+}
+VARIANTE_LISTAGEM = 'thumb'
+
+PARAMETRO_VARIANTE = OpenApiParameter(
+    name='variante', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+    enum=list(VARIANTES), default=VARIANTE_LISTAGEM,
+    description="Tamanho das fotos na resposta: thumb (200px), card (600x450) ou full (original).",
+)
+
+
+def cloudinary_configurado():
+    return bool(cloudinary.config().cloud_name)
+
+
+def salvar_local(arquivo, pasta):
+    """Grava o upload no MEDIA_ROOT e devolve o nome, guardado no CloudinaryField no lugar do public_id."""
+    extensao = os.path.splitext(arquivo.name)[1].lower() or '.jpg'
+    return default_storage.save(f"{pasta}/{uuid4().hex}{extensao}", arquivo)
+
+
+def _gerar_local(nome, destino, opcoes):
+    with default_storage.open(nome) as original:
+        imagem = Image.open(original)
+        formato = imagem.format or 'JPEG'
+        reduzida = ImageOps.fit(ImageOps.exif_transpose(imagem), (opcoes['width'], opcoes['height']))
+    if formato == 'JPEG' and reduzida.mode not in ('RGB', 'L'):
+        reduzida = reduzida.convert('RGB')
+    saida = BytesIO()
+    reduzida.save(saida, format=formato)
+    return default_storage.save(destino, ContentFile(saida.getvalue()))
+
+
+def _url_local(recurso, variante):
+    nome = f"{recurso.public_id}.{recurso.format}" if recurso.format else recurso.public_id
+    if not nome or not default_storage.exists(nome):
+        return None
+    opcoes = VARIANTES[variante]
+    if not opcoes:
+        return default_storage.url(nome)
+    destino = f"variantes/{opcoes['width']}x{opcoes['height']}/{nome}"
+    if not default_storage.exists(destino):
+        try:
+            destino = _gerar_local(nome, destino, opcoes)
+        except (OSError, UnidentifiedImageError):
+            logger.warning("Não foi possível gerar a variante %s de %s", variante, nome, exc_info=True)
+            return default_storage.url(nome)
+    return default_storage.url(destino)
+
+
+def url_variante(recurso, variante='full'):
+    """
+    URL da `variante` do recurso: transformação do Cloudinary ou, sem ele
+    configurado, arquivo local redimensionado. None sem foto.
+    """
+    if not recurso:
+        return None
+    if not cloudinary_configurado():
+        return _url_local(recurso, variante)
+    try:
+        opcoes = VARIANTES[variante]
+        return recurso.build_url(**opcoes) if opcoes else recurso.url
+    except (AttributeError, ValueError):
+        return None
+
+
+class VarianteImagemMixin:
+    """
+    Lê ?variante= (padrão `variante_padrao`) e repassa ao serializer (contexto
+    'variante_imagem') e ao leitor do caminho rápido (opção `variante`).
+    """
+
+    variante_padrao = VARIANTE_LISTAGEM
+
+    def variante_imagem(self):
+        variante = self.request.query_params.get('variante') or self.variante_padrao
+        if variante not in VARIANTES:
+            raise ValidationError({'variante': f"Use uma de: {', '.join(VARIANTES)}."})
+        return variante
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['variante_imagem'] = self.variante_imagem()
+        return context
+
+    def opcoes_leitor(self):
+        return {**super().opcoes_leitor(), 'variante': self.variante_imagem()}
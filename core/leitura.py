@@ -0,0 +1,86 @@
+"""
+Caminho rápido de leitura das listagens mais acessadas.
+
+Em vez de instanciar modelos e passar cada linha pelo serializer, a view
+busca tuplas com values_list() (só as colunas e joins necessários) e monta
+os dicts da resposta direto. Cada leitor espelha um serializer campo a campo
+e o JSON resultante é idêntico (testes de contrato em cada app).
+
+Desligado por API_LEITURA_RAPIDA=False, e sempre que a requisição usa
+?fields=/?omit= (campos esparsos) ou ?since= (sincronização), que continuam
+no serializer.
+"""
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Mesma formatação dos campos do DRF (fuso atual, sufixo 'Z' etc.)
+_DATA_HORA = serializers.DateTimeField()
+
+
+def data_hora(valor):
+    return _DATA_HORA.to_representation(valor)
+
+
+def url_cloudinary(recurso):
+    """Como os get_*_url dos serializers: URL do recurso, ou None."""
+    if not recurso:
+        return None
+    try:
+        return recurso.url
+    except (AttributeError, ValueError):
+        return None
+
+
+class Leitor(ABC):
+    """Espelho de um serializer: colunas do values_list() e montagem de cada linha."""
+
+    colunas = ()
+
+    @classmethod
+    def consulta(cls, queryset):
+        return queryset.values_list(*cls.colunas)
+
+    @classmethod
+    def montar(cls, linhas, **opcoes):
+        """`opcoes` (ex.: variante das imagens) vão para cada linha, como o contexto do serializer."""
+        return [cls.linha(*valores, **opcoes) for valores in linhas]
+
+    @classmethod
+    def listar(cls, queryset, **opcoes):
+        return cls.montar(cls.consulta(queryset), **opcoes)
+
+    @staticmethod
+    @abstractmethod
+    def linha(*valores, **opcoes):
+        """Dict da resposta para uma tupla de `colunas`."""
+
+
+class LeituraRapidaMixin:
+    """ListAPIView que usa `leitor_rapido` no lugar do serializer quando possível."""
+
+    leitor_rapido = None
+
+    def leitura_rapida_ativa(self, leitor=None):
+        """`leitor` permite usar o caminho rápido em actions com leitor próprio."""
+        if not getattr(settings, 'API_LEITURA_RAPIDA', True) or (leitor or self.leitor_rapido) is None:
+            return False
+        parametros = self.request.query_params
+        return not any(parametros.get(nome) for nome in ('fields', 'omit')) and 'since' not in parametros
+
+    def opcoes_leitor(self):
+        """Opções repassadas ao leitor (o equivalente do contexto do serializer)."""
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        if not self.leitura_rapida_ativa():
+            return super().list(request, *args, **kwargs)
+
+        opcoes = self.opcoes_leitor()
+        linhas = self.leitor_rapido.consulta(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(linhas)
+        if pagina is not None:
+            return self.get_paginated_response(self.leitor_rapido.montar(pagina, **opcoes))
+        return Response(self.leitor_rapido.montar(linhas, **opcoes))
@@ -0,0 +1,122 @@
+"""
+Requisições em lote: várias leituras da API numa única ida e volta.
+
+Na abertura o app busca dashboard, histórico, badges e tipos; em rede móvel
+cada ida e volta custa mais que a própria consulta. POST /api/lote/ recebe
+os caminhos nomeados e devolve as respostas pela mesma chave:
+
+    {"requisicoes": {"painel": "/api/contas/dashboard/",
+                     "historico": "/api/doacoes/historico/?page_size=20"}}
+
+    {"painel": {"status": 200, "corpo": {...}},
+     "historico": {"status": 200, "corpo": {"count": ..., "results": [...]}}}
+
+Cada sub-requisição é um GET resolvido pelas URLs e chamado direto na view,
+no mesmo processo e conexão com o banco: sem repetir middlewares nem a
+autenticação JWT (o usuário já autenticado é repassado). Só rotas de
+LOTE_ROTAS_PERMITIDAS (nomes de URL) são aceitas, até LOTE_MAXIMO por lote.
+Os corpos já renderizados são emendados no JSON final, sem reinterpretar.
+"""
+import json
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+# Cabeçalhos da requisição externa que não valem para as sub-requisições
+_CABECALHOS_IGNORADOS = (
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IDEMPOTENCY_KEY', 'HTTP_ACCEPT_ENCODING',
+)
+
+
+class LoteSerializer(serializers.Serializer):
+    requisicoes = serializers.DictField(
+        child=serializers.CharField(max_length=1000), allow_empty=False,
+        help_text="Chave da resposta -> caminho GET (com query string), ex.: /api/doacoes/historico/?page=2",
+    )
+
+    def validate_requisicoes(self, requisicoes):
+        maximo = getattr(settings, 'LOTE_MAXIMO', 10)
+        if len(requisicoes) > maximo:
+            raise serializers.ValidationError(f"No máximo {maximo} requisições por lote.")
+        permitidas = set(getattr(settings, 'LOTE_ROTAS_PERMITIDAS', ()))
+        resolvidas = {}
+        for chave, caminho in requisicoes.items():
+            partes = urlsplit(caminho)
+            if partes.scheme or partes.netloc or not partes.path.startswith('/api/'):
+                raise serializers.ValidationError(f"{chave}: informe um caminho da API, ex.: /api/contas/dashboard/.")
+            try:
+                rota = resolve(partes.path)
+            except Resolver404:
+                raise serializers.ValidationError(f"{chave}: caminho inexistente ({partes.path}).")
+            if rota.url_name not in permitidas:
+                raise serializers.ValidationError(f"{chave}: {partes.path} não é permitido em lote.")
+            resolvidas[chave] = (partes.path, partes.query, rota)
+        return resolvidas
+
+
+def _sub_requisicao(requisicao, caminho, query, rota, usuario):
+    """Cópia GET da HttpRequest original para `caminho`, já autenticada como `usuario`."""
+    original = requisicao._request
+    sub = original.__class__.__new__(original.__class__)
+    sub.__dict__.update({
+        chave: valor for chave, valor in original.__dict__.items()
+        if chave not in ('_stream', '_post', '_files', '_body', 'GET', 'POST', 'FILES', 'COOKIES')
+    })
+    meta = {chave: valor for chave, valor in original.META.items() if chave not in _CABECALHOS_IGNORADOS}
+    meta.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': caminho, 'QUERY_STRING': query, 'HTTP_ACCEPT': 'application/json'})
+    sub.META = meta
+    sub.method = 'GET'
+    sub.path = sub.path_info = caminho
+    sub.resolver_match = rota
+    sub.GET = QueryDict(query)
+    sub.POST = QueryDict()
+    sub.COOKIES = original.COOKIES
+    sub._read_started = False
+    # Lido pela Request do DRF: dispensa autenticar de novo (JWT e consulta do usuário)
+    sub._force_auth_user = usuario
+    sub._force_auth_token = requisicao.auth
+    return sub
+
+
+def executar(requisicao, resolvidas):
+    """Roda as sub-requisições e devolve o corpo JSON (bytes) do lote."""
+    partes = []
+    for chave, (caminho, query, rota) in resolvidas.items():
+        sub = _sub_requisicao(requisicao, caminho, query, rota, requisicao.user)
+        resposta = rota.func(sub, *rota.args, **rota.kwargs)
+        if hasattr(resposta, 'render'):
+            resposta.render()
+        corpo = resposta.content if resposta.get('Content-Type', '').startswith('application/json') else b''
+        partes.append(
+            json.dumps(chave).encode() + b':{"status":' + str(resposta.status_code).encode()
+            + b',"corpo":' + (corpo or b'null') + b'}'
+        )
+    return b'{' + b','.join(partes) + b'}'
+
+
+@extend_schema(
+    tags=['Root'],
+    summary='Requisições em lote',
+    description=(
+        "Executa várias leituras (GET) permitidas numa única requisição e devolve "
+        "{chave: {status, corpo}} na mesma ordem."
+    ),
+    request=LoteSerializer,
+    responses={200: OpenApiTypes.OBJECT},
+)
+class LoteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = LoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        corpo = executar(request, serializer.validated_data['requisicoes'])
+        return HttpResponse(corpo, content_type='application/json')
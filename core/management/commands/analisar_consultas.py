@@ -0,0 +1,54 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from contas.models import Usuario
+from core.consultas import Contexto, analisar, registradas, relatorio
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda as consultas registradas (<app>/consultas.py) por EXPLAIN, aponta "
+        "varreduras, ordenações e estimativas grandes e sugere índices. O relatório "
+        "é estável, para ser versionado e comparado com diff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consulta', action='append', dest='consultas',
+                            help="Nome da consulta (pode repetir). Padrão: todas.")
+        parser.add_argument('--saida', help="Grava o relatório neste arquivo (padrão: stdout).")
+        parser.add_argument('--linhas', type=int, default=10000,
+                            help="Estimativa de linhas a partir da qual um nó é apontado (padrão: 10000).")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--listar', action='store_true', help="Só lista as consultas registradas.")
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            for nome, (_, descricao) in registradas().items():
+                self.stdout.write(f"{nome}: {descricao}")
+            return
+
+        desconhecidas = set(options['consultas'] or []) - set(registradas())
+        if desconhecidas:
+            raise CommandError(f"Consulta(s) não registrada(s): {', '.join(sorted(desconhecidas))}")
+
+        # Valores fixos: o SQL (e portanto o relatório) não muda entre execuções
+        usuario = Usuario(pk=0, username='analise', is_staff=True)
+        contexto = Contexto(usuario=usuario, agora=datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+
+        resultados = analisar(
+            contexto, nomes=options['consultas'], limiar_linhas=options['linhas'], using=options['database']
+        )
+        texto = relatorio(resultados, connections[options['database']].vendor)
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto)
+            com_sugestao = sum(1 for r in resultados if r.sugestoes)
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(resultados)} consulta(s) analisada(s), {com_sugestao} com sugestão de índice. "
+                f"Relatório em {options['saida']}."
+            ))
+        else:
+            self.stdout.write(texto)
@@ -0,0 +1,85 @@
+import time
+from io import BytesIO
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from contas.models import Usuario
+from core.parsers import JSONRapidoParser, orjson
+from core.renderers import JSONRapidoRenderer
+from doacoes.models import Doacao, TipoDoacao
+from doacoes.serializers import DoacaoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o JSON padrão do DRF com o JSON via orjson numa página de "
+        "DoacaoSerializer (objetos em memória, sem banco)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itens', type=int, default=50, help="Doações por página (padrão: 50).")
+        parser.add_argument('--repeticoes', type=int, default=2000, help="Páginas renderizadas por medição (padrão: 2000).")
+
+    def handle(self, *args, **options):
+        if options['itens'] < 1 or options['repeticoes'] < 1:
+            raise CommandError("--itens e --repeticoes devem ser maiores que zero.")
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson não instalado: as duas medições usam o JSON padrão."))
+
+        pagina = self._pagina(options['itens'])
+        repeticoes = options['repeticoes']
+
+        inicio = time.perf_counter()
+        for _ in range(max(1, repeticoes // 20)):
+            dados = {'count': len(pagina), 'next': None, 'previous': None,
+                     'results': DoacaoSerializer(pagina, many=True).data}
+        serializacao = (time.perf_counter() - inicio) / max(1, repeticoes // 20)
+
+        padrao, corpo = self._medir(JSONRenderer().render, dados, repeticoes)
+        rapido, corpo_rapido = self._medir(JSONRapidoRenderer().render, dados, repeticoes)
+        if corpo != corpo_rapido:
+            raise CommandError("Os renderers produziram saídas diferentes.")
+
+        leitura_padrao, _ = self._medir(lambda c: JSONParser().parse(BytesIO(c)), corpo, repeticoes)
+        leitura_rapida, _ = self._medir(lambda c: JSONRapidoParser().parse(BytesIO(c)), corpo, repeticoes)
+
+        self.stdout.write(f"Página com {len(pagina)} doação(ões), {len(corpo)} bytes; {repeticoes} repetição(ões).")
+        self.stdout.write(f"  serialização (DoacaoSerializer): {serializacao * 1000:.3f} ms/página")
+        self._linha("render", padrao, rapido)
+        self._linha("parse", leitura_padrao, leitura_rapida)
+
+    def _linha(self, rotulo, padrao, rapido):
+        self.stdout.write(
+            f"  {rotulo:<6} padrão: {padrao * 1000:.3f} ms/página | orjson: {rapido * 1000:.3f} ms/página "
+            f"({padrao / rapido:.1f}x)"
+        )
+
+    def _medir(self, funcao, dados, repeticoes):
+        resultado = funcao(dados)
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao(dados)
+        return (time.perf_counter() - inicio) / repeticoes, resultado
+
+    def _pagina(self, itens):
+        agora = timezone.now()
+        doador = Usuario(id=1, username='doador_benchmark')
+        admin = Usuario(id=2, username='admin_benchmark', is_staff=True)
+        tipo = TipoDoacao(id=1, nome='Garrafa PET', moedas_atribuidas=10)
+        return [
+            Doacao(
+                id=i, doador=doador, tipo_doacao=tipo, validado_por=admin if i % 2 else None,
+                status='APROVADA' if i % 2 else 'PENDENTE',
+                descricao='Doação de garrafas PET limpas e separadas por cor — lote %d.' % i,
+                evidencia_foto=f'evidencias/benchmark_{i}',
+                data_submissao=agora - timedelta(hours=i),
+                data_validacao=agora if i % 2 else None,
+                atualizado_em=agora,
+            )
+            for i in range(1, itens + 1)
+        ]
+
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ChaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = "Remove as chaves de idempotência expiradas (IDEMPOTENCIA_TTL_HORAS), em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas removidas por DELETE (padrão: 5000).")
+
+    def handle(self, *args, **options):
+        agora = timezone.now()
+        total = 0
+        while True:
+            ids = list(
+                ChaveIdempotencia.objects.filter(expira_em__lte=agora)
+                .order_by('expira_em').values_list('id', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            total += ChaveIdempotencia.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"{total} chave(s) expirada(s) removida(s)."))
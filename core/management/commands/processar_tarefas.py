@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.tarefas import processar_lote
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de tarefas em segundo plano (pode rodar em vários processos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help="Tarefas reservadas por vez (padrão: 20).")
+        parser.add_argument('--nome', action='append', dest='nomes',
+                            help="Processa apenas tarefas com este nome (pode repetir).")
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos de espera quando a fila está vazia (padrão: 2).")
+        parser.add_argument('--uma-vez', action='store_true',
+                            help="Esvazia a fila e termina, em vez de ficar aguardando.")
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                processadas = processar_lote(lote=options['lote'], nomes=options['nomes'])
+                total += processadas
+                if processadas:
+                    self.stdout.write(f"{processadas} tarefa(s) processada(s)")
+                    continue
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{total} tarefa(s) processada(s) no total."))
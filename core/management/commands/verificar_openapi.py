@@ -0,0 +1,47 @@
+import difflib
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.esquema import gerar
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o openapi.yaml versionado com o esquema gerado das views atuais. "
+        "Sai com erro (e o diff) se estiverem diferentes; --atualizar regrava o arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--arquivo', default=str(Path(settings.BASE_DIR) / 'openapi.yaml'),
+            help="Arquivo a comparar (padrão: openapi.yaml na raiz do projeto).",
+        )
+        parser.add_argument('--atualizar', action='store_true', help="Regrava o arquivo com o esquema gerado.")
+        parser.add_argument('--linhas', type=int, default=80, help="Máximo de linhas de diff exibidas (padrão: 80).")
+
+    def handle(self, *args, **options):
+        arquivo = Path(options['arquivo'])
+        gerado = gerar()
+        atual = arquivo.read_bytes() if arquivo.exists() else b''
+
+        if gerado == atual:
+            self.stdout.write(self.style.SUCCESS(f"{arquivo.name} está atualizado."))
+            return
+        if options['atualizar']:
+            arquivo.write_bytes(gerado)
+            self.stdout.write(self.style.SUCCESS(f"{arquivo.name} regravado com o esquema atual."))
+            return
+
+        diff = list(difflib.unified_diff(
+            atual.decode().splitlines(), gerado.decode().splitlines(),
+            fromfile=f'{arquivo.name} (versionado)', tofile=f'{arquivo.name} (gerado)', lineterm='',
+        ))
+        for linha in diff[:options['linhas']]:
+            self.stdout.write(linha)
+        if len(diff) > options['linhas']:
+            self.stdout.write(f"... mais {len(diff) - options['linhas']} linha(s) de diff")
+        raise CommandError(
+            f"{arquivo.name} está desatualizado. Rode `python manage.py verificar_openapi --atualizar` e versione o arquivo."
+        )
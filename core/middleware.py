@@ -0,0 +1,132 @@
+"""
+Compressão negociada (brotli/gzip) das respostas da API.
+
+Só atua em /api/, em tipos textuais (JSON, OpenAPI, HTML da API navegável)
+acima de COMPRESSAO_TAMANHO_MINIMO bytes. Respostas em streaming são
+comprimidas pedaço a pedaço, com flush a cada pedaço; SSE (text/event-stream)
+e streaming assíncrono passam sem compressão, para não atrasar eventos.
+
+Roda nos dois modos (sync e async), sem adaptação por thread sob o servidor
+ASGI. Um ETag forte continua forte: a representação comprimida ganha o sufixo
+da codificação ("v1" -> "v1-gzip"), como o esquema OpenAPI (core/esquema.py);
+se o corpo não mudar, o ETag fica como veio.
+
+brotli vem do requirements.txt; se o pacote faltar no ambiente, só gzip é oferecido.
+"""
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - ambiente sem o requirements.txt completo
+    brotli = None
+
+TIPOS_COMPRIMIVEIS = ('application/json', 'application/vnd.oai.openapi', 'application/yaml', 'text/')
+TIPOS_IGNORADOS = ('text/event-stream',)
+
+_RE_ETAG_FORTE = re.compile(r'^"[^"]*"$')
+
+
+def escolher_codificacao(accept_encoding):
+    """'br', 'gzip' ou None, respeitando os q-values do Accept-Encoding."""
+    aceitas = {}
+    for item in accept_encoding.split(','):
+        nome, _, parametros = item.strip().partition(';')
+        qualidade = 1.0
+        for parametro in parametros.split(';'):
+            chave, _, valor = parametro.strip().partition('=')
+            if chave == 'q':
+                try:
+                    qualidade = float(valor)
+                except ValueError:
+                    qualidade = 0.0
+        if nome:
+            aceitas[nome.lower()] = qualidade
+
+    curinga = aceitas.get('*', 0.0)
+    for codificacao in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if aceitas.get(codificacao, curinga) > 0:
+            return codificacao
+    return None
+
+
+class _Compressor:
+    def __init__(self, codificacao):
+        if codificacao == 'br':
+            self._obj = brotli.Compressor(quality=getattr(settings, 'COMPRESSAO_NIVEL_BROTLI', 4))
+            self._pedaco, self._flush, self._fim = self._obj.process, self._obj.flush, self._obj.finish
+        else:
+            # wbits=31: cabeçalho e trailer gzip
+            self._obj = zlib.compressobj(getattr(settings, 'COMPRESSAO_NIVEL_GZIP', 6), zlib.DEFLATED, 31)
+            self._pedaco, self._fim = self._obj.compress, self._obj.flush
+            self._flush = lambda: self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def comprimir(self, dados):
+        return self._pedaco(dados) + self._fim()
+
+    def comprimir_sequencia(self, pedacos):
+        for pedaco in pedacos:
+            saida = self._pedaco(pedaco) + self._flush()
+            if saida:
+                yield saida
+        yield self._fim()
+
+
+class CompressaoApiMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._processar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._processar(request, await self.get_response(request))
+
+    def _processar(self, request, response):
+        if not request.path.startswith('/api/') or not self._comprimivel(response):
+            return response
+
+        # Daqui em diante a resposta depende do Accept-Encoding, comprimida ou não
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacao = escolher_codificacao(request.headers.get('Accept-Encoding', ''))
+        if codificacao is None:
+            return response
+
+        compressor = _Compressor(codificacao)
+        if response.streaming:
+            response.streaming_content = compressor.comprimir_sequencia(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            comprimido = compressor.comprimir(response.content)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+
+        # O corpo mudou: cada codificação é outra representação, com seu próprio ETag forte
+        etag = response.get('ETag')
+        if etag and _RE_ETAG_FORTE.match(etag):
+            response.headers['ETag'] = f'{etag[:-1]}-{codificacao}"'
+        response.headers['Content-Encoding'] = codificacao
+        return response
+
+    def _comprimivel(self, response):
+        if response.has_header('Content-Encoding') or response.has_header('Content-Range'):
+            return False
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not tipo.startswith(TIPOS_COMPRIMIVEIS) or tipo.startswith(TIPOS_IGNORADOS):
+            return False
+        if response.streaming:
+            return not response.is_async
+        return len(response.content) >= getattr(settings, 'COMPRESSAO_TAMANHO_MINIMO', 1024)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=50)),
+                ('chave', models.CharField(max_length=255)),
+                ('impressao', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('EM_ANDAMENTO', 'Em andamento'), ('CONCLUIDA', 'Concluída')], default='EM_ANDAMENTO', max_length=12)),
+                ('status_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('resposta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira_em', models.DateTimeField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Chave de idempotência',
+                'verbose_name_plural': 'Chaves de idempotência',
+                'indexes': [models.Index(fields=['expira_em'], name='core_chavei_expira__2370ee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'escopo', 'chave'), name='core_idempotencia_chave_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def _chave_aleatoria():
+    return uuid4().hex
+
+
+class Tarefa(models.Model):
+    """
+    Tarefa da fila de execução em segundo plano (ver core/tarefas.py).
+
+    `chave` é a chave de idempotência: enfileirar duas vezes com a mesma chave
+    devolve a tarefa já existente em vez de criar outra.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('EM_EXECUCAO', 'Em execução'),
+        ('CONCLUIDA', 'Concluída'),
+        ('FALHOU', 'Falhou'),
+    ]
+
+    nome = models.CharField(max_length=100)
+    chave = models.CharField(max_length=200, unique=True, default=_chave_aleatoria)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveIntegerField(default=0)
+    max_tentativas = models.PositiveIntegerField(default=5)
+    executar_apos = models.DateTimeField(default=timezone.now)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Tarefa"
+        verbose_name_plural = "Tarefas"
+        indexes = [
+            # Serve apenas a consulta do worker: tarefas prontas para execução
+            models.Index(
+                fields=['executar_apos'],
+                condition=Q(status__in=['PENDENTE', 'EM_EXECUCAO']),
+                name='core_tarefa_fila_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} [{self.chave}] ({self.status})"
+
+
+class ChaveIdempotencia(models.Model):
+    """
+    Resultado de uma requisição feita com o cabeçalho Idempotency-Key (ver core/idempotencia.py).
+
+    A chave vale por usuário e por escopo (endpoint). `impressao` é o hash da
+    requisição: a mesma chave com outro corpo é recusada. A linha é criada
+    EM_ANDAMENTO antes de a view rodar, o que detecta duplicatas simultâneas.
+    """
+
+    STATUS_CHOICES = [
+        ('EM_ANDAMENTO', 'Em andamento'),
+        ('CONCLUIDA', 'Concluída'),
+    ]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    escopo = models.CharField(max_length=50)
+    chave = models.CharField(max_length=255)
+    impressao = models.CharField(max_length=64)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='EM_ANDAMENTO')
+    status_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    resposta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    criado_em = models.DateTimeField(default=timezone.now)
+    expira_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Chave de idempotência"
+        verbose_name_plural = "Chaves de idempotência"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'escopo', 'chave'], name='core_idempotencia_chave_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['expira_em']),
+        ]
+
+    def __str__(self):
+        return f"{self.escopo}:{self.chave} ({self.status})"
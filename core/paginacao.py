@@ -0,0 +1,126 @@
+"""
+Paginação do admin para tabelas grandes (Doacao, UsuarioBadge, outbox...).
+
+- PaginadorEstimado: no PostgreSQL, troca o COUNT(*) pela estimativa do
+  planejador (pg_class.reltuples sem filtro; linhas do EXPLAIN com filtro).
+  Abaixo de ADMIN_CONTAGEM_EXATA_ATE a contagem continua exata.
+- AdminEscalavelMixin: aplica o paginador, desliga a contagem total sem
+  filtros e adiciona o link "próxima página" por keyset (?apos=), que não
+  usa OFFSET e custa o mesmo em qualquer profundidade.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+PARAMETRO_APOS = 'apos'
+
+
+def contagem_estimada(queryset):
+    """Linhas estimadas pelo planejador do PostgreSQL, ou None (outros bancos / tabela sem estatística)."""
+    conexao = connections[queryset.db]
+    if conexao.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [queryset.model._meta.db_table],
+            )
+            linha = cursor.fetchone()
+        # -1: tabela ainda não analisada (ANALYZE/autovacuum)
+        return linha[0] if linha and linha[0] >= 0 else None
+    plano = json.loads(queryset.order_by().explain(format='json'))
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    @cached_property
+    def estimada(self):
+        estimativa = contagem_estimada(self.object_list)
+        if estimativa is None or estimativa < getattr(settings, 'ADMIN_CONTAGEM_EXATA_ATE', 10000):
+            return None
+        return estimativa
+
+    @cached_property
+    def count(self):
+        if self.estimada is not None:
+            return self.estimada
+        return self.object_list.count()
+
+
+class ChangeListKeyset(ChangeList):
+    """ChangeList que aceita ?apos=<valor>|<pk> e expõe `url_proxima_pagina`."""
+
+    def __init__(self, request, *args, **kwargs):
+        self.apos = request.GET.get(PARAMETRO_APOS)
+        self.url_proxima_pagina = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        parametros = super().get_filters_params(params)
+        parametros.pop(PARAMETRO_APOS, None)
+        return parametros
+
+    @property
+    def keyset_ativo(self):
+        # Só vale na ordenação padrão: se o usuário reordenar, volta o OFFSET
+        return self.model_admin.campo_keyset is not None and ORDER_VAR not in self.params
+
+    def _campo_keyset(self):
+        nome = self.model_admin.campo_keyset
+        return nome.lstrip('-'), nome.startswith('-')
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if not self.apos or not self.keyset_ativo:
+            return queryset
+        nome, decrescente = self._campo_keyset()
+        try:
+            valor, _, pk = self.apos.rpartition('|')
+            valor = self.lookup_opts.get_field(nome).to_python(valor)
+            pk = self.lookup_opts.pk.to_python(pk)
+        except (ValidationError, ValueError):
+            raise IncorrectLookupParameters
+        operador = 'lt' if decrescente else 'gt'
+        return queryset.filter(
+            Q(**{f'{nome}__{operador}': valor}) | Q(**{nome: valor, f'pk__{operador}': pk})
+        )
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.keyset_ativo or not self.multi_page:
+            return
+        linhas = list(self.result_list)
+        if len(linhas) < self.list_per_page:
+            return
+        nome, _ = self._campo_keyset()
+        ultima = linhas[-1]
+        valor = getattr(ultima, nome)
+        valor = valor.isoformat() if hasattr(valor, 'isoformat') else valor
+        self.url_proxima_pagina = self.get_query_string(
+            {PARAMETRO_APOS: f'{valor}|{ultima.pk}'}, remove=[PAGE_VAR]
+        )
+
+
+class AdminEscalavelMixin:
+    """
+    ModelAdmin de tabela grande. Defina `campo_keyset` com o primeiro campo de
+    `ordering` (ex.: '-data_submissao'); o pk entra como desempate.
+    """
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    campo_keyset = None
+    change_list_template = 'admin/change_list_keyset.html'
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListKeyset
@@ -0,0 +1,44 @@
+"""
+Renderer JSON com orjson para a API.
+
+Mesma saída do JSONRenderer do DRF (compacto, UTF-8, U+2028/U+2029 escapados,
+datas/Decimal/strings lazy pelo encoder do DRF), só que codificado em C.
+Sem orjson instalado, com indentação pedida (API navegável, ?indent) ou com
+algum valor que o orjson não aceite, cai no JSONRenderer padrão.
+
+Global: REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] (ver API_JSON_RAPIDO).
+Por view: renderer_classes = [JSONRapidoRenderer].
+"""
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+if orjson is not None:
+    # Datas vão para o encoder do DRF para manter o formato atual (ex.: sufixo 'Z')
+    OPCOES_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+class JSONRapidoRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=OPCOES_ORJSON)
+        except TypeError:
+            # Ex.: inteiros acima de 64 bits, tipos que o encoder do DRF recusa
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Como o DRF: U+2028/U+2029 são válidos em JSON mas quebram JavaScript embutido
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
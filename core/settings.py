@@ -1,6 +1,7 @@
 from pathlib import Path
 from dotenv import load_dotenv
 import os, sys
+from importlib.util import find_spec
 import dj_database_url
 import cloudinary
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     'cloudinary',
     
     # Apps
+    'core',
     'contas',
     'doacoes',
 ]
@@ -55,6 +57,7 @@ if DEBUG and not TESTING:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressaoApiMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -66,7 +69,8 @@ MIDDLEWARE = [
 ]
 
 if DEBUG and not TESTING:
-    MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+    # Depois da compressão: o toolbar precisa ver o HTML ainda sem codificação
+    MIDDLEWARE.insert(2, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
 ROOT_URLCONF = 'core.urls'
 
@@ -107,16 +111,46 @@ else:
     else:
         DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'}}
 
+if 'postgresql' in DATABASES['default']['ENGINE']:
+    # Identifica as conexões da aplicação em pg_stat_activity (buracos do outbox, doacoes/eventos.py)
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('application_name', os.getenv('DB_APLICACAO', 'ecodoacao'))
+
 if TESTING:
     DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
 
 AUTH_USER_MODEL = 'contas.Usuario'
 
+# Token JWT e admin aceitam username ou email institucional
+AUTHENTICATION_BACKENDS = ['contas.backends.EmailOuUsernameBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "core.validators.MinSixAlphaNumericValidator"},
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
 ]
 
+# Hash de senha (core/hashers.py). 'argon2' (requer argon2-cffi), 'scrypt' ou
+# 'pbkdf2'. Hashes de outro algoritmo ou com outros parâmetros são regravados no
+# próximo login. Meça os custos com `python manage.py benchmark_login`.
+SENHA_ALGORITMO = os.getenv('SENHA_ALGORITMO', 'argon2' if find_spec('argon2') else 'scrypt')
+SENHA_ARGON2_TEMPO = int(os.getenv('SENHA_ARGON2_TEMPO', '2'))  # passadas
+SENHA_ARGON2_MEMORIA_KIB = int(os.getenv('SENHA_ARGON2_MEMORIA_KIB', '19456'))  # 19 MiB
+SENHA_ARGON2_PARALELISMO = int(os.getenv('SENHA_ARGON2_PARALELISMO', '1'))  # workers síncronos: 1 thread
+SENHA_SCRYPT_N = int(os.getenv('SENHA_SCRYPT_N', str(2 ** 14)))  # 16 MiB com r=8
+SENHA_SCRYPT_R = int(os.getenv('SENHA_SCRYPT_R', '8'))
+SENHA_SCRYPT_P = int(os.getenv('SENHA_SCRYPT_P', '1'))
+
+_HASHERS_SENHA = {
+    'argon2': 'core.hashers.Argon2Configuravel',
+    'scrypt': 'core.hashers.ScryptConfiguravel',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_HASHERS_SENHA[SENHA_ALGORITMO]] + [
+    caminho for algoritmo, caminho in _HASHERS_SENHA.items() if algoritmo != SENHA_ALGORITMO
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+if TESTING:
+    # Milhares de senhas criadas pelos testes: hash barato (testes de hash usam override_settings)
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher', *PASSWORD_HASHERS]
+
 LANGUAGE_CODE = 'pt-br'
 TIME_ZONE = 'America/Recife'
 USE_I18N = True
@@ -127,7 +161,13 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-# Cloudinary (única fonte de mídia)
+# Cache compartilhado entre os workers (limites de requisição em core/throttling.py).
+# Sem REDIS_URL cada processo usa o próprio cache em memória.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL and not TESTING:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+
+# Cloudinary; sem ele as evidências e suas variantes ficam no MEDIA_ROOT (core/imagens.py)
 CLOUDINARY_URL = os.getenv('CLOUDINARY_URL')
 if CLOUDINARY_URL:
     cloudinary.config(cloudinary_url=CLOUDINARY_URL)
@@ -166,8 +206,114 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'EXCEPTION_HANDLER': 'core.exceptions.drf_exception_handler',
+    # Proxies reversos confiáveis à frente da aplicação (o balanceador do Render, um
+    # nginx). O IP de um anônimo nos limites de requisição é o que o último deles
+    # anexou ao X-Forwarded-For; o resto do cabeçalho vem do cliente e é ignorado.
+    # 0 (padrão) = acesso direto: só REMOTE_ADDR. No Render use 1 (render.yaml).
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+}
+
+# JSON da API via orjson (core/renderers.py, core/parsers.py); sem orjson
+# instalado as classes caem sozinhas no JSON padrão do DRF.
+API_JSON_RAPIDO = os.getenv('API_JSON_RAPIDO', 'True').lower() in ('true', '1', 'yes')
+if API_JSON_RAPIDO:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'core.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'core.parsers.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
+# Listagens mais acessadas montam o JSON direto de values_list(), sem o
+# serializer (core/leitura.py). False volta ao caminho do serializer.
+API_LEITURA_RAPIDA = os.getenv('API_LEITURA_RAPIDA', 'True').lower() in ('true', '1', 'yes')
+
+# Compressão das respostas de /api/ (core/middleware.py): brotli quando o
+# cliente aceita, senão gzip.
+COMPRESSAO_TAMANHO_MINIMO = int(os.getenv('COMPRESSAO_TAMANHO_MINIMO', '1024'))  # bytes
+COMPRESSAO_NIVEL_GZIP = int(os.getenv('COMPRESSAO_NIVEL_GZIP', '6'))  # 1-9
+COMPRESSAO_NIVEL_BROTLI = int(os.getenv('COMPRESSAO_NIVEL_BROTLI', '4'))  # 0-11
+
+# Fila de tarefas em segundo plano (core/tarefas.py, worker: `processar_tarefas`).
+# Com TAREFAS_SINCRONAS as tarefas rodam no próprio request (testes/dev sem worker).
+TAREFAS_SINCRONAS = os.getenv('TAREFAS_SINCRONAS', str(TESTING)).lower() in ('true', '1', 'yes')
+TAREFAS_BACKOFF_BASE = int(os.getenv('TAREFAS_BACKOFF_BASE', '5'))  # segundos, dobra a cada falha
+TAREFAS_TEMPO_LIMITE = int(os.getenv('TAREFAS_TEMPO_LIMITE', '300'))  # sem batimento() após isso, a tarefa é reservada de novo
+
+# Limites de requisição por balde de tokens (core/throttling.py), por usuário
+# autenticado ou por IP (ver NUM_PROXIES). Formato '<quantidade>/<s|min|hour|day>'.
+# Sem REDIS_URL cada worker tem os próprios baldes (aviso na inicialização).
+THROTTLE_HABILITADO = os.getenv('THROTTLE_HABILITADO', str(not TESTING)).lower() in ('true', '1', 'yes')
+THROTTLE_TAXAS = {
+    'doacoes_submeter': os.getenv('THROTTLE_DOACOES_SUBMETER', '10/min'),
+    'contas_token': os.getenv('THROTTLE_CONTAS_TOKEN', '20/min'),
+    'contas_cadastro': os.getenv('THROTTLE_CONTAS_CADASTRO', '10/hour'),
 }
 
+# Requisições em lote (core/lote.py): nomes de URL que podem ser lidos via
+# POST /api/lote/ e quantas sub-requisições cabem num lote.
+LOTE_ROTAS_PERMITIDAS = os.getenv(
+    'LOTE_ROTAS_PERMITIDAS',
+    'dashboard,meu-perfil,doacao_historico,doacao_tipos,badge-list,badge-minhas-badges,badge-disponiveis',
+).split(',')
+LOTE_MAXIMO = int(os.getenv('LOTE_MAXIMO', '10'))
+
+# Idempotency-Key em submeter/comprar (core/idempotencia.py): por quanto tempo a
+# resposta fica guardada e após quantos segundos uma chave EM_ANDAMENTO é tida
+# como abandonada (processo que morreu no meio).
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv('IDEMPOTENCIA_TTL_HORAS', '24'))
+IDEMPOTENCIA_ANDAMENTO_SEGUNDOS = int(os.getenv('IDEMPOTENCIA_ANDAMENTO_SEGUNDOS', '120'))
+
+# Exclusão de usuários (tarefa `contas.purgar_usuario`): linhas removidas por transação.
+EXCLUSAO_USUARIO_LOTE = int(os.getenv('EXCLUSAO_USUARIO_LOTE', '500'))
+
+# Outbox de eventos (doacoes/eventos.py): fora do PostgreSQL, por quanto tempo,
+# desde que o leitor o viu, um buraco na sequência de ids é tratado como
+# transação ainda não confirmada. Em PostgreSQL a espera dura enquanto as
+# transações da aplicação abertas naquele momento não terminam, até
+# OUTBOX_ESPERA_MAXIMA_SEGUNDOS: depois disso o buraco é pulado (com log de erro).
+OUTBOX_MARGEM_SEGUNDOS = int(os.getenv('OUTBOX_MARGEM_SEGUNDOS', '5'))
+OUTBOX_ESPERA_MAXIMA_SEGUNDOS = int(os.getenv('OUTBOX_ESPERA_MAXIMA_SEGUNDOS', '60'))
+
+# SSE (doacoes/stream.py): intervalo do heartbeat, que também é o intervalo
+# máximo entre consultas ao outbox quando nenhuma notificação chega.
+SSE_HEARTBEAT_SEGUNDOS = int(os.getenv('SSE_HEARTBEAT_SEGUNDOS', '15'))
+# Validade do ticket de uso único que abre o fluxo (?ticket=) no lugar do JWT na URL.
+SSE_TICKET_SEGUNDOS = int(os.getenv('SSE_TICKET_SEGUNDOS', '30'))
+
+# Modo ?since= das listagens de doações (doacoes/sincronizacao.py): janela
+# reenviada a cada sincronização para cobrir commits que chegam fora de ordem.
+SINCRONIZACAO_MARGEM_SEGUNDOS = int(os.getenv('SINCRONIZACAO_MARGEM_SEGUNDOS', '5'))
+
+# Arquivamento (comando `arquivar_doacoes`): idade, em dias, a partir da qual
+# doações aprovadas/recusadas saem da tabela quente para DoacaoArquivada.
+ARQUIVAMENTO_DIAS = int(os.getenv('ARQUIVAMENTO_DIAS', '365'))
+
+# Relatórios (doacoes/resumos.py): janela, em segundos, em que as publicações do
+# outbox são agrupadas numa única consolidação dos resumos diários.
+RESUMOS_INTERVALO_SEGUNDOS = int(os.getenv('RESUMOS_INTERVALO_SEGUNDOS', '60'))
+
+# Fotos repetidas (doacoes/similaridade.py): bits de diferença no dHash (de 64)
+# até os quais duas evidências aparecem como parecidas na fila de moderação.
+SIMILARIDADE_DISTANCIA_MAXIMA = int(os.getenv('SIMILARIDADE_DISTANCIA_MAXIMA', '6'))
+
+# Catálogo em memória de TipoDoacao e badges (doacoes/catalogo.py): sem cache
+# compartilhado, segundos que cada processo confia no seu retrato. Com Redis a
+# versão é conferida a cada acesso. 0 desliga (padrão nos testes).
+CATALOGO_TTL_SEGUNDOS = int(os.getenv('CATALOGO_TTL_SEGUNDOS', '0' if TESTING else '30'))
+
+# Admin: listas com mais linhas que isto (estimativa do PostgreSQL) mostram o
+# total estimado em vez de rodar COUNT(*) (core/paginacao.py).
+ADMIN_CONTAGEM_EXATA_ATE = int(os.getenv('ADMIN_CONTAGEM_EXATA_ATE', '10000'))
+
+# Badges: retroatribui badges de conquista aos usuários já qualificados
+# sempre que uma badge é criada/alterada (admin ou API). Desligado por padrão;
+# o comando `retroagir_badges` faz o mesmo sob demanda.
+BADGES_RETROAGIR_AO_SALVAR = os.getenv('BADGES_RETROAGIR_AO_SALVAR', 'False').lower() in ('true', '1', 'yes')
+
 # Spectacular
 SPECTACULAR_SETTINGS = {
     'TITLE': 'EcoDoação API',
@@ -180,6 +326,10 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
+# Esquema servido da memória (core/esquema.py): max-age do /api/schema/; depois
+# disso o cliente revalida pelo ETag e recebe 304.
+OPENAPI_CACHE_SEGUNDOS = int(os.getenv('OPENAPI_CACHE_SEGUNDOS', '300'))
+
 # Debug Toolbar
 if DEBUG and not TESTING:
     import socket
@@ -0,0 +1,217 @@
+"""
+Fila de tarefas em segundo plano apoiada no banco de dados.
+
+Uso:
+    from core.tarefas import tarefa, enfileirar
+
+    @tarefa('doacoes.premiar_doacao')
+    def premiar_doacao(doacao_id):
+        ...
+
+    enfileirar('doacoes.premiar_doacao', {'doacao_id': 1}, chave='premiar-doacao:1')
+
+As funções ficam em <app>/tarefas.py (descobertas automaticamente) e são
+executadas pelo comando `processar_tarefas`. O worker reserva tarefas com
+SELECT ... FOR UPDATE SKIP LOCKED, então vários processos podem consumir a
+mesma fila. Falhas são reexecutadas com backoff exponencial.
+
+Com TAREFAS_SINCRONAS=True a tarefa é executada no próprio enfileiramento
+(útil em testes e em desenvolvimento sem worker).
+
+Uma tarefa em execução há mais de TAREFAS_TEMPO_LIMITE segundos é tida como
+abandonada e pode ser reservada de novo. Tarefas longas chamam `batimento()`
+entre lotes para renovar esse prazo; se a reserva já tiver passado para outro
+worker, o batimento interrompe a execução em vez de duplicá-la.
+"""
+import contextvars
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .consultas import consulta
+from .models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+_REGISTRO = {}
+
+# Tarefa que está rodando neste contexto, para o batimento()
+_atual = contextvars.ContextVar('tarefa_atual', default=None)
+
+
+class ReservaPerdida(Exception):
+    """A tarefa passou a outro worker (prazo vencido) enquanto este a executava."""
+
+
+def tarefa(nome, atomica=True):
+    """
+    Registra a função como tarefa `nome`.
+
+    Tarefas atômicas rodam na mesma transação que as marca como concluídas:
+    ou o efeito e a conclusão são gravados juntos, ou nada é. Essa transação
+    mantém a linha da tarefa bloqueada, então ela não é reservada de novo
+    enquanto roda. Tarefas não atômicas que possam passar de
+    TAREFAS_TEMPO_LIMITE devem chamar `batimento()` periodicamente.
+    """
+    def decorador(funcao):
+        _REGISTRO[nome] = (funcao, atomica)
+        return funcao
+    return decorador
+
+
+def enfileirar(nome, payload=None, chave=None, executar_apos=None, max_tentativas=None):
+    """Enfileira a tarefa e a devolve; se `chave` já existir, devolve a tarefa existente."""
+    if nome not in _REGISTRO:
+        raise KeyError(f"Tarefa não registrada: {nome}")
+
+    campos = {'nome': nome, 'payload': payload or {}}
+    if executar_apos is not None:
+        campos['executar_apos'] = executar_apos
+    if max_tentativas is not None:
+        campos['max_tentativas'] = max_tentativas
+
+    if chave is None:
+        item = Tarefa.objects.create(**campos)
+        criada = True
+    else:
+        try:
+            with transaction.atomic():
+                item, criada = Tarefa.objects.get_or_create(chave=chave, defaults=campos)
+        except IntegrityError:
+            item, criada = Tarefa.objects.get(chave=chave), False
+
+    if criada and getattr(settings, 'TAREFAS_SINCRONAS', False):
+        _executar_agora(item)
+    return item
+
+
+def reabrir(item):
+    """
+    Devolve à fila uma tarefa que FALHOU (esgotou as tentativas), com as
+    tentativas zeradas. Tarefas em outro status são devolvidas como estão.
+    """
+    reaberta = Tarefa.objects.filter(pk=item.pk, status='FALHOU').update(
+        status='PENDENTE', tentativas=0, executar_apos=timezone.now()
+    )
+    item.refresh_from_db()
+    if reaberta and getattr(settings, 'TAREFAS_SINCRONAS', False):
+        _executar_agora(item)
+    return item
+
+
+def _executar_agora(item):
+    Tarefa.objects.filter(pk=item.pk).update(
+        status='EM_EXECUCAO', tentativas=F('tentativas') + 1, iniciada_em=timezone.now()
+    )
+    item.refresh_from_db()
+    executar(item)
+
+
+def _prontas(agora, nomes=None):
+    limite = agora - timedelta(seconds=getattr(settings, 'TAREFAS_TEMPO_LIMITE', 300))
+    qs = Tarefa.objects.filter(
+        Q(status='PENDENTE', executar_apos__lte=agora) | Q(status='EM_EXECUCAO', iniciada_em__lt=limite)
+    )
+    if nomes:
+        qs = qs.filter(nome__in=nomes)
+    return qs.order_by('executar_apos', 'id')
+
+
+@consulta('core.tarefas_prontas', 'Polling do worker (`processar_tarefas`)')
+def _consulta_prontas(contexto):
+    return _prontas(contexto.agora).values_list('id', flat=True)[:10]
+
+
+def reservar(lote=10, nomes=None):
+    """
+    Reserva até `lote` tarefas prontas para este worker e as devolve.
+
+    Tarefas em execução há mais de TAREFAS_TEMPO_LIMITE segundos sem
+    `batimento()` são consideradas abandonadas (worker morto) e podem ser
+    reservadas de novo.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        qs = _prontas(agora, nomes).select_for_update(skip_locked=True)
+        ids = list(qs.values_list('id', flat=True)[:lote])
+        if not ids:
+            return []
+        Tarefa.objects.filter(id__in=ids).update(
+            status='EM_EXECUCAO', tentativas=F('tentativas') + 1, iniciada_em=agora
+        )
+    return list(Tarefa.objects.filter(id__in=ids).order_by('executar_apos', 'id'))
+
+
+def _backoff(tentativas):
+    base = getattr(settings, 'TAREFAS_BACKOFF_BASE', 5)
+    return timedelta(seconds=min(base * 2 ** max(tentativas - 1, 0), 3600))
+
+
+def _reserva(item):
+    """A linha da tarefa, enquanto a reserva ainda for deste worker."""
+    return Tarefa.objects.filter(pk=item.pk, status='EM_EXECUCAO', tentativas=item.tentativas)
+
+
+def batimento():
+    """
+    Renova o prazo (iniciada_em) da tarefa em execução, para que não seja
+    reservada de novo. Levanta ReservaPerdida se ela já passou a outro
+    worker; fora de uma tarefa não faz nada.
+    """
+    item = _atual.get()
+    if item is not None and not _reserva(item).update(iniciada_em=timezone.now()):
+        raise ReservaPerdida(f"{item.nome} ({item.pk}) foi reservada por outro worker")
+
+
+def executar(item):
+    """Executa uma tarefa já reservada. Retorna True se concluiu."""
+    registro = _REGISTRO.get(item.nome)
+    contexto = _atual.set(item)
+    try:
+        if registro is None:
+            raise KeyError(f"Tarefa não registrada: {item.nome}")
+        funcao, atomica = registro
+        # Quem esperou a vez no lote do worker pode já ter sido reservado de novo
+        batimento()
+        if atomica:
+            with transaction.atomic():
+                # Bloqueia a linha até o fim: SKIP LOCKED não a reserva de novo
+                list(Tarefa.objects.select_for_update().filter(pk=item.pk).values_list('pk'))
+                funcao(**item.payload)
+                _concluir(item)
+        else:
+            funcao(**item.payload)
+            _concluir(item)
+        return True
+    except ReservaPerdida:
+        logger.warning("Tarefa %s (%s) abandonada: reservada por outro worker", item.nome, item.chave)
+        return False
+    except Exception:
+        erro = traceback.format_exc()
+        logger.exception("Falha na tarefa %s (%s), tentativa %s", item.nome, item.chave, item.tentativas)
+        if item.tentativas >= item.max_tentativas:
+            _reserva(item).update(status='FALHOU', erro=erro)
+        else:
+            _reserva(item).update(
+                status='PENDENTE', erro=erro, executar_apos=timezone.now() + _backoff(item.tentativas)
+            )
+        return False
+    finally:
+        _atual.reset(contexto)
+
+
+def _concluir(item):
+    _reserva(item).update(status='CONCLUIDA', concluida_em=timezone.now(), erro='')
+
+
+def processar_lote(lote=10, nomes=None):
+    """Reserva e executa um lote. Retorna quantas tarefas foram processadas."""
+    itens = reservar(lote=lote, nomes=nomes)
+    for item in itens:
+        executar(item)
+    return len(itens)
@@ -0,0 +1,659 @@
+import gzip
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from io import BytesIO, StringIO
+
+import brotli
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from contas.factories import AdminFactory, UsuarioFactory
+from contas.models import Usuario
+from doacoes.factories import DoacaoPendenteFactory, TipoDoacaoFactory
+
+from . import esquema, throttling
+from .esboco import EsbocoQuantis
+from .middleware import CompressaoApiMiddleware, escolher_codificacao
+from .models import Tarefa
+from .parsers import JSONRapidoParser
+from .renderers import JSONRapidoRenderer
+from .tarefas import batimento, enfileirar, processar_lote, reservar, tarefa
+from .throttling import consumir, interpretar_taxa, verificar_cache
+
+EXECUCOES = []
+
+
+@tarefa('testes.registrar')
+def _registrar(valor):
+    EXECUCOES.append(valor)
+
+
+@tarefa('testes.falhar')
+def _falhar():
+    raise RuntimeError("falha proposital")
+
+
+@tarefa('testes.longa', atomica=False)
+def _longa(tomada=False):
+    # O prazo vence no meio da execução
+    Tarefa.objects.filter(nome='testes.longa').update(iniciada_em=timezone.now() - timedelta(hours=1))
+    if not tomada:
+        batimento()
+    # Outro worker procura tarefas abandonadas
+    EXECUCOES.append(reservar(nomes=['testes.longa']))
+    batimento()
+    EXECUCOES.append('fim')
+
+
+# ============================================================================
+# TESTES DA FILA DE TAREFAS
+# ============================================================================
+
+@override_settings(TAREFAS_SINCRONAS=False)
+class FilaTarefasTestCase(TestCase):
+    """
+    Testes da fila de tarefas em segundo plano.
+
+    Cobre:
+    - Idempotência do enfileiramento
+    - Execução pelo worker
+    - Reexecução com backoff e falha definitiva
+    - Batimento de tarefas longas e reserva tomada por outro worker
+    """
+
+    def setUp(self):
+        EXECUCOES.clear()
+
+    def test_mesma_chave_nao_duplica(self):
+        primeira = enfileirar('testes.registrar', {'valor': 1}, chave='unica')
+        segunda = enfileirar('testes.registrar', {'valor': 2}, chave='unica')
+
+        self.assertEqual(primeira.pk, segunda.pk)
+        self.assertEqual(Tarefa.objects.count(), 1)
+
+    def test_worker_executa_tarefas_pendentes(self):
+        enfileirar('testes.registrar', {'valor': 'a'})
+        enfileirar('testes.registrar', {'valor': 'b'})
+
+        call_command('processar_tarefas', '--uma-vez', stdout=StringIO())
+
+        self.assertEqual(EXECUCOES, ['a', 'b'])
+        self.assertFalse(Tarefa.objects.exclude(status='CONCLUIDA').exists())
+
+    def test_falha_reagenda_com_backoff_e_desiste_no_limite(self):
+        item = enfileirar('testes.falhar', max_tentativas=2)
+
+        processar_lote()
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'PENDENTE')
+        self.assertGreater(item.executar_apos, timezone.now())
+        self.assertIn('falha proposital', item.erro)
+
+        # Ainda no backoff: não é reservada
+        self.assertEqual(processar_lote(), 0)
+
+        Tarefa.objects.filter(pk=item.pk).update(executar_apos=timezone.now())
+        processar_lote()
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'FALHOU')
+        self.assertEqual(item.tentativas, 2)
+
+    def test_batimento_impede_reserva_de_tarefa_em_execucao(self):
+        item = enfileirar('testes.longa')
+
+        processar_lote()
+
+        self.assertEqual(EXECUCOES, [[], 'fim'])
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'CONCLUIDA')
+        self.assertEqual(item.tentativas, 1)
+
+    def test_tarefa_tomada_por_outro_worker_para_no_batimento(self):
+        item = enfileirar('testes.longa', {'tomada': True})
+
+        processar_lote()
+
+        # O outro worker reservou; este parou sem concluir nem reagendar
+        self.assertEqual([tarefa.pk for tarefa in EXECUCOES[0]], [item.pk])
+        self.assertNotIn('fim', EXECUCOES)
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'EM_EXECUCAO')
+        self.assertEqual(item.tentativas, 2)
+
+
+@override_settings(TAREFAS_SINCRONAS=False)
+class PremiacaoAssincronaTestCase(APITestCase):
+    """
+    Testes da premiação de doações aprovadas via fila.
+
+    Cobre:
+    - Aprovação responde sem creditar
+    - Worker credita uma única vez, mesmo com reaprovação
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.usuario = UsuarioFactory(saldo_moedas=0)
+        self.doacao = DoacaoPendenteFactory(doador=self.usuario, tipo_doacao=TipoDoacaoFactory(moedas_atribuidas=100))
+        self.url = reverse('admin_doacao_validar', kwargs={'pk': self.doacao.id})
+
+    def test_aprovacao_enfileira_e_worker_credita_uma_vez(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(self.url, {'status': 'APROVADA'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Usuario.objects.get(id=self.usuario.id).saldo_moedas, 0)
+
+        # Reaprovação (clique duplo do moderador) não gera nova tarefa
+        self.client.patch(self.url, {'status': 'APROVADA'})
+        self.assertEqual(Tarefa.objects.filter(nome='doacoes.premiar_doacao').count(), 1)
+
+        call_command('processar_tarefas', '--uma-vez', stdout=StringIO())
+        call_command('processar_tarefas', '--uma-vez', stdout=StringIO())
+
+        self.assertEqual(Usuario.objects.get(id=self.usuario.id).saldo_moedas, 100)
+
+
+# ============================================================================
+# TESTES DO JSON VIA ORJSON
+# ============================================================================
+
+class JSONRapidoTestCase(APITestCase):
+    """
+    Testes do renderer/parser JSON com orjson.
+
+    Cobre:
+    - Saída idêntica à do JSONRenderer do DRF
+    - Indentação cai no renderer padrão
+    - JSON inválido vira ParseError
+    """
+
+    DADOS = {
+        'data': timezone.now(),
+        'valor': Decimal('12.50'),
+        'mensagem': gettext_lazy('Doação aprovada'),
+        'texto': 'linha\u2028separada',
+        1: [None, True, 2 ** 70],
+    }
+
+    def test_saida_igual_ao_renderer_padrao(self):
+        self.assertEqual(JSONRapidoRenderer().render(self.DADOS), JSONRenderer().render(self.DADOS))
+
+    def test_indentacao_usa_renderer_padrao(self):
+        contexto = {'indent': 4}
+        self.assertEqual(
+            JSONRapidoRenderer().render(self.DADOS, renderer_context=contexto),
+            JSONRenderer().render(self.DADOS, renderer_context=contexto),
+        )
+
+    def test_parser(self):
+        self.assertEqual(JSONRapidoParser().parse(BytesIO('{"nome": "ação"}'.encode())), {'nome': 'ação'})
+        with self.assertRaises(ParseError):
+            JSONRapidoParser().parse(BytesIO(b'{"nome":'))
+
+
+# ============================================================================
+# TESTES DA COMPRESSÃO DAS RESPOSTAS DA API
+# ============================================================================
+
+@override_settings(COMPRESSAO_TAMANHO_MINIMO=200)
+class CompressaoApiTestCase(TestCase):
+    """
+    Testes do middleware de compressão de /api/.
+
+    Cobre:
+    - Negociação pelo Accept-Encoding (q-values)
+    - Vary, ETag forte por codificação (inalterada se o corpo não mudar) e limite de tamanho
+    - Modo async nativo (sem passar por thread)
+    - Streaming comprimido e SSE ignorado
+    - brotli preferido quando aceito (ida e volta, inteiro e em streaming)
+    """
+
+    CORPO = b'{"results": [' + b'{"status": "APROVADA"},' * 50 + b'{}]}'
+
+    def _processar(self, response, caminho='/api/doacoes/historico/', accept_encoding='gzip'):
+        request = RequestFactory().get(caminho, HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressaoApiMiddleware(lambda r: response)(request)
+
+    def test_negociacao(self):
+        self.assertEqual(escolher_codificacao('gzip, deflate'), 'gzip')
+        self.assertEqual(escolher_codificacao('gzip;q=0, identity'), None)
+        self.assertEqual(escolher_codificacao('*'), escolher_codificacao('br, gzip'))
+        self.assertIsNone(escolher_codificacao(''))
+
+    def test_comprime_json_com_etag_forte_por_codificacao(self):
+        resposta = HttpResponse(self.CORPO, content_type='application/json', headers={'ETag': '"v1"'})
+        response = self._processar(resposta)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.CORPO)
+        self.assertEqual(response['ETag'], '"v1-gzip"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        fraca = HttpResponse(self.CORPO, content_type='application/json', headers={'ETag': 'W/"v1"'})
+        self.assertEqual(self._processar(fraca)['ETag'], 'W/"v1"')
+
+    def test_corpo_inalterado_mantem_etag(self):
+        for accept_encoding, corpo in (('', self.CORPO), ('gzip', b'{"ok": true}')):
+            resposta = HttpResponse(corpo, content_type='application/json', headers={'ETag': '"v1"'})
+            self.assertEqual(self._processar(resposta, accept_encoding=accept_encoding)['ETag'], '"v1"')
+
+    async def test_modo_async_sem_adaptacao(self):
+        async def view(request):
+            return HttpResponse(self.CORPO, content_type='application/json')
+
+        middleware = CompressaoApiMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/api/doacoes/historico/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(gzip.decompress(response.content), self.CORPO)
+        self.assertFalse(iscoroutinefunction(CompressaoApiMiddleware(lambda r: None)))
+
+    def test_sem_accept_encoding_ou_fora_da_api_nao_comprime(self):
+        response = self._processar(HttpResponse(self.CORPO, content_type='application/json'), accept_encoding='')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self._processar(HttpResponse(self.CORPO, content_type='application/json'), caminho='/admin/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_resposta_pequena_nao_comprime(self):
+        response = self._processar(HttpResponse(b'{"ok": true}', content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        resposta = StreamingHttpResponse(iter([b'{"a": 1}', b'{"b": 2}']), content_type='application/json')
+        response = self._processar(resposta)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'{"a": 1}{"b": 2}')
+
+        sse = StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream')
+        self.assertFalse(self._processar(sse).has_header('Content-Encoding'))
+
+    def test_brotli(self):
+        self.assertEqual(escolher_codificacao('gzip, deflate, br'), 'br')
+
+        response = self._processar(HttpResponse(self.CORPO, content_type='application/json'), accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.CORPO)
+
+        resposta = StreamingHttpResponse(iter([b'{"a": 1}', b'{"b": 2}']), content_type='application/json')
+        response = self._processar(resposta, accept_encoding='br')
+        self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), b'{"a": 1}{"b": 2}')
+
+    def test_schema_openapi_comprimido(self):
+        response = self.client.get('/api/schema/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'openapi', gzip.decompress(response.content))
+
+
+# ============================================================================
+# TESTES DO ANALISADOR DE CONSULTAS
+# ============================================================================
+
+class AnalisarConsultasTestCase(TestCase):
+    """
+    Cobre:
+    - Consultas registradas pelos apps (<app>/consultas.py) entram no relatório
+    - Ordenação sem índice é apontada e um índice é sugerido
+    - Consulta já atendida por índice não recebe sugestão
+    - Relatório estável (duas execuções iguais) e gravado com --saida
+    """
+
+    def _relatorio(self, *consultas):
+        argumentos = [arg for nome in consultas for arg in ('--consulta', nome)]
+        saida = StringIO()
+        call_command('analisar_consultas', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def test_listar_consultas_registradas(self):
+        saida = StringIO()
+        call_command('analisar_consultas', '--listar', stdout=saida)
+        for nome in ('core.tarefas_prontas', 'doacoes.pendentes', 'doacoes.historico', 'contas.usuarios'):
+            self.assertIn(nome, saida.getvalue())
+
+    def test_ordenacao_sem_indice_gera_sugestao(self):
+        relatorio = self._relatorio('doacoes.badges_ativas')
+
+        self.assertIn('## doacoes.badges_ativas', relatorio)
+        self.assertIn('- ordenacao', relatorio)
+        self.assertIn(
+            "doacoes.Badge.Meta.indexes: models.Index(fields=['tipo', 'custo_moedas'], condition=Q(ativo=True)",
+            relatorio,
+        )
+
+    def test_consulta_atendida_por_indice_sem_sugestao(self):
+        relatorio = self._relatorio('doacoes.historico_sincronizacao', 'doacoes.badges_minhas')
+
+        self.assertNotIn('Alertas:', relatorio)
+        self.assertNotIn('Sugestões:', relatorio)
+
+    def test_relatorio_estavel_e_gravado_em_arquivo(self):
+        self.assertEqual(self._relatorio(), self._relatorio())
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'consultas.txt')
+            call_command('analisar_consultas', '--saida', caminho, stdout=StringIO())
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.assertEqual(arquivo.read(), self._relatorio())
+
+    def test_consulta_desconhecida(self):
+        with self.assertRaises(CommandError):
+            self._relatorio('nao.existe')
+
+
+# ============================================================================
+# TESTES DOS LIMITES DE REQUISIÇÃO (BALDE DE TOKENS)
+# ============================================================================
+
+@override_settings(THROTTLE_HABILITADO=True, THROTTLE_TAXAS={'contas_token': '2/min', 'doacoes_submeter': '1/min'})
+class BaldeTokensThrottleTestCase(APITestCase):
+    """
+    Cobre:
+    - Balde esgotado responde 429 com Retry-After e o formato de erro padrão
+    - Limite por usuário autenticado (um usuário não consome o balde do outro)
+    - Recarga proporcional ao tempo
+    - THROTTLE_HABILITADO=False desliga os limites
+    - X-Forwarded-For forjado não abre um balde novo; sem proxy por padrão
+    - Script no Redis e Redis fora do ar (a requisição passa)
+    - Aviso quando os limites ficam sem cache compartilhado
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(throttling._scripts.clear)
+
+    def test_token_limitado_por_ip_com_retry_after(self):
+        url = reverse('token_obtain_pair')
+        credenciais = {'username': 'ninguem', 'password': 'errada1'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, credenciais).status_code, 401)
+
+        response = self.client.post(url, credenciais)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.data['codigo'], 'Throttled')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertLessEqual(int(response['Retry-After']), 30)
+
+    def test_limite_por_usuario(self):
+        url = reverse('doacao_submeter')
+        usuario, outro = UsuarioFactory(), UsuarioFactory()
+
+        self.client.force_authenticate(usuario)
+        self.assertNotEqual(self.client.post(url, {}).status_code, 429)
+        self.assertEqual(self.client.post(url, {}).status_code, 429)
+
+        self.client.force_authenticate(outro)
+        self.assertNotEqual(self.client.post(url, {}).status_code, 429)
+
+    def test_recarga_proporcional_ao_tempo(self):
+        capacidade, taxa = interpretar_taxa('2/min')
+        self.assertEqual((capacidade, taxa), (2, 2 / 60))
+
+        with mock.patch('core.throttling.time.time', return_value=1000.0):
+            self.assertTrue(consumir('teste', capacidade, taxa)[0])
+            self.assertTrue(consumir('teste', capacidade, taxa)[0])
+            permitido, espera = consumir('teste', capacidade, taxa)
+        self.assertFalse(permitido)
+        self.assertAlmostEqual(espera, 30.0)
+
+        with mock.patch('core.throttling.time.time', return_value=1030.0):
+            self.assertTrue(consumir('teste', capacidade, taxa)[0])
+            self.assertFalse(consumir('teste', capacidade, taxa)[0])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_x_forwarded_for_forjado_divide_o_balde(self):
+        url = reverse('token_obtain_pair')
+        credenciais = {'username': 'ninguem', 'password': 'errada1'}
+        # O cliente inventa um endereço por requisição; o proxy anexa o IP real no fim
+        respostas = [
+            self.client.post(url, credenciais, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7')
+            for i in range(3)
+        ]
+        self.assertEqual([r.status_code for r in respostas], [401, 401, 429])
+
+        # Outro cliente atrás do mesmo proxy tem o próprio balde
+        outro = self.client.post(url, credenciais, HTTP_X_FORWARDED_FOR='203.0.113.8')
+        self.assertEqual(outro.status_code, 401)
+
+    def test_sem_proxy_ignora_x_forwarded_for(self):
+        url = reverse('token_obtain_pair')
+        credenciais = {'username': 'ninguem', 'password': 'errada1'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 0}):
+            codigos = [
+                self.client.post(url, credenciais, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+                for i in range(3)
+            ]
+        self.assertEqual(codigos, [401, 401, 429])
+
+    def test_padrao_sem_proxy(self):
+        self.assertEqual(settings.REST_FRAMEWORK['NUM_PROXIES'], 0)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis-teste:6379/0',
+    }})
+    def test_script_no_redis(self):
+        script = mock.Mock(return_value=[0, b'12.5'])
+        with mock.patch('core.throttling.redis.Redis.from_url') as from_url:
+            from_url.return_value.register_script.return_value = script
+            self.assertEqual(consumir('teste', 2, 1 / 30), (False, 12.5))
+            consumir('teste', 2, 1 / 30)
+
+        # Um cliente (e um registro do script) por processo
+        from_url.assert_called_once()
+        self.assertEqual(script.call_args.kwargs['args'], [2, 1 / 30, 1])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:1/0',
+    }})
+    def test_redis_fora_do_ar_libera_a_requisicao(self):
+        url = reverse('token_obtain_pair')
+        credenciais = {'username': 'ninguem', 'password': 'errada1'}
+        with self.assertLogs('core.throttling', 'WARNING'):
+            codigos = [self.client.post(url, credenciais).status_code for _ in range(3)]
+        self.assertEqual(codigos, [401, 401, 401])
+
+    def test_aviso_sem_cache_compartilhado(self):
+        with self.assertLogs('core.throttling', 'WARNING'):
+            verificar_cache()
+        with override_settings(THROTTLE_HABILITADO=False), self.assertNoLogs('core.throttling', 'WARNING'):
+            verificar_cache()
+
+    @override_settings(THROTTLE_HABILITADO=False)
+    def test_desligado(self):
+        url = reverse('token_obtain_pair')
+        for _ in range(4):
+            self.assertEqual(self.client.post(url, {'username': 'x', 'password': 'y'}).status_code, 401)
+
+
+# ============================================================================
+# TESTES DO ESQUEMA OPENAPI EM CACHE
+# ============================================================================
+
+class EsquemaOpenApiTestCase(TestCase):
+    """
+    Cobre:
+    - openapi.yaml versionado igual ao esquema gerado (verificar_openapi)
+    - /api/schema/ gerado uma vez por formato, com ETag e 304
+    - Corpo pré-comprimido em gzip e brotli, cada um com ETag próprio
+    - verificar_openapi acusa arquivo desatualizado e --atualizar regrava
+    """
+
+    def setUp(self):
+        esquema.limpar()
+        self.addCleanup(esquema.limpar)
+        self.url = reverse('schema')
+
+    def test_openapi_versionado_esta_atualizado(self):
+        call_command('verificar_openapi', stdout=StringIO())
+
+    def test_esquema_gerado_uma_vez_e_revalidado_por_etag(self):
+        with mock.patch.object(esquema, 'gerar', wraps=esquema.gerar) as gerar:
+            primeira = self.client.get(self.url)
+            segunda = self.client.get(self.url, headers={'If-None-Match': primeira['ETag']})
+            json = self.client.get(self.url, {'format': 'json'})
+
+        self.assertEqual(primeira.status_code, 200)
+        self.assertTrue(primeira.content.startswith(b'openapi:'))
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda['ETag'], primeira['ETag'])
+        self.assertIn('max-age=', segunda['Cache-Control'])
+        self.assertEqual(json.json()['info']['title'], 'EcoDoação API')
+        self.assertNotEqual(json['ETag'], primeira['ETag'])
+        self.assertEqual(gerar.call_count, 2)  # YAML e JSON, uma vez cada
+
+    def test_corpo_pre_comprimido(self):
+        simples = self.client.get(self.url)
+        comprimida = self.client.get(self.url, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(comprimida['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(comprimida.content), simples.content)
+        self.assertNotEqual(comprimida['ETag'], simples['ETag'])
+        self.assertIn('Accept-Encoding', comprimida['Vary'])
+        nao_modificada = self.client.get(
+            self.url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': comprimida['ETag']}
+        )
+        self.assertEqual(nao_modificada.status_code, 304)
+
+    def test_corpo_pre_comprimido_em_brotli(self):
+        simples = self.client.get(self.url)
+        gz = self.client.get(self.url, headers={'Accept-Encoding': 'gzip'})
+        br = self.client.get(self.url, headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(br['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(br.content), simples.content)
+        self.assertNotIn(br['ETag'], (simples['ETag'], gz['ETag']))
+
+    def test_verificar_openapi_acusa_diferenca(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'openapi.yaml')
+            with open(caminho, 'w') as arquivo:
+                arquivo.write('openapi: 3.0.3\n')
+
+            saida = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('verificar_openapi', arquivo=caminho, stdout=saida)
+            self.assertIn('+++ openapi.yaml (gerado)', saida.getvalue())
+
+            call_command('verificar_openapi', arquivo=caminho, atualizar=True, stdout=StringIO())
+            call_command('verificar_openapi', arquivo=caminho, stdout=StringIO())
+
+
+# ============================================================================
+# TESTES DO ESBOÇO DE QUANTIS
+# ============================================================================
+
+class EsbocoQuantisTestCase(TestCase):
+    """
+    Cobre:
+    - Quantis dentro do erro relativo configurado
+    - Mescla igual ao esboço das amostras juntas; ida e volta pelo dict (JSONField)
+    """
+
+    def test_quantis_dentro_do_erro_relativo(self):
+        esboco = EsbocoQuantis()
+        for valor in range(1, 10001):
+            esboco.adicionar(valor)
+
+        for q, esperado in ((0.5, 5000), (0.9, 9000), (0.99, 9900)):
+            self.assertAlmostEqual(esboco.quantil(q), esperado, delta=esperado * 0.021)
+        self.assertIsNone(EsbocoQuantis().quantil(0.5))
+        self.assertEqual(EsbocoQuantis().adicionar(0.5).quantil(0.5), 0.0)
+
+    def test_mescla_e_serializacao(self):
+        manha, tarde, dia = EsbocoQuantis(), EsbocoQuantis(), EsbocoQuantis()
+        for valor in range(1, 500):
+            manha.adicionar(valor * 7)
+            dia.adicionar(valor * 7)
+        for valor in range(1, 300):
+            tarde.adicionar(valor * 60)
+            dia.adicionar(valor * 60)
+
+        mesclado = EsbocoQuantis.de_dict(manha.para_dict()).mesclar(EsbocoQuantis.de_dict(tarde.para_dict()))
+
+        self.assertEqual(mesclado.para_dict(), dia.para_dict())
+        self.assertEqual(mesclado.total, 798)
+
+
+# ============================================================================
+# TESTES DAS REQUISIÇÕES EM LOTE
+# ============================================================================
+
+class LoteTestCase(APITestCase):
+    """
+    Cobre:
+    - Respostas por chave idênticas às das rotas chamadas separadamente
+    - Autenticação JWT feita uma vez e repassada às sub-requisições
+    - Status de erro das sub-requisições preservado
+    - Rotas fora da lista, caminhos externos e limite de tamanho recusados
+    """
+
+    def setUp(self):
+        self.usuario = UsuarioFactory()
+        TipoDoacaoFactory(nome='Papel')
+        DoacaoPendenteFactory(doador=self.usuario)
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.caminhos = {
+            'painel': reverse('dashboard'),
+            'historico': reverse('doacao_historico') + '?page_size=5',
+            'minhas': reverse('badge-minhas-badges'),
+            'disponiveis': reverse('badge-disponiveis'),
+            'tipos': reverse('doacao_tipos'),
+        }
+
+    def _lote(self, requisicoes):
+        return self.client.post(reverse('lote'), {'requisicoes': requisicoes}, format='json')
+
+    def test_respostas_iguais_as_rotas(self):
+        response = self._lote(self.caminhos)
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(list(dados), list(self.caminhos))
+        for chave, caminho in self.caminhos.items():
+            direta = self.client.get(caminho)
+            self.assertEqual(dados[chave], {'status': 200, 'corpo': direta.json()}, chave)
+
+    def test_autentica_uma_vez(self):
+        with mock.patch(
+            'rest_framework_simplejwt.authentication.JWTAuthentication.get_user',
+            autospec=True, return_value=self.usuario,
+        ) as get_user:
+            response = self._lote(self.caminhos)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_user.call_count, 1)
+
+    def test_status_da_sub_requisicao(self):
+        response = self._lote({'pagina': reverse('doacao_historico') + '?page=99'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pagina']['status'], 404)
+
+    def test_recusa_rotas_nao_permitidas(self):
+        for caminho in (
+            reverse('admin_doacoes_pendentes'), 'https://exemplo.com/api/contas/dashboard/',
+            '/admin/', '/api/nao-existe/',
+        ):
+            response = self._lote({'x': caminho})
+            self.assertEqual(response.status_code, 400, caminho)
+
+        with override_settings(LOTE_MAXIMO=2):
+            self.assertEqual(self._lote(self.caminhos).status_code, 400)
+
+    def test_exige_autenticacao(self):
+        self.client.credentials()
+        self.assertEqual(self._lote({'painel': reverse('dashboard')}).status_code, 401)
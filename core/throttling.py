@@ -0,0 +1,150 @@
+"""
+Limite de requisições por balde de tokens (token bucket) no cache compartilhado.
+
+    class CriarDoacaoView(generics.CreateAPIView):
+        throttle_classes = [BaldeTokensThrottle]
+        throttle_scope = 'doacoes_submeter'
+
+A taxa de cada escopo vem de THROTTLE_TAXAS (ex.: '10/min'): o balde comporta
+10 tokens e recupera 10 por minuto, então rajadas curtas passam e o ritmo
+sustentado fica limitado. A chave é escopo + usuário (ou IP, se anônimo). O IP
+sai de REMOTE_ADDR e dos REST_FRAMEWORK['NUM_PROXIES'] proxies confiáveis: um
+X-Forwarded-For inventado pelo cliente não abre um balde novo.
+
+Com o cache no Redis (REDIS_URL) a verificação é um único EVALSHA de um script
+Lua, atômico e com o relógio do próprio Redis: os limites valem para todos os
+workers. O script roda num cliente redis-py próprio, aberto a partir do
+LOCATION do cache (o RedisCache do Django não expõe o dele). Se o Redis cair,
+a requisição passa (com aviso no log) em vez de virar 500. Em outros backends
+o balde é atualizado sob um lock do processo, o que só é consistente dentro
+do processo (desenvolvimento/testes).
+"""
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODOS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# KEYS[1]: chave do balde; ARGV: capacidade, tokens por segundo, custo.
+# Devolve {1|0, segundos até haver tokens suficientes}.
+SCRIPT_LUA = """
+local capacidade = tonumber(ARGV[1])
+local taxa = tonumber(ARGV[2])
+local custo = tonumber(ARGV[3])
+local relogio = redis.call('TIME')
+local agora = tonumber(relogio[1]) + tonumber(relogio[2]) / 1000000
+local estado = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or capacidade
+local ts = tonumber(estado[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - ts) * taxa)
+local permitido, espera = 0, 0
+if tokens >= custo then
+    tokens = tokens - custo
+    permitido = 1
+else
+    espera = (custo - tokens) / taxa
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(agora))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacidade / taxa * 1000))
+return {permitido, tostring(espera)}
+"""
+
+_lock_local = threading.Lock()
+
+# Script registrado por URL do Redis (um cliente com pool de conexões por processo)
+_scripts = {}
+
+
+def interpretar_taxa(taxa):
+    """'10/min' -> (capacidade 10, 10/60 tokens por segundo)."""
+    quantidade, _, periodo = taxa.partition('/')
+    quantidade = int(quantidade)
+    segundos = PERIODOS[periodo.strip().lower()]
+    return quantidade, quantidade / segundos
+
+
+def _script_redis():
+    local = settings.CACHES['default']['LOCATION']
+    # Como no RedisCache, a escrita vai para o primeiro servidor da lista
+    url = (local.split(',') if isinstance(local, str) else local)[0]
+    with _lock_local:
+        if url not in _scripts:
+            cliente = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            _scripts[url] = cliente.register_script(SCRIPT_LUA)
+        return _scripts[url]
+
+
+def _consumir_redis(cache, chave, capacidade, taxa, custo):
+    permitido, espera = _script_redis()(keys=[cache.make_and_validate_key(chave)], args=[capacidade, taxa, custo])
+    return bool(int(permitido)), float(espera)
+
+
+def _consumir_local(cache, chave, capacidade, taxa, custo):
+    with _lock_local:
+        agora = time.time()
+        tokens, ts = cache.get(chave) or (capacidade, agora)
+        tokens = min(capacidade, tokens + max(0.0, agora - ts) * taxa)
+        permitido = tokens >= custo
+        espera = 0.0
+        if permitido:
+            tokens -= custo
+        else:
+            espera = (custo - tokens) / taxa
+        cache.set(chave, (tokens, agora), timeout=max(1, int(capacidade / taxa) + 1))
+    return permitido, espera
+
+
+def consumir(chave, capacidade, taxa, custo=1):
+    """Tenta retirar `custo` tokens do balde. Retorna (permitido, segundos de espera)."""
+    cache = caches['default']
+    if isinstance(cache, RedisCache):
+        try:
+            return _consumir_redis(cache, chave, capacidade, taxa, custo)
+        except redis.RedisError:
+            logger.warning("Redis indisponível: requisição liberada sem limite (%s)", chave, exc_info=True)
+            return True, 0.0
+    return _consumir_local(cache, chave, capacidade, taxa, custo)
+
+
+def verificar_cache():
+    """
+    Avisa quando os limites estão ligados sem cache compartilhado. Chamado na
+    subida do servidor (core/asgi.py, core/wsgi.py), não a cada manage.py.
+    """
+    if getattr(settings, 'THROTTLE_HABILITADO', True) and not isinstance(caches['default'], RedisCache):
+        logger.warning(
+            "THROTTLE_HABILITADO sem cache compartilhado (REDIS_URL): cada processo tem os "
+            "próprios baldes e o limite efetivo é multiplicado pelo número de workers."
+        )
+
+
+class BaldeTokensThrottle(BaseThrottle):
+    """Throttle do DRF por escopo (`throttle_scope` da view) e por usuário/IP."""
+
+    def allow_request(self, request, view):
+        self.espera = None
+        escopo = getattr(view, 'throttle_scope', None)
+        taxa = getattr(settings, 'THROTTLE_TAXAS', {}).get(escopo)
+        if not getattr(settings, 'THROTTLE_HABILITADO', True) or not taxa:
+            return True
+
+        if request.user and request.user.is_authenticated:
+            identidade = f'u{request.user.pk}'
+        else:
+            identidade = f'ip{self.get_ident(request)}'
+        capacidade, por_segundo = interpretar_taxa(taxa)
+        permitido, espera = consumir(f'throttle:{escopo}:{identidade}', capacidade, por_segundo)
+        if not permitido:
+            self.espera = espera
+        return permitido
+
+    def wait(self):
+        return self.espera
@@ -4,11 +4,14 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
 from django.conf import settings 
 from rest_framework import serializers, generics
 from drf_spectacular.utils import extend_schema, OpenApiTypes
 
+from core.esquema import EsquemaEmCacheView
+from core.lote import LoteView
+
 class ApiRootSerializer(serializers.Serializer):
     contas = serializers.CharField()
     doacoes = serializers.CharField()
@@ -44,8 +47,11 @@ urlpatterns = [
     path('api/contas/', include('contas.urls')),
     path('api/doacoes/', include('doacoes.urls')),
 
+    # Várias leituras numa requisição (abertura do app)
+    path('api/lote/', LoteView.as_view(), name='lote'),
+
     # --- Swagger e Schema ---
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', EsquemaEmCacheView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc-ui'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Depois do setup: avisa se os limites de requisição estão sem cache compartilhado
+from core.throttling import verificar_cache  # noqa: E402
+
+verificar_cache()
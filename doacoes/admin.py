@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import TipoDoacao, Doacao, Badge, UsuarioBadge
+from core.paginacao import AdminEscalavelMixin
+from .models import (
+    TipoDoacao, Doacao, DoacaoArquivada, Badge, UsuarioBadge, EventoDoacao, OffsetConsumidor, ResumoDiario,
+)
+from .services import BadgeService
 
 @admin.register(TipoDoacao)
 class TipoDoacaoAdmin(admin.ModelAdmin):
@@ -10,25 +14,53 @@ class TipoDoacaoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Doacao)
-class DoacaoAdmin(admin.ModelAdmin):
+class DoacaoAdmin(AdminEscalavelMixin, admin.ModelAdmin):
     list_display = ['id', 'doador', 'tipo_doacao', 'status', 'data_submissao', 'validado_por']
-    list_filter = ['status', 'tipo_doacao', 'data_submissao']
+    list_filter = ['status', 'tipo_doacao']
+    list_select_related = ['doador', 'tipo_doacao', 'validado_por']
+    date_hierarchy = 'data_submissao'
     search_fields = ['doador__username', 'doador__email']
-    readonly_fields = ['data_submissao', 'data_validacao']
+    autocomplete_fields = ['doador', 'validado_por']
+    readonly_fields = ['data_submissao', 'data_validacao', 'moedas_creditadas']
     ordering = ['-data_submissao']
+    campo_keyset = '-data_submissao'
     
     fieldsets = (
         ('Informações da Doação', {
             'fields': ('doador', 'tipo_doacao', 'descricao', 'evidencia_foto', 'status')
         }),
         ('Validação', {
-            'fields': ('validado_por', 'data_validacao', 'motivo_recusa')
+            'fields': ('validado_por', 'data_validacao', 'motivo_recusa', 'moedas_creditadas')
         }),
         ('Datas', {
             'fields': ('data_submissao',)
         }),
     )
 
+    def get_readonly_fields(self, request, obj=None):
+        campos = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.status != 'PENDENTE':
+            # Validação definitiva: trocar o status não devolveria nem creditaria as moedas
+            return [*campos, 'status']
+        return campos
+
+
+@admin.register(DoacaoArquivada)
+class DoacaoArquivadaAdmin(AdminEscalavelMixin, admin.ModelAdmin):
+    list_display = ['id', 'doador', 'tipo_doacao', 'status', 'data_submissao', 'arquivada_em']
+    list_filter = ['status', 'tipo_doacao']
+    list_select_related = ['doador', 'tipo_doacao']
+    search_fields = ['doador__username', 'doador__email']
+    ordering = ['-data_submissao']
+    campo_keyset = '-data_submissao'
+
+    # Somente leitura: o arquivo é alimentado pelo comando `arquivar_doacoes`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Badge)
 class BadgeAdmin(admin.ModelAdmin):
@@ -61,17 +93,56 @@ class BadgeAdmin(admin.ModelAdmin):
         return "Sem ícone"
     icone_preview.short_description = 'Preview'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        BadgeService.retroagir_se_configurado(obj)
+
 
 @admin.register(UsuarioBadge)
-class UsuarioBadgeAdmin(admin.ModelAdmin):
+class UsuarioBadgeAdmin(AdminEscalavelMixin, admin.ModelAdmin):
     list_display = ['usuario', 'badge', 'data_conquista']
-    list_filter = ['badge', 'data_conquista']
+    list_filter = ['badge']
+    list_select_related = ['usuario', 'badge']
+    date_hierarchy = 'data_conquista'
     search_fields = ['usuario__username', 'badge__nome']
+    autocomplete_fields = ['usuario', 'badge']
     readonly_fields = ['data_conquista']
     ordering = ['-data_conquista']
+    campo_keyset = '-data_conquista'
     
     fieldsets = (
         ('Badge Conquistada', {
             'fields': ('usuario', 'badge', 'data_conquista')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(EventoDoacao)
+class EventoDoacaoAdmin(AdminEscalavelMixin, admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'usuario_id', 'doacao_id', 'criado_em']
+    list_filter = ['tipo']
+    readonly_fields = ['tipo', 'usuario', 'doacao_id', 'payload', 'criado_em']
+    raw_id_fields = ['usuario']
+    ordering = ['-id']
+    campo_keyset = '-id'
+
+
+@admin.register(OffsetConsumidor)
+class OffsetConsumidorAdmin(admin.ModelAdmin):
+    list_display = ['consumidor', 'ultimo_evento', 'buraco_id', 'buraco_visto_em', 'atualizado_em']
+
+
+@admin.register(ResumoDiario)
+class ResumoDiarioAdmin(admin.ModelAdmin):
+    list_display = ['dia', 'tipo_doacao', 'submetidas', 'aprovadas', 'recusadas', 'moedas']
+    list_filter = ['tipo_doacao']
+    list_select_related = ['tipo_doacao']
+    date_hierarchy = 'dia'
+    ordering = ['-dia', 'tipo_doacao']
+
+    # Somente leitura: mantido pelo consumidor 'resumos' e por `reconstruir_resumos`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,139 @@
+"""
+Catálogo em memória de TipoDoacao e das Badges ativas.
+
+São poucas dezenas de linhas que quase nunca mudam, mas eram lidas do banco
+em toda submissão (validação do tipo), compra de badge e listagem de
+disponíveis. Cada processo guarda um retrato imutável das duas tabelas e
+devolve cópias das instâncias:
+
+    tipo = catalogo.tipo_doacao(pk)          # None se não existir
+    badge = catalogo.badge(pk)               # só ativas
+    catalogo.badges(tipo='COMPRA')
+
+Invalidação: salvar/excluir um TipoDoacao ou uma Badge descarta o retrato
+local e, após o COMMIT, troca a versão em `catalogo:versao` no cache padrão.
+Com cache compartilhado (Redis) cada acesso confere essa versão (um GET no
+Redis no lugar da consulta ao banco) e os outros workers recarregam na hora.
+Com cache local a versão não atravessa processos: o retrato vale por
+CATALOGO_TTL_SEGUNDOS (0 desliga o catálogo e toda leitura vai ao banco).
+"""
+import copy
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Badge, TipoDoacao
+
+CHAVE_VERSAO = 'catalogo:versao'
+
+
+@dataclass(frozen=True)
+class Retrato:
+    versao: object
+    carregado_em: float
+    tipos: MappingProxyType
+    badges: MappingProxyType  # ativas, na ordenação do modelo (tipo, custo)
+
+
+_retrato = None
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches['default']
+
+
+def _compartilhado(cache):
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _ttl():
+    return getattr(settings, 'CATALOGO_TTL_SEGUNDOS', 30)
+
+
+def _carregar(versao):
+    tipos = {tipo.pk: tipo for tipo in TipoDoacao.objects.order_by('nome')}
+    badges = {badge.pk: badge for badge in Badge.objects.filter(ativo=True).order_by('tipo', 'custo_moedas', 'id')}
+    return Retrato(versao, time.monotonic(), MappingProxyType(tipos), MappingProxyType(badges))
+
+
+def _atual():
+    """Retrato válido, recarregado se a versão mudou (ou o TTL venceu); None se desligado."""
+    global _retrato
+    cache = _cache()
+    compartilhado = _compartilhado(cache)
+    if not compartilhado and _ttl() <= 0:
+        return None
+
+    retrato = _retrato
+    if compartilhado:
+        # A versão é lida antes das tabelas: uma troca no meio força nova recarga no próximo acesso
+        versao = cache.get(CHAVE_VERSAO)
+        if versao is None:
+            cache.add(CHAVE_VERSAO, uuid4().hex, timeout=None)
+            versao = cache.get(CHAVE_VERSAO)
+        if retrato is not None and retrato.versao == versao:
+            return retrato
+    else:
+        versao = None
+        if retrato is not None and time.monotonic() - retrato.carregado_em < _ttl():
+            return retrato
+
+    with _lock:
+        if _retrato is retrato:
+            _retrato = _carregar(versao)
+        return _retrato
+
+
+def _copia(instancia):
+    # Quem recebe pode alterar a instância sem afetar o retrato
+    return copy.copy(instancia) if instancia is not None else None
+
+
+def tipo_doacao(pk):
+    retrato = _atual()
+    if retrato is None:
+        return TipoDoacao.objects.filter(pk=pk).first()
+    return _copia(retrato.tipos.get(pk))
+
+
+def badge(pk):
+    """Badge ativa com esse id, ou None."""
+    retrato = _atual()
+    if retrato is None:
+        return Badge.objects.filter(pk=pk, ativo=True).first()
+    return _copia(retrato.badges.get(pk))
+
+
+def badges(tipo=None):
+    """Badges ativas (do `tipo`, se informado), ordenadas por tipo e custo."""
+    retrato = _atual()
+    if retrato is None:
+        consulta = Badge.objects.filter(ativo=True).order_by('tipo', 'custo_moedas', 'id')
+        return list(consulta.filter(tipo=tipo) if tipo else consulta)
+    return [_copia(b) for b in retrato.badges.values() if tipo is None or b.tipo == tipo]
+
+
+def limpar():
+    """Descarta o retrato deste processo."""
+    global _retrato
+    _retrato = None
+
+
+def invalidar():
+    """Descarta o retrato local já e troca a versão compartilhada no COMMIT."""
+    limpar()
+
+    def trocar_versao():
+        limpar()
+        _cache().set(CHAVE_VERSAO, uuid4().hex, timeout=None)
+
+    transaction.on_commit(trocar_versao)
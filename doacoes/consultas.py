@@ -0,0 +1,73 @@
+"""Consultas quentes de doações, analisadas pelo comando `analisar_consultas`."""
+from datetime import timedelta
+
+from core.consultas import consulta, queryset_da_view
+
+from .models import Badge, Doacao, DoadorAtivoDia, EventoDoacao, ResumoDiario, UsuarioBadge
+from .views import AdminDoacoesPendentesView, BadgeViewSet, HistoricoDoacoesView
+
+
+@consulta('doacoes.historico', 'GET /api/doacoes/historico/')
+def historico(contexto):
+    return queryset_da_view(HistoricoDoacoesView, contexto)
+
+
+@consulta('doacoes.historico_por_status', 'GET /api/doacoes/historico/?status=APROVADA')
+def historico_por_status(contexto):
+    return queryset_da_view(HistoricoDoacoesView, contexto, {'status': 'APROVADA'})
+
+
+@consulta('doacoes.historico_sincronizacao', 'GET /api/doacoes/historico/?since=<token>')
+def historico_sincronizacao(contexto):
+    return (
+        Doacao.objects.filter(doador=contexto.usuario, atualizado_em__gt=contexto.agora - timedelta(minutes=5))
+        .order_by('atualizado_em', 'id')[:51]
+    )
+
+
+@consulta('doacoes.pendentes', 'GET /api/doacoes/admin/pendentes/ (fila de moderação)')
+def pendentes(contexto):
+    return queryset_da_view(AdminDoacoesPendentesView, contexto)
+
+
+@consulta('doacoes.badges_ativas', 'GET /api/doacoes/badges/')
+def badges_ativas(contexto):
+    return queryset_da_view(BadgeViewSet, contexto, action='list')
+
+
+@consulta('doacoes.badges_minhas', 'GET /api/doacoes/badges/minhas/')
+def badges_minhas(contexto):
+    return UsuarioBadge.objects.filter(usuario=contexto.usuario).order_by('-data_conquista')
+
+
+@consulta('doacoes.badges_disponiveis', 'GET /api/doacoes/badges/disponiveis/')
+def badges_disponiveis(contexto):
+    # As badges em si vêm do catálogo em memória; por requisição só sai esta
+    return UsuarioBadge.objects.filter(usuario=contexto.usuario).values_list('badge_id', flat=True)
+
+
+@consulta('doacoes.catalogo_badges', 'Carga do catálogo em memória (badges ativas)')
+def catalogo_badges(contexto):
+    return Badge.objects.filter(ativo=True).order_by('tipo', 'custo_moedas', 'id')
+
+
+@consulta('doacoes.eventos_do_usuario', 'Fluxo SSE: eventos do usuário após o último id')
+def eventos_do_usuario(contexto):
+    return EventoDoacao.objects.filter(usuario=contexto.usuario, id__gt=0).order_by('id')[:100]
+
+
+@consulta('doacoes.aprovadas_do_usuario', 'Critérios de badge: doações aprovadas do usuário')
+def aprovadas_do_usuario(contexto):
+    return Doacao.objects.filter(doador=contexto.usuario, status='APROVADA').order_by()
+
+
+@consulta('doacoes.relatorio_resumo', 'GET /api/doacoes/admin/relatorios/resumo/ (30 dias)')
+def relatorio_resumo(contexto):
+    hoje = contexto.agora.date()
+    return ResumoDiario.objects.filter(dia__range=(hoje - timedelta(days=29), hoje)).select_related('tipo_doacao')
+
+
+@consulta('doacoes.relatorio_doadores_ativos', 'Relatório: doadores ativos distintos no período')
+def relatorio_doadores_ativos(contexto):
+    hoje = contexto.agora.date()
+    return DoadorAtivoDia.objects.filter(dia__range=(hoje - timedelta(days=29), hoje)).values('usuario_id').distinct()
@@ -0,0 +1,128 @@
+"""
+Consumo do outbox de eventos de doações (EventoDoacao).
+
+Uso:
+    from doacoes import eventos
+
+    def processar(lote):
+        for evento in lote:
+            ...
+
+    eventos.consumir('estatisticas', processar)
+
+Cada consumidor tem seu offset (último id processado) em OffsetConsumidor e
+lê apenas os eventos novos, em ordem de id.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EventoDoacao, OffsetConsumidor
+
+logger = logging.getLogger(__name__)
+
+
+def offset(consumidor):
+    """Último evento já processado pelo consumidor (0 se nunca consumiu)."""
+    return OffsetConsumidor.objects.filter(consumidor=consumidor).values_list('ultimo_evento', flat=True).first() or 0
+
+
+def _transacao_anterior_aberta(desde):
+    """
+    PostgreSQL: ainda há outra transação da aplicação aberta que começou até
+    `desde`? None nos outros bancos, que não expõem essa informação.
+
+    Só conta conexões de cliente com o mesmo application_name (DB_APLICACAO):
+    relatórios manuais, sessões de outras ferramentas e o autovacuum não
+    gravam no outbox.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        # pg_stat_activity fica em cache na transação; descarta para ler o estado atual
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_stat_activity WHERE datname = current_database() "
+            "AND pid <> pg_backend_pid() AND backend_type = 'client backend' "
+            "AND application_name = current_setting('application_name') AND xact_start <= %s)",
+            [desde],
+        )
+        return cursor.fetchone()[0]
+
+
+def _rollback(de, ate, visto_em, agora):
+    """Os ids [de, ate) que faltavam desde `visto_em` nunca vão aparecer?"""
+    if agora - visto_em >= timedelta(seconds=getattr(settings, 'OUTBOX_ESPERA_MAXIMA_SEGUNDOS', 60)):
+        # Uma sessão esquecida em "idle in transaction" não pode parar os consumidores para sempre
+        logger.error("Outbox: buraco %s a %s esperado além de OUTBOX_ESPERA_MAXIMA_SEGUNDOS", de, ate - 1)
+        return True
+    aberta = _transacao_anterior_aberta(visto_em)
+    if aberta is None:
+        margem = timedelta(seconds=getattr(settings, 'OUTBOX_MARGEM_SEGUNDOS', 5))
+        return agora - visto_em >= margem
+    # Quem gravou o evento que falta começou antes do buraco ser visto; se todas essas
+    # transações acabaram e ele segue ausente, foi rollback (a releitura cobre um COMMIT no meio)
+    return not aberta and not EventoDoacao.objects.filter(id__gte=de, id__lt=ate).exists()
+
+
+def ler(apos, limite=500, buraco=None):
+    """
+    Eventos com id maior que `apos`, em ordem, no máximo `limite`, e o buraco
+    em que a leitura parou: (primeiro id que falta, quando foi visto) ou None.
+
+    Ids são reservados no INSERT mas ficam visíveis só no COMMIT, então uma
+    transação mais lenta pode "aparecer" atrás de ids já lidos. A leitura para
+    antes de um buraco na sequência até ele ser tido como rollback: em
+    PostgreSQL, quando acabam as transações que já estavam abertas ao ver o
+    buraco (no máximo OUTBOX_ESPERA_MAXIMA_SEGUNDOS); nos demais bancos,
+    OUTBOX_MARGEM_SEGUNDOS depois. O tempo conta do
+    momento em que o leitor viu o buraco (repasse o `buraco` devolvido na
+    leitura anterior), não do criado_em dos eventos: numa transação longa o
+    INSERT pode ser bem mais antigo que o COMMIT.
+    """
+    agora = timezone.now()
+    lote = []
+    esperado = apos + 1
+    for evento in EventoDoacao.objects.filter(id__gt=apos).order_by('id')[:limite]:
+        if evento.id != esperado:
+            visto_em = buraco[1] if buraco is not None and buraco[0] == esperado else agora
+            if not _rollback(esperado, evento.id, visto_em, agora):
+                return lote, (esperado, visto_em)
+            logger.warning("Outbox: ids %s a %s tratados como rollback", esperado, evento.id - 1)
+        lote.append(evento)
+        esperado = evento.id + 1
+    return lote, None
+
+
+def confirmar(consumidor, ultimo_evento):
+    """Avança o offset do consumidor (nunca retrocede)."""
+    registro, _ = OffsetConsumidor.objects.get_or_create(consumidor=consumidor)
+    if ultimo_evento > registro.ultimo_evento:
+        registro.ultimo_evento = ultimo_evento
+        registro.save(update_fields=['ultimo_evento', 'atualizado_em'])
+
+
+def consumir(consumidor, processar, limite=500):
+    """
+    Lê o próximo lote do consumidor, chama `processar(lote)` e avança o offset.
+
+    Tudo na mesma transação, com o offset bloqueado: se `processar` falhar o
+    offset não anda, e dois processos do mesmo consumidor não leem o mesmo lote.
+    Retorna o número de eventos processados.
+    """
+    with transaction.atomic():
+        registro, _ = OffsetConsumidor.objects.get_or_create(consumidor=consumidor)
+        registro = OffsetConsumidor.objects.select_for_update().get(pk=registro.pk)
+        anterior = (registro.buraco_id, registro.buraco_visto_em) if registro.buraco_id else None
+        lote, buraco = ler(registro.ultimo_evento, limite=limite, buraco=anterior)
+        if lote:
+            processar(lote)
+            registro.ultimo_evento = lote[-1].id
+        if lote or buraco != anterior:
+            # O buraco fica gravado para o tempo de espera valer entre leituras e processos
+            registro.buraco_id, registro.buraco_visto_em = buraco or (None, None)
+            registro.save(update_fields=['ultimo_evento', 'buraco_id', 'buraco_visto_em', 'atualizado_em'])
+    return len(lote)
@@ -42,6 +42,7 @@ class DoacaoAprovadaFactory(DjangoModelFactory):
     evidencia_foto = factory.Sequence(lambda n: f"evidencias/teste_aprovada_{n}.jpg")
     validado_por = SubFactory(AdminFactory)
     data_validacao = factory.LazyFunction(timezone.now)  
+    moedas_creditadas = factory.LazyAttribute(lambda obj: obj.tipo_doacao.moedas_atribuidas)
 
 
 class DoacaoRecusadaFactory(DjangoModelFactory):
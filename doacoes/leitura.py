@@ -0,0 +1,71 @@
+"""
+Leitores do caminho rápido (core/leitura.py) para as listagens de doações.
+
+Qualquer campo novo em DoacaoSerializer/BadgeSerializer/UsuarioBadgeSerializer
+precisa ser refletido aqui; o teste de contrato falha se as saídas divergirem.
+"""
+from core.imagens import url_variante
+from core.leitura import Leitor, data_hora, url_cloudinary
+
+from .models import Badge
+
+TIPOS_BADGE = dict(Badge.TIPO_CHOICES)
+
+
+class LeitorDoacoes(Leitor):
+    """Espelha DoacaoSerializer."""
+
+    colunas = (
+        'id', 'doador__username',
+        'tipo_doacao_id', 'tipo_doacao__nome', 'tipo_doacao__moedas_atribuidas',
+        'descricao', 'data_submissao', 'data_validacao', 'validado_por__username',
+        'status', 'motivo_recusa', 'evidencia_foto',
+    )
+
+    @staticmethod
+    def linha(id, doador, tipo_id, tipo_nome, tipo_moedas, descricao, data_submissao,
+              data_validacao, validado_por, status, motivo_recusa, evidencia_foto, variante='full'):
+        return {
+            'id': id,
+            'doador': doador or "Anônimo",
+            'tipo_doacao': {'id': tipo_id, 'nome': tipo_nome, 'moedas_atribuidas': tipo_moedas},
+            'descricao': descricao,
+            'data_submissao': data_hora(data_submissao),
+            'data_validacao': data_hora(data_validacao),
+            'validado_por': validado_por,
+            'status': status,
+            'motivo_recusa': motivo_recusa,
+            'evidencia_foto': url_variante(evidencia_foto, variante),
+        }
+
+
+class LeitorUsuarioBadges(Leitor):
+    """Espelha UsuarioBadgeSerializer (com a badge aninhada de BadgeSerializer)."""
+
+    colunas = (
+        'id', 'usuario__username',
+        'badge_id', 'badge__nome', 'badge__descricao', 'badge__icone', 'badge__tipo',
+        'badge__custo_moedas', 'badge__criterio_doacoes', 'badge__criterio_moedas', 'badge__ativo',
+        'data_conquista',
+    )
+
+    @staticmethod
+    def linha(id, usuario, badge_id, nome, descricao, icone, tipo, custo_moedas,
+              criterio_doacoes, criterio_moedas, ativo, data_conquista):
+        return {
+            'id': id,
+            'usuario': usuario,
+            'badge': {
+                'id': badge_id,
+                'nome': nome,
+                'descricao': descricao,
+                'icone_url': url_cloudinary(icone),
+                'tipo': tipo,
+                'tipo_display': TIPOS_BADGE.get(tipo, tipo),
+                'custo_moedas': custo_moedas,
+                'criterio_doacoes': criterio_doacoes,
+                'criterio_moedas': criterio_moedas,
+                'ativo': ativo,
+            },
+            'data_conquista': data_hora(data_conquista),
+        }
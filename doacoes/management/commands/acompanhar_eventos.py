@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from doacoes import eventos
+
+
+class Command(BaseCommand):
+    help = "Lê os eventos novos do outbox de doações para um consumidor, em lotes, e os imprime como JSON (um por linha)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumidor', required=True, help="Nome do consumidor (guarda o próprio offset).")
+        parser.add_argument('--lote', type=int, default=500, help="Eventos por lote (padrão: 500).")
+        parser.add_argument('--seguir', action='store_true', help="Continua aguardando novos eventos (como tail -f).")
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help="Segundos de espera quando não há eventos novos (padrão: 1).")
+
+    def _imprimir(self, lote):
+        for evento in lote:
+            self.stdout.write(json.dumps({
+                'id': evento.id,
+                'tipo': evento.tipo,
+                'usuario_id': evento.usuario_id,
+                'doacao_id': evento.doacao_id,
+                'payload': evento.payload,
+                'criado_em': evento.criado_em.isoformat(),
+            }, ensure_ascii=False))
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                processados = eventos.consumir(options['consumidor'], self._imprimir, limite=options['lote'])
+                if processados:
+                    continue
+                if not options['seguir']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from doacoes.services import ArquivamentoService
+
+
+class Command(BaseCommand):
+    help = (
+        "Move doações aprovadas/recusadas mais antigas que --dias para a tabela de "
+        "arquivo, em lotes. Pode ser interrompido e executado de novo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help="Idade mínima (pela data de submissão). Padrão: ARQUIVAMENTO_DIAS.",
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Doações por transação (padrão: 1000).")
+        parser.add_argument('--limite', type=int, default=None, help="Máximo de doações nesta execução.")
+        parser.add_argument('--simular', action='store_true', help="Apenas conta as doações elegíveis.")
+
+    def handle(self, *args, **options):
+        dias = options['dias'] if options['dias'] is not None else getattr(settings, 'ARQUIVAMENTO_DIAS', 365)
+        if dias < 0 or options['lote'] < 1 or (options['limite'] is not None and options['limite'] < 1):
+            raise CommandError("--dias não pode ser negativo; --lote e --limite devem ser maiores que zero.")
+
+        elegiveis = ArquivamentoService.elegiveis(dias).count()
+        self.stdout.write(f"{elegiveis} doação(ões) validada(s) com mais de {dias} dia(s).")
+        if options['simular'] or not elegiveis:
+            return
+
+        def progresso(arquivadas, segundos):
+            self.stdout.write(f"  {arquivadas} arquivada(s) ({arquivadas / max(segundos, 1e-6):.0f} linhas/s)")
+
+        resultado = ArquivamentoService.arquivar(
+            dias, lote=options['lote'], limite=options['limite'], progresso=progresso
+        )
+        segundos = resultado['segundos']
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['arquivadas']} doação(ões) arquivada(s) em {segundos:.1f}s "
+            f"({resultado['arquivadas'] / max(segundos, 1e-6):.0f} linhas/s)."
+        ))
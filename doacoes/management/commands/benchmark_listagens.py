@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from contas.models import Usuario
+from doacoes.leitura import LeitorDoacoes
+from doacoes.models import Doacao, TipoDoacao
+from doacoes.serializers import DoacaoSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara DoacaoSerializer com o caminho rápido (values_list) numa página "
+        "de doações, incluindo as consultas. Os dados de teste são gerados numa "
+        "transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itens', type=int, default=50, help="Doações por página (padrão: 50).")
+        parser.add_argument('--repeticoes', type=int, default=200, help="Páginas lidas por medição (padrão: 200).")
+
+    def handle(self, *args, **options):
+        itens, repeticoes = options['itens'], options['repeticoes']
+        if itens < 1 or repeticoes < 1:
+            raise CommandError("--itens e --repeticoes devem ser maiores que zero.")
+
+        try:
+            with transaction.atomic():
+                queryset = self._gerar(itens)
+                serializer = self._medir(
+                    lambda: DoacaoSerializer(list(queryset.select_related('doador', 'tipo_doacao', 'validado_por')), many=True).data,
+                    repeticoes,
+                )
+                rapido = self._medir(lambda: LeitorDoacoes.listar(queryset), repeticoes)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"Página com {itens} doação(ões), {repeticoes} repetição(ões) (consulta + montagem):")
+        self.stdout.write(f"  serializer:     {serializer * 1000:.3f} ms/página")
+        self.stdout.write(f"  caminho rápido: {rapido * 1000:.3f} ms/página ({serializer / rapido:.1f}x)")
+
+    def _medir(self, funcao, repeticoes):
+        funcao()
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        return (time.perf_counter() - inicio) / repeticoes
+
+    def _gerar(self, itens):
+        doador = Usuario.objects.create(username='benchmark_listagens', email='benchmark_listagens@ufrpe.br')
+        admin = Usuario.objects.create(username='benchmark_listagens_admin', is_staff=True)
+        tipo = TipoDoacao.objects.create(nome='Benchmark de listagens', moedas_atribuidas=10)
+        agora = timezone.now()
+        Doacao.objects.bulk_create([
+            Doacao(
+                doador=doador, tipo_doacao=tipo, evidencia_foto=f'evidencias/benchmark_{i}',
+                descricao=f'Doação de teste número {i} para medir a listagem.',
+                status='APROVADA' if i % 2 else 'PENDENTE',
+                validado_por=admin if i % 2 else None, data_validacao=agora if i % 2 else None,
+            )
+            for i in range(itens)
+        ])
+        return Doacao.objects.filter(doador=doador).order_by('-data_submissao')
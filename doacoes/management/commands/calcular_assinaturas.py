@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from doacoes.services import SimilaridadeImagemService
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula o dHash das fotos de evidência que ainda não têm assinatura "
+        "(doações anteriores à detecção de fotos repetidas). Pode ser executado de novo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=200, help="Doações lidas por consulta (padrão: 200).")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Processos para baixar e calcular (padrão: um por CPU; 0 = sem pool).",
+        )
+        parser.add_argument('--limite', type=int, default=None, help="Máximo de fotos nesta execução.")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or (options['workers'] is not None and options['workers'] < 0) \
+                or (options['limite'] is not None and options['limite'] < 1):
+            raise CommandError("--lote e --limite devem ser maiores que zero; --workers não pode ser negativo.")
+
+        def progresso(calculadas, falhas):
+            self.stdout.write(f"  {calculadas} calculada(s), {falhas} falha(s)")
+
+        resultado = SimilaridadeImagemService.calcular_faltantes(
+            lote=options['lote'], workers=options['workers'], limite=options['limite'], progresso=progresso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['calculadas']} assinatura(s) calculada(s); {resultado['falhas']} foto(s) sem download ou ilegível(is)."
+        ))
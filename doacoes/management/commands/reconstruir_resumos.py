@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from doacoes import resumos
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os resumos diários dos relatórios (ResumoDiario, DoadorAtivoDia) a partir "
+        "das doações quentes e arquivadas e posiciona o consumidor 'resumos' no último evento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde', default=None,
+            help="Primeiro dia a recalcular (AAAA-MM-DD). Padrão: todo o histórico.",
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError("--desde deve estar no formato AAAA-MM-DD.")
+
+        linhas = resumos.reconstruir(desde)
+        periodo = f"desde {desde.isoformat()}" if desde else "de todo o histórico"
+        self.stdout.write(self.style.SUCCESS(f"{linhas} resumo(s) diário(s) recalculado(s) {periodo}."))
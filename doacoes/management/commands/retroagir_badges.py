@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from doacoes.models import Badge
+from doacoes.services import BadgeService
+
+
+class Command(BaseCommand):
+    help = "Atribui badges de conquista aos usuários que já cumprem os critérios."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--badge', type=int, action='append', dest='badges',
+                            help="ID da badge (pode repetir). Padrão: todas as badges de conquista ativas.")
+        parser.add_argument('--lote', type=int, default=1000, help="Atribuições por lote de inserção (padrão: 1000).")
+
+    def handle(self, *args, **options):
+        badges = Badge.objects.filter(tipo='CONQUISTA', ativo=True)
+        if options['badges']:
+            badges = badges.filter(id__in=options['badges'])
+
+        total = 0
+        for badge in badges:
+            premiados = BadgeService.retroagir_badge(badge, tamanho_lote=options['lote'])
+            total += premiados
+            self.stdout.write(f"  {badge.nome}: {premiados} usuário(s) premiado(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"{total} badge(s) atribuída(s)."))
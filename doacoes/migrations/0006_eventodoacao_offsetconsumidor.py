@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0005_alter_badge_icone_alter_doacao_descricao_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OffsetConsumidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumidor', models.CharField(max_length=100, unique=True)),
+                ('ultimo_evento', models.BigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Offset de consumidor',
+                'verbose_name_plural': 'Offsets de consumidores',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoDoacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('DOACAO_CRIADA', 'Doação criada'), ('DOACAO_APROVADA', 'Doação aprovada'), ('DOACAO_RECUSADA', 'Doação recusada'), ('BADGE_CONQUISTADA', 'Badge conquistada')], max_length=30)),
+                ('doacao_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de doação',
+                'verbose_name_plural': 'Eventos de doação',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['usuario', 'id'], name='doacoes_eve_usuario_c35490_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def preencher_atualizado_em(apps, schema_editor):
+    # Linhas existentes: última mudança conhecida é a validação ou a submissão
+    Doacao = apps.get_model('doacoes', 'Doacao')
+    Doacao.objects.update(atualizado_em=Coalesce('data_validacao', 'data_submissao'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0006_eventodoacao_offsetconsumidor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doacao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(preencher_atualizado_em, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='eventodoacao',
+            name='tipo',
+            field=models.CharField(choices=[('DOACAO_CRIADA', 'Doação criada'), ('DOACAO_APROVADA', 'Doação aprovada'), ('DOACAO_RECUSADA', 'Doação recusada'), ('BADGE_CONQUISTADA', 'Badge conquistada'), ('DOACAO_EXCLUIDA', 'Doação excluída')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['doador', 'atualizado_em'], name='doacoes_doa_doador__f22de7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['atualizado_em'], name='doacoes_doa_atualiz_c58620_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventodoacao',
+            index=models.Index(fields=['tipo', 'criado_em'], name='doacoes_eve_tipo_6bcb9f_idx'),
+        ),
+    ]
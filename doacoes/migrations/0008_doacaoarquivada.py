@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:38
+
+import cloudinary.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0007_doacao_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('APROVADA', 'Aprovada'), ('RECUSADA', 'Recusada')], max_length=10)),
+                ('evidencia_foto', cloudinary.models.CloudinaryField(max_length=255, verbose_name='evidencia')),
+                ('motivo_recusa', models.TextField(blank=True, null=True)),
+                ('data_submissao', models.DateTimeField()),
+                ('descricao', models.TextField(blank=True, max_length=500, null=True)),
+                ('data_validacao', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivada_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('doador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doacoes_arquivadas', to=settings.AUTH_USER_MODEL)),
+                ('tipo_doacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='doacoes.tipodoacao')),
+                ('validado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Doação arquivada',
+                'verbose_name_plural': 'Doações arquivadas',
+                'ordering': ['-data_submissao'],
+                'indexes': [models.Index(fields=['doador', 'data_submissao'], name='doacoes_doa_doador__78f573_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0008_doacaoarquivada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['doador', '-data_submissao'], name='doacoes_doa_doador__e6e726_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['data_submissao'], name='doacoes_doa_data_su_3153a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doacaoarquivada',
+            index=models.Index(fields=['data_submissao'], name='doacoes_doa_data_su_74e1f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuariobadge',
+            index=models.Index(fields=['usuario', '-data_conquista'], name='doacoes_usu_usuario_03a797_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuariobadge',
+            index=models.Index(fields=['badge', '-data_conquista'], name='doacoes_usu_badge_i_714b75_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuariobadge',
+            index=models.Index(fields=['data_conquista'], name='doacoes_usu_data_co_6a8229_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0009_indices_listagens_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssinaturaImagem',
+            fields=[
+                ('doacao_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('dhash', models.BigIntegerField()),
+                ('parte0', models.PositiveIntegerField(db_index=True)),
+                ('parte1', models.PositiveIntegerField(db_index=True)),
+                ('parte2', models.PositiveIntegerField(db_index=True)),
+                ('parte3', models.PositiveIntegerField(db_index=True)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Assinatura de imagem',
+                'verbose_name_plural': 'Assinaturas de imagem',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0010_assinaturaimagem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoadorAtivoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Doador ativo no dia',
+                'verbose_name_plural': 'Doadores ativos por dia',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'usuario'), name='doador_ativo_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('submetidas', models.PositiveIntegerField(default=0)),
+                ('aprovadas', models.PositiveIntegerField(default=0)),
+                ('recusadas', models.PositiveIntegerField(default=0)),
+                ('moedas', models.BigIntegerField(default=0)),
+                ('latencia', models.JSONField(blank=True, default=dict)),
+                ('tipo_doacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='doacoes.tipodoacao')),
+            ],
+            options={
+                'verbose_name': 'Resumo diário',
+                'verbose_name_plural': 'Resumos diários',
+                'ordering': ['dia', 'tipo_doacao'],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'tipo_doacao'), name='resumo_diario_dia_tipo_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_moedas(apps, schema_editor):
+    """Aprovadas até aqui recebem o valor atual do tipo (o que os totais já somavam)."""
+    TipoDoacao = apps.get_model('doacoes', 'TipoDoacao')
+    moedas_do_tipo = Subquery(
+        TipoDoacao.objects.filter(pk=OuterRef('tipo_doacao_id')).values('moedas_atribuidas')[:1]
+    )
+    for nome in ('Doacao', 'DoacaoArquivada'):
+        modelo = apps.get_model('doacoes', nome)
+        modelo.objects.filter(status='APROVADA', tipo_doacao__moedas_atribuidas__gt=0).update(
+            moedas_creditadas=moedas_do_tipo,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0011_resumos_diarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='doacao',
+            name='doacoes_doa_doador__a90893_idx',
+        ),
+        migrations.AddField(
+            model_name='doacao',
+            name='moedas_creditadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='doacaoarquivada',
+            name='moedas_creditadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Antes dos índices novos: o UPDATE não precisa mantê-los
+        migrations.RunPython(preencher_moedas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['doador', 'status', 'moedas_creditadas'], name='doacoes_doa_doador__9e125e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doacaoarquivada',
+            index=models.Index(fields=['doador', 'status', 'moedas_creditadas'], name='doacoes_doa_doador__35ea8c_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0012_moedas_creditadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offsetconsumidor',
+            name='buraco_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='offsetconsumidor',
+            name='buraco_visto_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doacoes', '0013_offset_buraco'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStreamUsado',
+            fields=[
+                ('nonce', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('usado_em', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Ticket SSE usado',
+                'verbose_name_plural': 'Tickets SSE usados',
+            },
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.dispatch import Signal
 from django.utils import timezone
 from contas.models import Usuario
 from cloudinary.models import CloudinaryField
 
+from . import similaridade
+
 class TipoDoacao(models.Model):
 
     nome = models.CharField(max_length=100, unique=True)
@@ -11,6 +14,14 @@ class TipoDoacao(models.Model):
     def __str__(self):
         return self.nome
 
+class DoacaoJaValidada(Exception):
+    """aprovar()/recusar() numa doação que já não está PENDENTE."""
+
+    def __init__(self, status):
+        super().__init__(f"Doação já validada ({status}).")
+        self.status = status
+
+
 class Doacao(models.Model):
 
     STATUS_CHOICES = [
@@ -40,20 +51,41 @@ class Doacao(models.Model):
 
     validado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='doacoes_validadas')
     data_validacao = models.DateTimeField(null=True, blank=True)
+    # Muda em toda gravação (criação, aprovar, recusar); base do modo ?since= das listagens
+    atualizado_em = models.DateTimeField(auto_now=True)
+    # Cópia de tipo_doacao.moedas_atribuidas na aprovação: os totais somam esta coluna
+    # (sem JOIN) e mudar o tipo depois não reescreve o histórico
+    moedas_creditadas = models.PositiveIntegerField(default=0)
+
+    def _bloquear_pendente(self):
+        """
+        Bloqueia a linha e confirma que ela segue PENDENTE. A validação é
+        definitiva: a aprovação já pode ter creditado moedas_creditadas no saldo.
+        """
+        atual = Doacao.objects.select_for_update().filter(pk=self.pk).values_list('status', flat=True).first()
+        if atual != 'PENDENTE':
+            raise DoacaoJaValidada(atual)
 
     def aprovar(self, usuario_validador):
-        self.status = 'APROVADA'
-        self.motivo_recusa = None
-        self.data_validacao = timezone.now()
-        self.validado_por = usuario_validador
-        self.save()
+        with transaction.atomic():
+            self._bloquear_pendente()
+            self.status = 'APROVADA'
+            self.moedas_creditadas = max(self.tipo_doacao.moedas_atribuidas, 0)
+            self.motivo_recusa = None
+            self.data_validacao = timezone.now()
+            self.validado_por = usuario_validador
+            self.save()
+            EventoDoacao.publicar('DOACAO_APROVADA', self.doador_id, doacao=self)
 
     def recusar(self, usuario_validador, motivo):
-        self.status = 'RECUSADA'
-        self.motivo_recusa = motivo
-        self.data_validacao = timezone.now()
-        self.validado_por = usuario_validador
-        self.save()
+        with transaction.atomic():
+            self._bloquear_pendente()
+            self.status = 'RECUSADA'
+            self.motivo_recusa = motivo
+            self.data_validacao = timezone.now()
+            self.validado_por = usuario_validador
+            self.save()
+            EventoDoacao.publicar('DOACAO_RECUSADA', self.doador_id, doacao=self)
 
     class Meta:
         ordering = ['-data_submissao']
@@ -61,13 +93,89 @@ class Doacao(models.Model):
         verbose_name_plural = "Doações"
         indexes = [
             models.Index(fields=['status', 'data_submissao']),
-            models.Index(fields=['doador', 'status']),
+            # Totais de moedas do doador só pelo índice (BadgeService.totais_aprovados)
+            models.Index(fields=['doador', 'status', 'moedas_creditadas']),
+            models.Index(fields=['doador', 'atualizado_em']),
+            models.Index(fields=['atualizado_em']),
+            # Histórico do doador e admin (ordering/date_hierarchy)
+            models.Index(fields=['doador', '-data_submissao']),
+            models.Index(fields=['data_submissao']),
         ]
 
     def __str__(self):       
         return f"Doação de {self.tipo_doacao.nome} por {self.doador.username} ({self.status})"
 
 
+class DoacaoArquivada(models.Model):
+    """
+    Doações validadas antigas, movidas de Doacao pelo comando `arquivar_doacoes`.
+
+    Mesmas colunas (e mesmo id) da tabela quente, para que a cópia seja um
+    INSERT ... SELECT e as leituras possam unir as duas tabelas.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    doador = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='doacoes_arquivadas')
+    tipo_doacao = models.ForeignKey(TipoDoacao, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=10, choices=Doacao.STATUS_CHOICES)
+    evidencia_foto = CloudinaryField('evidencia', folder='evidencias')
+    motivo_recusa = models.TextField(blank=True, null=True)
+    data_submissao = models.DateTimeField()
+    descricao = models.TextField(blank=True, null=True, max_length=500)
+    validado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    data_validacao = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField()
+    moedas_creditadas = models.PositiveIntegerField(default=0)
+    arquivada_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-data_submissao']
+        verbose_name = "Doação arquivada"
+        verbose_name_plural = "Doações arquivadas"
+        indexes = [
+            models.Index(fields=['doador', 'data_submissao']),
+            models.Index(fields=['data_submissao']),
+            models.Index(fields=['doador', 'status', 'moedas_creditadas']),
+        ]
+
+    def __str__(self):
+        return f"Doação arquivada #{self.id} ({self.status})"
+
+
+class AssinaturaImagem(models.Model):
+    """
+    dHash da foto de evidência de uma doação, com as 4 partes de 16 bits
+    indexadas para a busca de fotos parecidas (ver doacoes/similaridade.py).
+
+    Sem FK: a doação pode ir para DoacaoArquivada (mesmo id) e a foto
+    continua servindo de comparação para os próximos envios.
+    """
+
+    doacao_id = models.BigIntegerField(primary_key=True)
+    dhash = models.BigIntegerField()
+    parte0 = models.PositiveIntegerField(db_index=True)
+    parte1 = models.PositiveIntegerField(db_index=True)
+    parte2 = models.PositiveIntegerField(db_index=True)
+    parte3 = models.PositiveIntegerField(db_index=True)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Assinatura de imagem"
+        verbose_name_plural = "Assinaturas de imagem"
+
+    def __str__(self):
+        return f"Doação #{self.doacao_id}: {self.dhash & 0xFFFFFFFFFFFFFFFF:016x}"
+
+    @classmethod
+    def de_valor(cls, doacao_id, valor):
+        """Instância (não salva) a partir da assinatura sem sinal de similaridade.dhash()."""
+        p0, p1, p2, p3 = similaridade.partes(valor)
+        return cls(
+            doacao_id=doacao_id, dhash=similaridade.para_banco(valor),
+            parte0=p0, parte1=p1, parte2=p2, parte3=p3,
+        )
+
+
 class Badge(models.Model):
     TIPO_CHOICES = [
         ('CONQUISTA', 'Conquista Automática'),
@@ -113,6 +221,204 @@ class UsuarioBadge(models.Model):
     class Meta:
         # Garantir que um usuário não possa conquistar o mesmo badge mais de uma vez
         unique_together = ('usuario', 'badge')
+        indexes = [
+            # /badges/minhas/, filtro por badge do admin e date_hierarchy
+            models.Index(fields=['usuario', '-data_conquista']),
+            models.Index(fields=['badge', '-data_conquista']),
+            models.Index(fields=['data_conquista']),
+        ]
 
     def __str__(self):
         return f"{self.usuario.username} - {self.badge.nome}"
+
+
+
+# Disparado (após o commit) sempre que eventos são gravados no outbox
+eventos_publicados = Signal()
+
+# Canal do NOTIFY em PostgreSQL (ver doacoes/stream.py)
+CANAL_EVENTOS = 'doacoes_eventos'
+
+
+def payloads_notify(usuario_ids, tamanho=7900):
+    """Ids dos usuários separados por vírgula, em payloads abaixo do limite do NOTIFY (8000 bytes)."""
+    payload = ''
+    for usuario_id in usuario_ids:
+        parte = str(usuario_id)
+        if payload and len(payload) + len(parte) + 1 > tamanho:
+            yield payload
+            payload = ''
+        payload = f"{payload},{parte}" if payload else parte
+    if payload:
+        yield payload
+
+
+class EventoDoacao(models.Model):
+    """
+    Outbox de eventos de doações e badges.
+
+    Cada evento é gravado na mesma transação da mudança que o originou, e o id
+    (autoincremento) serve de sequência para os consumidores: quem guarda o
+    último id processado lê apenas o que mudou desde então (ver doacoes/eventos.py).
+    """
+
+    TIPO_CHOICES = [
+        ('DOACAO_CRIADA', 'Doação criada'),
+        ('DOACAO_APROVADA', 'Doação aprovada'),
+        ('DOACAO_RECUSADA', 'Doação recusada'),
+        ('BADGE_CONQUISTADA', 'Badge conquistada'),
+        ('DOACAO_EXCLUIDA', 'Doação excluída'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    # Sem constraint: o evento sobrevive à remoção do usuário ou da doação
+    usuario = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    doacao_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Evento de doação"
+        verbose_name_plural = "Eventos de doação"
+        indexes = [
+            models.Index(fields=['usuario', 'id']),
+            models.Index(fields=['tipo', 'criado_em']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.tipo} (usuário {self.usuario_id})"
+
+    @staticmethod
+    def _dados_doacao(doacao):
+        return {
+            'status': doacao.status,
+            'tipo_doacao_id': doacao.tipo_doacao_id,
+            'validado_por_id': doacao.validado_por_id,
+            'moedas_creditadas': doacao.moedas_creditadas,
+            'data_submissao': doacao.data_submissao.isoformat() if doacao.data_submissao else None,
+            'data_validacao': doacao.data_validacao.isoformat() if doacao.data_validacao else None,
+        }
+
+    @staticmethod
+    def _avisar(usuario_ids):
+        """Acorda os assinantes (SSE) desses usuários quando a transação atual for confirmada."""
+        usuario_ids = sorted(set(usuario_ids))
+        if connection.vendor == 'postgresql':
+            # O NOTIFY só é entregue no COMMIT; repetições na mesma transação são agrupadas.
+            # O payload leva os destinatários, para o ouvinte acordar só as conexões deles
+            with connection.cursor() as cursor:
+                for payload in payloads_notify(usuario_ids):
+                    cursor.execute("SELECT pg_notify(%s, %s)", [CANAL_EVENTOS, payload])
+        transaction.on_commit(lambda: eventos_publicados.send(sender=EventoDoacao, usuario_ids=usuario_ids))
+
+    @classmethod
+    def publicar(cls, tipo, usuario_id, doacao=None, **payload):
+        """Grava um evento. Deve ser chamado dentro da transação da mudança."""
+        if doacao is not None:
+            payload = {**cls._dados_doacao(doacao), **payload}
+        evento = cls.objects.create(
+            tipo=tipo, usuario_id=usuario_id, doacao_id=doacao.pk if doacao is not None else None, payload=payload
+        )
+        cls._avisar([usuario_id])
+        return evento
+
+    @classmethod
+    def publicar_em_lote(cls, eventos):
+        """Grava vários eventos (instâncias não salvas) em uma única inserção."""
+        if not eventos:
+            return []
+        criados = cls.objects.bulk_create(eventos)
+        cls._avisar(evento.usuario_id for evento in eventos)
+        return criados
+
+    @classmethod
+    def publicar_badges(cls, usuario_id, badges, doacao=None):
+        """Grava um evento BADGE_CONQUISTADA por badge."""
+        return cls.publicar_em_lote([
+            cls(
+                tipo='BADGE_CONQUISTADA', usuario_id=usuario_id,
+                doacao_id=doacao.pk if doacao is not None else None,
+                payload={'badge_id': badge.id, 'badge_nome': badge.nome},
+            )
+            for badge in badges
+        ])
+
+
+class OffsetConsumidor(models.Model):
+    """Último evento do outbox já processado por cada consumidor."""
+
+    consumidor = models.CharField(max_length=100, unique=True)
+    ultimo_evento = models.BigIntegerField(default=0)
+    # Buraco na sequência em que a leitura está parada e quando foi visto (doacoes/eventos.py)
+    buraco_id = models.BigIntegerField(null=True, blank=True)
+    buraco_visto_em = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Offset de consumidor"
+        verbose_name_plural = "Offsets de consumidores"
+
+    def __str__(self):
+        return f"{self.consumidor} @ {self.ultimo_evento}"
+
+
+class ResumoDiario(models.Model):
+    """
+    Totais de um dia por tipo de doação, para os relatórios do admin.
+
+    Mantido pelo consumidor 'resumos' do outbox (doacoes/resumos.py): envios
+    contam no dia da submissão; aprovações, recusas, moedas e a latência de
+    aprovação, no dia da validação. `latencia` é um EsbocoQuantis (core/esboco.py)
+    com os segundos entre submissão e aprovação, somável entre dias.
+    """
+
+    dia = models.DateField()
+    tipo_doacao = models.ForeignKey(TipoDoacao, on_delete=models.CASCADE, related_name='+')
+    submetidas = models.PositiveIntegerField(default=0)
+    aprovadas = models.PositiveIntegerField(default=0)
+    recusadas = models.PositiveIntegerField(default=0)
+    moedas = models.BigIntegerField(default=0)
+    latencia = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ['dia', 'tipo_doacao']
+        verbose_name = "Resumo diário"
+        verbose_name_plural = "Resumos diários"
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'tipo_doacao'], name='resumo_diario_dia_tipo_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} / tipo {self.tipo_doacao_id}"
+
+
+class DoadorAtivoDia(models.Model):
+    """Usuários que enviaram ao menos uma doação no dia (doadores ativos distintos por período)."""
+
+    dia = models.DateField()
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = "Doador ativo no dia"
+        verbose_name_plural = "Doadores ativos por dia"
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'usuario'], name='doador_ativo_dia_unico'),
+        ]
+
+
+class TicketStreamUsado(models.Model):
+    """
+    Tickets do fluxo SSE já resgatados (doacoes/stream.py). No banco, e não no
+    cache, para o uso único valer entre processos mesmo sem Redis.
+    """
+
+    nonce = models.CharField(max_length=32, primary_key=True)
+    usado_em = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Ticket SSE usado"
+        verbose_name_plural = "Tickets SSE usados"
+
+    def __str__(self):
+        return self.nonce
@@ -0,0 +1,273 @@
+"""
+Resumos diários para os relatórios do admin (ResumoDiario, DoadorAtivoDia).
+
+Incremental: o consumidor 'resumos' do outbox lê os eventos DOACAO_CRIADA,
+DOACAO_APROVADA e DOACAO_RECUSADA em lotes e aplica cada lote de uma vez
+(uma linha por dia e tipo). Cada publicação de eventos agenda a tarefa
+`doacoes.consolidar_resumos`, no máximo uma por janela de
+RESUMOS_INTERVALO_SEGUNDOS, então a cadeia de envio/validação não espera
+nem disputa as mesmas linhas de resumo.
+
+`reconstruir` refaz o histórico a partir de Doacao e DoacaoArquivada (carga
+inicial, correções). Doações excluídas não estão mais nas tabelas: a
+reconstrução não as conta, enquanto o incremental contou o envio quando ele
+aconteceu.
+
+Os relatórios só leem essas tabelas, sem GROUP BY sobre as doações.
+"""
+from collections import defaultdict
+from datetime import datetime, time as hora, timezone as fuso
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from contas.models import Usuario
+from core.esboco import EsbocoQuantis
+from core.tarefas import batimento, enfileirar
+
+from . import eventos
+from .models import (
+    Doacao, DoacaoArquivada, DoadorAtivoDia, EventoDoacao, OffsetConsumidor, ResumoDiario, TipoDoacao,
+)
+
+CONSUMIDOR = 'resumos'
+QUANTIS = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+_CONTADORES = ('submetidas', 'aprovadas', 'recusadas', 'moedas')
+
+
+class _Acumulador:
+    """Deltas de um lote, somados às linhas existentes numa única passada."""
+
+    def __init__(self):
+        self.linhas = defaultdict(lambda: {**dict.fromkeys(_CONTADORES, 0), 'latencia': EsbocoQuantis()})
+        self.ativos = set()
+
+    def submissao(self, dia, tipo_id, usuario_id, quantidade=1):
+        self.linhas[(dia, tipo_id)]['submetidas'] += quantidade
+        if usuario_id is not None:
+            self.ativos.add((dia, usuario_id))
+
+    def validacao(self, dia, tipo_id, status, quantidade=1, moedas=0):
+        linha = self.linhas[(dia, tipo_id)]
+        linha['aprovadas' if status == 'APROVADA' else 'recusadas'] += quantidade
+        linha['moedas'] += moedas
+
+    def latencia(self, dia, tipo_id, segundos):
+        self.linhas[(dia, tipo_id)]['latencia'].adicionar(segundos)
+
+    def gravar(self):
+        tipos = set(TipoDoacao.objects.filter(id__in={tipo for _, tipo in self.linhas}).values_list('id', flat=True))
+        chaves = [chave for chave in self.linhas if chave[1] in tipos]
+        if chaves:
+            existentes = {
+                (resumo.dia, resumo.tipo_doacao_id): resumo
+                for resumo in ResumoDiario.objects.select_for_update().filter(
+                    dia__in={dia for dia, _ in chaves}, tipo_doacao_id__in={tipo for _, tipo in chaves},
+                )
+            }
+            alterados, novos = [], []
+            for chave in chaves:
+                delta = self.linhas[chave]
+                resumo = existentes.get(chave)
+                if resumo is None:
+                    resumo = ResumoDiario(dia=chave[0], tipo_doacao_id=chave[1])
+                    novos.append(resumo)
+                else:
+                    alterados.append(resumo)
+                for campo in _CONTADORES:
+                    setattr(resumo, campo, getattr(resumo, campo) + delta[campo])
+                resumo.latencia = EsbocoQuantis.de_dict(resumo.latencia).mesclar(delta['latencia']).para_dict()
+            ResumoDiario.objects.bulk_update(alterados, [*_CONTADORES, 'latencia'], batch_size=500)
+            ResumoDiario.objects.bulk_create(novos, batch_size=500)
+
+        if self.ativos:
+            usuarios = set(Usuario.objects.filter(
+                id__in={usuario for _, usuario in self.ativos}
+            ).values_list('id', flat=True))
+            DoadorAtivoDia.objects.bulk_create(
+                [DoadorAtivoDia(dia=dia, usuario_id=usuario) for dia, usuario in self.ativos if usuario in usuarios],
+                ignore_conflicts=True, batch_size=1000,
+            )
+
+
+def _momento(valor, padrao=None):
+    return parse_datetime(valor) if valor else padrao
+
+
+def aplicar(lote):
+    """Soma aos resumos o efeito de um lote de eventos do outbox."""
+    acumulador = _Acumulador()
+    sem_moedas = defaultdict(int)
+    for evento in lote:
+        dados = evento.payload
+        if evento.tipo == 'DOACAO_CRIADA':
+            submissao = _momento(dados.get('data_submissao'), evento.criado_em)
+            acumulador.submissao(timezone.localdate(submissao), dados['tipo_doacao_id'], evento.usuario_id)
+        elif evento.tipo in ('DOACAO_APROVADA', 'DOACAO_RECUSADA'):
+            validacao = _momento(dados.get('data_validacao'), evento.criado_em)
+            dia = timezone.localdate(validacao)
+            status = 'APROVADA' if evento.tipo == 'DOACAO_APROVADA' else 'RECUSADA'
+            moedas = dados.get('moedas_creditadas') if status == 'APROVADA' else 0
+            if moedas is None:
+                # Evento anterior a Doacao.moedas_creditadas: vale o valor atual do tipo
+                sem_moedas[(dia, dados['tipo_doacao_id'])] += 1
+            acumulador.validacao(dia, dados['tipo_doacao_id'], status, moedas=moedas or 0)
+            submissao = _momento(dados.get('data_submissao'))
+            if status == 'APROVADA' and submissao is not None:
+                acumulador.latencia(dia, dados['tipo_doacao_id'], (validacao - submissao).total_seconds())
+
+    if sem_moedas:
+        moedas = dict(TipoDoacao.objects.filter(
+            id__in={tipo_id for _, tipo_id in sem_moedas}
+        ).values_list('id', 'moedas_atribuidas'))
+        for (dia, tipo_id), aprovadas in sem_moedas.items():
+            acumulador.linhas[(dia, tipo_id)]['moedas'] += aprovadas * moedas.get(tipo_id, 0)
+    acumulador.gravar()
+
+
+def consolidar(limite=500):
+    """Aplica todos os eventos ainda não consumidos. Retorna quantos foram lidos."""
+    total = 0
+    while processados := eventos.consumir(CONSUMIDOR, aplicar, limite=limite):
+        total += processados
+        batimento()
+    return total
+
+
+def agendar_consolidacao():
+    """Enfileira a consolidação para o fim da janela atual (uma tarefa por janela)."""
+    intervalo = max(1, getattr(settings, 'RESUMOS_INTERVALO_SEGUNDOS', 60))
+    janela = int(timezone.now().timestamp() // intervalo) + 1
+    enfileirar(
+        'doacoes.consolidar_resumos', chave=f'consolidar-resumos:{janela}',
+        executar_apos=datetime.fromtimestamp(janela * intervalo, tz=fuso.utc),
+    )
+
+
+# ============================================================================
+# RECONSTRUÇÃO
+# ============================================================================
+
+def _reconstruir_tabela(modelo, inicio, acumulador):
+    doacoes = modelo.objects.order_by()
+    enviadas = doacoes.filter(data_submissao__gte=inicio) if inicio else doacoes
+    for linha in (
+        enviadas.annotate(dia=TruncDate('data_submissao'))
+        .values('dia', 'tipo_doacao_id').annotate(quantidade=Count('id'))
+    ):
+        acumulador.submissao(linha['dia'], linha['tipo_doacao_id'], None, linha['quantidade'])
+
+    validadas = doacoes.filter(status__in=('APROVADA', 'RECUSADA'), data_validacao__isnull=False)
+    if inicio:
+        validadas = validadas.filter(data_validacao__gte=inicio)
+    for linha in (
+        validadas.annotate(dia=TruncDate('data_validacao'))
+        .values('dia', 'tipo_doacao_id', 'status')
+        .annotate(quantidade=Count('id'), moedas=Sum('moedas_creditadas'))
+    ):
+        moedas = linha['moedas'] if linha['status'] == 'APROVADA' else 0
+        acumulador.validacao(linha['dia'], linha['tipo_doacao_id'], linha['status'], linha['quantidade'], moedas or 0)
+
+    # O esboço precisa de cada latência: só os dois instantes, em blocos
+    aprovadas = validadas.filter(status='APROVADA').values_list('data_submissao', 'data_validacao', 'tipo_doacao_id')
+    for submissao, validacao, tipo_id in aprovadas.iterator(chunk_size=5000):
+        acumulador.latencia(timezone.localdate(validacao), tipo_id, (validacao - submissao).total_seconds())
+
+    ativos = enviadas.annotate(dia=TruncDate('data_submissao')).values_list('dia', 'doador_id').distinct()
+    lote = []
+    for dia, usuario_id in ativos.iterator(chunk_size=5000):
+        lote.append(DoadorAtivoDia(dia=dia, usuario_id=usuario_id))
+        if len(lote) >= 5000:
+            DoadorAtivoDia.objects.bulk_create(lote, ignore_conflicts=True)
+            lote = []
+    DoadorAtivoDia.objects.bulk_create(lote, ignore_conflicts=True)
+
+
+def reconstruir(desde=None):
+    """
+    Refaz os resumos a partir de `desde` (date; None = todo o histórico) com base
+    nas tabelas de doações e posiciona o consumidor no último evento.
+
+    Primeiro consome os eventos pendentes (que podem ser de dias anteriores a
+    `desde`); depois, com o offset do consumidor bloqueado, apaga e recalcula
+    os dias do intervalo. Retorna o número de linhas de ResumoDiario gravadas.
+    """
+    consolidar()
+    inicio = timezone.make_aware(datetime.combine(desde, hora.min)) if desde else None
+    with transaction.atomic():
+        registro, _ = OffsetConsumidor.objects.get_or_create(consumidor=CONSUMIDOR)
+        registro = OffsetConsumidor.objects.select_for_update().get(pk=registro.pk)
+        ultimo = EventoDoacao.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+        resumos, ativos = ResumoDiario.objects.all(), DoadorAtivoDia.objects.all()
+        if desde:
+            resumos, ativos = resumos.filter(dia__gte=desde), ativos.filter(dia__gte=desde)
+        resumos.delete()
+        ativos.delete()
+
+        acumulador = _Acumulador()
+        for modelo in (Doacao, DoacaoArquivada):
+            _reconstruir_tabela(modelo, inicio, acumulador)
+        acumulador.gravar()
+
+        registro.ultimo_evento = max(registro.ultimo_evento, ultimo)
+        registro.buraco_id = registro.buraco_visto_em = None
+        registro.save(update_fields=['ultimo_evento', 'buraco_id', 'buraco_visto_em', 'atualizado_em'])
+    return len(acumulador.linhas)
+
+
+# ============================================================================
+# RELATÓRIO
+# ============================================================================
+
+def _latencia(esboco):
+    resumo = {'amostras': esboco.total}
+    for nome, q in QUANTIS:
+        valor = esboco.quantil(q)
+        resumo[nome] = round(valor) if valor is not None else None
+    return resumo
+
+
+def relatorio(desde, ate, tipo_doacao_id=None):
+    """Totais do período e série diária (por tipo), lidos só das tabelas de resumo."""
+    resumos = ResumoDiario.objects.filter(dia__range=(desde, ate)).select_related('tipo_doacao')
+    if tipo_doacao_id is not None:
+        resumos = resumos.filter(tipo_doacao_id=tipo_doacao_id)
+    ativos = DoadorAtivoDia.objects.filter(dia__range=(desde, ate))
+    ativos_por_dia = dict(ativos.values('dia').annotate(total=Count('id')).values_list('dia', 'total'))
+
+    totais = dict.fromkeys(_CONTADORES, 0)
+    latencia_total = EsbocoQuantis()
+    dias = {}
+    for resumo in resumos:
+        esboco = EsbocoQuantis.de_dict(resumo.latencia)
+        latencia_total.mesclar(esboco)
+        for campo in _CONTADORES:
+            totais[campo] += getattr(resumo, campo)
+        dia = dias.setdefault(resumo.dia, {
+            'dia': resumo.dia, 'doadores_ativos': ativos_por_dia.get(resumo.dia, 0), 'tipos': [],
+        })
+        dia['tipos'].append({
+            'tipo_doacao': resumo.tipo_doacao_id,
+            'tipo_nome': resumo.tipo_doacao.nome,
+            **{campo: getattr(resumo, campo) for campo in _CONTADORES},
+            'latencia_aprovacao': _latencia(esboco),
+        })
+
+    ultimo = eventos.offset(CONSUMIDOR)
+    return {
+        'desde': desde,
+        'ate': ate,
+        'tipo_doacao': tipo_doacao_id,
+        'totais': {
+            **totais,
+            'doadores_ativos': ativos.values('usuario_id').distinct().count(),
+            'latencia_aprovacao': _latencia(latencia_total),
+        },
+        'por_dia': sorted(dias.values(), key=lambda dia: dia['dia']),
+        'atualizado_ate': EventoDoacao.objects.filter(id=ultimo).values_list('criado_em', flat=True).first(),
+    }
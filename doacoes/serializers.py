@@ -1,10 +1,18 @@
 from rest_framework import serializers
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
 from uuid import uuid4
-from .models import Doacao, TipoDoacao, Badge, UsuarioBadge
+from .models import Doacao, TipoDoacao, Badge, UsuarioBadge, EventoDoacao
 from django.contrib.auth import get_user_model
 from typing import Optional
 
+from core.campos import CamposDinamicosMixin
+from core.imagens import cloudinary_configurado, salvar_local, url_variante
+from . import catalogo
+from .services import SimilaridadeImagemService
+
 Usuario = get_user_model()
 
 class TipoDoacaoSerializer(serializers.ModelSerializer):
@@ -13,7 +21,13 @@ class TipoDoacaoSerializer(serializers.ModelSerializer):
         fields = ['id', 'nome', 'moedas_atribuidas']
         read_only_fields = ['id']
 
-class DoacaoSerializer(serializers.ModelSerializer):
+class DoacaoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    colunas_por_campo = {
+        'doador': ['doador__username'],
+        'tipo_doacao': ['tipo_doacao__nome', 'tipo_doacao__moedas_atribuidas'],
+        'evidencia_foto': ['evidencia_foto'],
+    }
+
     doador = serializers.SerializerMethodField()
     tipo_doacao = serializers.SerializerMethodField()
     validado_por = serializers.CharField(source='validado_por.username', read_only=True, allow_null=True)
@@ -46,19 +60,28 @@ class DoacaoSerializer(serializers.ModelSerializer):
         }
 
     def get_evidencia_foto(self, obj: Doacao) -> Optional[str]:
-        """Retorna a URL completa da imagem do Cloudinary"""
-        if not obj.evidencia_foto:
-            return None
-        
+        """URL da imagem na variante do contexto (listagens: ?variante=, padrão thumb)"""
+        return url_variante(obj.evidencia_foto, self.context.get('variante_imagem', 'full'))
+
+class TipoDoacaoCatalogoField(serializers.PrimaryKeyRelatedField):
+    """Resolve o tipo pelo catálogo em memória; o queryset fica para o esquema e o browsable API."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
         try:
-            # Cloudinary já aplica as transformações definidas no modelo
-            return obj.evidencia_foto.url
-        except (AttributeError, ValueError):
-            return None
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        tipo = catalogo.tipo_doacao(pk)
+        if tipo is None:
+            self.fail('does_not_exist', pk_value=data)
+        return tipo
+
 
 class CriarDoacaoSerializer(serializers.ModelSerializer):
     """Serializer específico para criação de doações"""
-    tipo_doacao = serializers.PrimaryKeyRelatedField(queryset=TipoDoacao.objects.all())
+    tipo_doacao = TipoDoacaoCatalogoField(queryset=TipoDoacao.objects.all())
     evidencia_foto = serializers.ImageField(required=True)
     descricao = serializers.CharField(required=False, allow_blank=True, max_length=240)
 
@@ -92,11 +115,19 @@ class CriarDoacaoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['doador'] = self.context['request'].user
+        assinatura = SimilaridadeImagemService.calcular(validated_data['evidencia_foto'])
         # Em ambiente de teste, evitamos upload externo do CloudinaryField
         # e salvamos um public_id fictício (string), compatível com o campo.
         if getattr(settings, 'TESTING', False):
             validated_data['evidencia_foto'] = f"evidencias/test_upload_{uuid4().hex}.jpg"
-        return super().create(validated_data)
+        elif not cloudinary_configurado():
+            # Sem Cloudinary a foto fica no MEDIA_ROOT (variantes em core/imagens.py)
+            validated_data['evidencia_foto'] = salvar_local(validated_data['evidencia_foto'], 'evidencias')
+        with transaction.atomic():
+            doacao = super().create(validated_data)
+            EventoDoacao.publicar('DOACAO_CRIADA', doacao.doador_id, doacao=doacao)
+            SimilaridadeImagemService.registrar(doacao.id, assinatura)
+        return doacao
 
 class ValidarDoacaoSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=['APROVADA', 'RECUSADA'], required=True)
@@ -109,7 +140,12 @@ class ValidarDoacaoSerializer(serializers.Serializer):
             })
         return data
 
-class BadgeSerializer(serializers.ModelSerializer):
+class BadgeSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    colunas_por_campo = {
+        'tipo_display': ['tipo'],
+        'icone_url': ['icone'],
+    }
+
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
     icone_url = serializers.SerializerMethodField()
     icone = serializers.ImageField(required=False, allow_null=True, write_only=True)
@@ -141,7 +177,7 @@ class BadgeSerializer(serializers.ModelSerializer):
         except (AttributeError, ValueError):
             return None
 
-class UsuarioBadgeSerializer(serializers.ModelSerializer):
+class UsuarioBadgeSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     badge = BadgeSerializer(read_only=True)
     usuario = serializers.CharField(source='usuario.username', read_only=True)
     
@@ -163,3 +199,60 @@ class DashboardUsuarioSerializer(serializers.ModelSerializer):
     def get_badges_conquistados(self, obj: Usuario) -> list:
         badges = UsuarioBadge.objects.filter(usuario=obj).select_related('badge')
         return UsuarioBadgeSerializer(badges, many=True, context=self.context).data
+
+
+class FiltroRelatorioSerializer(serializers.Serializer):
+    """Parâmetros do relatório: padrão são os últimos 30 dias, no máximo 366."""
+    desde = serializers.DateField(required=False)
+    ate = serializers.DateField(required=False)
+    tipo_doacao = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        ate = data.get('ate') or timezone.localdate()
+        desde = data.get('desde') or ate - timedelta(days=29)
+        if desde > ate:
+            raise serializers.ValidationError({'desde': 'A data inicial deve ser anterior à final.'})
+        if (ate - desde).days >= 366:
+            raise serializers.ValidationError({'desde': 'O período deve ter no máximo 366 dias.'})
+        return {**data, 'desde': desde, 'ate': ate}
+
+
+class LatenciaAprovacaoSerializer(serializers.Serializer):
+    amostras = serializers.IntegerField()
+    p50 = serializers.IntegerField(allow_null=True, help_text="Segundos entre submissão e aprovação (mediana).")
+    p90 = serializers.IntegerField(allow_null=True)
+    p99 = serializers.IntegerField(allow_null=True)
+
+
+class ResumoTipoSerializer(serializers.Serializer):
+    tipo_doacao = serializers.IntegerField()
+    tipo_nome = serializers.CharField()
+    submetidas = serializers.IntegerField()
+    aprovadas = serializers.IntegerField()
+    recusadas = serializers.IntegerField()
+    moedas = serializers.IntegerField()
+    latencia_aprovacao = LatenciaAprovacaoSerializer()
+
+
+class ResumoDiaSerializer(serializers.Serializer):
+    dia = serializers.DateField()
+    doadores_ativos = serializers.IntegerField(help_text="Usuários que enviaram doações no dia (qualquer tipo).")
+    tipos = ResumoTipoSerializer(many=True)
+
+
+class TotaisRelatorioSerializer(serializers.Serializer):
+    submetidas = serializers.IntegerField()
+    aprovadas = serializers.IntegerField()
+    recusadas = serializers.IntegerField()
+    moedas = serializers.IntegerField()
+    doadores_ativos = serializers.IntegerField(help_text="Usuários distintos que enviaram doações no período.")
+    latencia_aprovacao = LatenciaAprovacaoSerializer()
+
+
+class RelatorioResumoSerializer(serializers.Serializer):
+    desde = serializers.DateField()
+    ate = serializers.DateField()
+    tipo_doacao = serializers.IntegerField(allow_null=True)
+    totais = TotaisRelatorioSerializer()
+    por_dia = ResumoDiaSerializer(many=True)
+    atualizado_ate = serializers.DateTimeField(allow_null=True, help_text="Último evento já consolidado.")
@@ -1,19 +1,46 @@
-from django.db.models import Sum
-from django.db import transaction
-from .models import Badge, UsuarioBadge, Doacao
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .models import AssinaturaImagem, Badge, UsuarioBadge, Doacao, DoacaoArquivada, EventoDoacao
+from . import catalogo, similaridade
+from contas.models import Usuario
 from rest_framework import status
+from core.tarefas import batimento, enfileirar
+
+def _total_aprovadas(modelo, agregado):
+    """Subquery com o agregado das doações aprovadas do usuário externo em `modelo`."""
+    return Coalesce(Subquery(
+        modelo.objects.filter(doador=OuterRef('pk'), status='APROVADA')
+        .order_by().values('doador').annotate(total=agregado).values('total')
+    ), 0)
+
 
 class BadgeService:
+    @staticmethod
+    def totais_aprovados(usuario):
+        """(doações aprovadas, moedas dessas doações) do usuário, contando as arquivadas."""
+        total_doacoes, total_moedas = 0, 0
+        for modelo in (Doacao, DoacaoArquivada):
+            totais = modelo.objects.filter(doador=usuario, status='APROVADA').aggregate(
+                doacoes=Count('id'), moedas=Sum('moedas_creditadas')
+            )
+            total_doacoes += totais['doacoes']
+            total_moedas += totais['moedas'] or 0
+        return total_doacoes, total_moedas
+
     @staticmethod
     def verificar_e_atribuir_badges(usuario):
         badges_conquistadas = []
-        total_doacoes_aprovadas = Doacao.objects.filter(doador=usuario, status='APROVADA').count()
-        total_moedas_ganhas = Doacao.objects.filter(doador=usuario, status='APROVADA').aggregate(
-            total=Sum('tipo_doacao__moedas_atribuidas')
-        )['total'] or 0
-        badges_disponiveis = Badge.objects.filter(tipo='CONQUISTA', ativo=True).exclude(
-            usuariobadge__usuario=usuario
-        )
+        total_doacoes_aprovadas, total_moedas_ganhas = BadgeService.totais_aprovados(usuario)
+        possuidas = set(UsuarioBadge.objects.filter(usuario=usuario).values_list('badge_id', flat=True))
+        badges_disponiveis = [b for b in catalogo.badges('CONQUISTA') if b.id not in possuidas]
         for badge in badges_disponiveis:
             conquistou = False
             if badge.criterio_doacoes and total_doacoes_aprovadas >= badge.criterio_doacoes:
@@ -21,23 +48,112 @@ class BadgeService:
             if badge.criterio_moedas and total_moedas_ganhas >= badge.criterio_moedas:
                 conquistou = True
             if conquistou:
-                UsuarioBadge.objects.create(usuario=usuario, badge=badge)
+                with transaction.atomic():
+                    UsuarioBadge.objects.create(usuario=usuario, badge=badge)
+                    EventoDoacao.publicar_badges(usuario.id, [badge])
                 badges_conquistadas.append(badge)
         return badges_conquistadas
 
+    @staticmethod
+    def retroagir_badge(badge, tamanho_lote=1000):
+        """
+        Atribui uma badge de conquista a todos os usuários que já cumprem o critério.
+
+        Os qualificados saem de uma única consulta (totais por usuário somando
+        doações quentes e arquivadas) e as atribuições são inseridas em lotes,
+        cada lote em sua própria transação, com evento só para quem foi inserido.
+        Retorna o número de usuários premiados.
+        """
+        if badge.tipo != 'CONQUISTA' or not badge.ativo:
+            return 0
+        criterio = Q()
+        if badge.criterio_doacoes:
+            criterio |= Q(total_doacoes__gte=badge.criterio_doacoes)
+        if badge.criterio_moedas:
+            criterio |= Q(total_moedas__gte=badge.criterio_moedas)
+        if not criterio:
+            return 0
+
+        doadores = list(
+            Usuario.objects
+            .exclude(pk__in=UsuarioBadge.objects.filter(badge=badge).values('usuario'))
+            .annotate(
+                total_doacoes=_total_aprovadas(Doacao, Count('id')) + _total_aprovadas(DoacaoArquivada, Count('id')),
+                total_moedas=(
+                    _total_aprovadas(Doacao, Sum('moedas_creditadas'))
+                    + _total_aprovadas(DoacaoArquivada, Sum('moedas_creditadas'))
+                ),
+            )
+            .filter(criterio)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        premiados = 0
+        for inicio in range(0, len(doadores), tamanho_lote):
+            lote = doadores[inicio:inicio + tamanho_lote]
+            with transaction.atomic():
+                inseridos = BadgeService._inserir_atribuicoes(badge, lote)
+                EventoDoacao.publicar_em_lote([
+                    EventoDoacao(
+                        tipo='BADGE_CONQUISTADA', usuario_id=doador_id,
+                        payload={'badge_id': badge.id, 'badge_nome': badge.nome},
+                    )
+                    for doador_id in inseridos
+                ])
+            premiados += len(inseridos)
+            # Com muitos doadores a tarefa passa do TAREFAS_TEMPO_LIMITE
+            batimento()
+        return premiados
+
+    @staticmethod
+    def _inserir_atribuicoes(badge, usuario_ids):
+        """
+        Atribui a badge aos usuários que ainda não a têm e devolve só os ids
+        realmente inseridos: quem a ganhou por outro caminho desde a consulta
+        (premiação de doação, outra retroatribuição) não recebe o evento de novo.
+        """
+        q = connection.ops.quote_name
+        meta = UsuarioBadge._meta
+        usuario, badge_col, data = (meta.get_field(nome).column for nome in ('usuario', 'badge', 'data_conquista'))
+        agora = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {q(meta.db_table)} ({q(usuario)}, {q(badge_col)}, {q(data)}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(usuario_ids))} "
+                f"ON CONFLICT ({q(usuario)}, {q(badge_col)}) DO NOTHING RETURNING {q(usuario)}",
+                [valor for usuario_id in usuario_ids for valor in (usuario_id, badge.id, agora)],
+            )
+            return [linha[0] for linha in cursor.fetchall()]
+
+    @staticmethod
+    def retroagir_se_configurado(badge):
+        """Enfileira a retroatribuição ao salvar a badge, se BADGES_RETROAGIR_AO_SALVAR estiver ativo."""
+        if getattr(settings, 'BADGES_RETROAGIR_AO_SALVAR', False):
+            transaction.on_commit(lambda: enfileirar('doacoes.retroagir_badge', {'badge_id': badge.id}))
+
     @staticmethod
     def comprar_badge(usuario, badge_id):
-        try:
-            badge = Badge.objects.get(id=badge_id, tipo='COMPRA', ativo=True)
-        except Badge.DoesNotExist:
+        badge = catalogo.badge(badge_id)
+        if badge is None or badge.tipo != 'COMPRA':
             return {'sucesso': False, 'codigo': 'BADGE_INEXISTENTE', 'mensagem': 'Badge não disponível para compra', 'status': status.HTTP_400_BAD_REQUEST}
-        if UsuarioBadge.objects.filter(usuario=usuario, badge=badge).exists():
-            return {'sucesso': False, 'codigo': 'JA_POSSUI_BADGE', 'mensagem': 'Você já possui esta badge', 'status': status.HTTP_400_BAD_REQUEST}
-        if usuario.saldo_moedas < badge.custo_moedas:
-            return {'sucesso': False, 'codigo': 'SALDO_INSUFICIENTE', 'mensagem': f'Saldo insuficiente. Necessário: {badge.custo_moedas} moedas', 'status': 402}
-        usuario.saldo_moedas -= badge.custo_moedas
-        usuario.save(update_fields=['saldo_moedas'])
-        UsuarioBadge.objects.create(usuario=usuario, badge=badge)
+        ja_possui = {'sucesso': False, 'codigo': 'JA_POSSUI_BADGE', 'mensagem': 'Você já possui esta badge', 'status': status.HTTP_400_BAD_REQUEST}
+        saldo_insuficiente = {'sucesso': False, 'codigo': 'SALDO_INSUFICIENTE', 'mensagem': f'Saldo insuficiente. Necessário: {badge.custo_moedas} moedas', 'status': 402}
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    UsuarioBadge.objects.create(usuario=usuario, badge=badge)
+            except IntegrityError:
+                return ja_possui
+            # Débito condicional no banco, não sobre o `usuario` da requisição: o
+            # worker pode ter creditado moedas de uma aprovação desde a autenticação
+            debitado = Usuario.objects.filter(pk=usuario.pk, saldo_moedas__gte=badge.custo_moedas).update(
+                saldo_moedas=F('saldo_moedas') - badge.custo_moedas
+            )
+            if not debitado:
+                transaction.set_rollback(True)
+                return saldo_insuficiente
+            EventoDoacao.publicar_badges(usuario.id, [badge])
+        usuario.refresh_from_db(fields=['saldo_moedas'])
         return {'sucesso': True, 'codigo': 'COMPRA_OK', 'mensagem': f'Badge "{badge.nome}" adquirida com sucesso!', 'saldo_restante': usuario.saldo_moedas, 'status': status.HTTP_200_OK}
 
     @staticmethod
@@ -50,14 +166,14 @@ class BadgeService:
 
     @staticmethod
     def premiar_doacao_aprovada(doacao: Doacao):
-        usuario = doacao.doador
-        tipo = doacao.tipo_doacao
         with transaction.atomic():
-            if tipo and tipo.moedas_atribuidas:
-                usuario.saldo_moedas = (usuario.saldo_moedas or 0) + tipo.moedas_atribuidas
+            # Bloqueia o usuário: vários workers podem premiar doações dele ao mesmo tempo
+            usuario = Usuario.objects.select_for_update().get(pk=doacao.doador_id)
+            if doacao.moedas_creditadas:
+                usuario.saldo_moedas = (usuario.saldo_moedas or 0) + doacao.moedas_creditadas
                 usuario.save(update_fields=['saldo_moedas'])
-            total_aprovadas = Doacao.objects.filter(doador=usuario, status='APROVADA').count()
-            conquistas = Badge.objects.filter(ativo=True, tipo='CONQUISTA')
+            total_aprovadas, _ = BadgeService.totais_aprovados(usuario)
+            conquistas = catalogo.badges('CONQUISTA')
             novas = []
             for b in conquistas:
                 ok_doacoes = b.criterio_doacoes and total_aprovadas >= b.criterio_doacoes
@@ -65,4 +181,205 @@ class BadgeService:
                 if (ok_doacoes or ok_moedas) and not UsuarioBadge.objects.filter(usuario=usuario, badge=b).exists():
                     UsuarioBadge.objects.create(usuario=usuario, badge=b)
                     novas.append(b)
-        return usuario, novas
\ No newline at end of file
+            EventoDoacao.publicar_badges(usuario.id, novas, doacao=doacao)
+        return usuario, novas
+
+class ArquivamentoService:
+    """
+    Move doações validadas antigas de Doacao para DoacaoArquivada.
+
+    Cada lote é um INSERT ... SELECT seguido de DELETE na mesma transação: se o
+    processo cair, os lotes já confirmados ficam arquivados e a próxima execução
+    continua do ponto em que parou. O DELETE é direto no SQL (sem sinais), pois
+    não se trata de exclusão: o outbox não recebe DOACAO_EXCLUIDA.
+    """
+
+    STATUS_ARQUIVAVEIS = ('APROVADA', 'RECUSADA')
+
+    @staticmethod
+    def elegiveis(dias):
+        corte = timezone.now() - timedelta(days=dias)
+        return Doacao.objects.filter(status__in=ArquivamentoService.STATUS_ARQUIVAVEIS, data_submissao__lt=corte)
+
+    @staticmethod
+    def _mover(ids):
+        q = connection.ops.quote_name
+        colunas = ', '.join(q(campo.column) for campo in Doacao._meta.concrete_fields)
+        marcadores = ', '.join(['%s'] * len(ids))
+        agora = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {q(DoacaoArquivada._meta.db_table)} ({colunas}, {q('arquivada_em')}) "
+                f"SELECT {colunas}, %s FROM {q(Doacao._meta.db_table)} WHERE {q('id')} IN ({marcadores})",
+                [agora, *ids],
+            )
+            cursor.execute(f"DELETE FROM {q(Doacao._meta.db_table)} WHERE {q('id')} IN ({marcadores})", ids)
+
+    @staticmethod
+    def arquivar(dias, lote=1000, limite=None, progresso=None):
+        """
+        Arquiva as doações elegíveis em lotes de `lote` (no máximo `limite` no total).
+        Retorna {'arquivadas': n, 'segundos': s}.
+        """
+        arquivadas = 0
+        inicio = time.monotonic()
+        while limite is None or arquivadas < limite:
+            tamanho = lote if limite is None else min(lote, limite - arquivadas)
+            with transaction.atomic():
+                ids = list(
+                    ArquivamentoService.elegiveis(dias)
+                    .select_for_update(skip_locked=True)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:tamanho]
+                )
+                if not ids:
+                    break
+                ArquivamentoService._mover(ids)
+            arquivadas += len(ids)
+            if progresso:
+                progresso(arquivadas, time.monotonic() - inicio)
+        return {'arquivadas': arquivadas, 'segundos': time.monotonic() - inicio}
+
+
+class SimilaridadeImagemService:
+    """Assinaturas das fotos de evidência e busca de fotos parecidas já enviadas."""
+
+    @staticmethod
+    def calcular(arquivo):
+        """dHash do arquivo enviado, ou None se não for uma imagem legível."""
+        try:
+            arquivo.seek(0)
+            return similaridade.dhash(arquivo)
+        except similaridade.ERROS_IMAGEM:
+            return None
+        finally:
+            # O upload para o Cloudinary lê o arquivo do início
+            arquivo.seek(0)
+
+    @staticmethod
+    def registrar(doacao_id, valor):
+        if valor is not None:
+            AssinaturaImagem.objects.bulk_create([AssinaturaImagem.de_valor(doacao_id, valor)], ignore_conflicts=True)
+
+    @staticmethod
+    def url_reduzida(foto):
+        """URL da evidência já reduzida pelo Cloudinary: o dHash só precisa de 9x8 pixels."""
+        return foto.build_url(width=256, height=256, crop='limit', secure=True)
+
+    @staticmethod
+    def calcular_faltantes(lote=200, workers=None, limite=None, progresso=None):
+        """
+        Calcula as assinaturas das doações (quentes e arquivadas) que ainda não têm,
+        percorrendo as tabelas por id em lotes de `lote` (no máximo `limite` fotos).
+        Download e dHash rodam num pool de `workers` processos (None: um por CPU;
+        0: no próprio processo). Retorna {'calculadas': n, 'falhas': m}.
+        """
+        calculadas, falhas = 0, 0
+        executor = None
+        if workers != 0:
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(max_workers=workers)
+        mapear = executor.map if executor else map
+        try:
+            for modelo in (Doacao, DoacaoArquivada):
+                ultimo = 0
+                while limite is None or calculadas + falhas < limite:
+                    linhas = list(
+                        modelo.objects.filter(id__gt=ultimo).order_by('id')
+                        .values_list('id', 'evidencia_foto')[:lote]
+                    )
+                    if not linhas:
+                        break
+                    ultimo = linhas[-1][0]
+                    feitas = set(AssinaturaImagem.objects.filter(
+                        doacao_id__in=[doacao_id for doacao_id, _ in linhas]
+                    ).values_list('doacao_id', flat=True))
+                    faltantes = [
+                        (doacao_id, foto) for doacao_id, foto in linhas
+                        if doacao_id not in feitas and getattr(foto, 'public_id', None)
+                    ]
+                    if limite is not None:
+                        faltantes = faltantes[:limite - calculadas - falhas]
+                    if not faltantes:
+                        continue
+                    urls = [SimilaridadeImagemService.url_reduzida(foto) for _, foto in faltantes]
+                    novas = []
+                    for (doacao_id, _), valor in zip(faltantes, mapear(similaridade.dhash_de_url, urls)):
+                        if valor is None:
+                            falhas += 1
+                        else:
+                            novas.append(AssinaturaImagem.de_valor(doacao_id, valor))
+                    AssinaturaImagem.objects.bulk_create(novas, ignore_conflicts=True)
+                    calculadas += len(novas)
+                    if progresso:
+                        progresso(calculadas, falhas)
+        finally:
+            if executor:
+                executor.shutdown()
+        return {'calculadas': calculadas, 'falhas': falhas}
+
+    @staticmethod
+    def similares(assinaturas, distancia_maxima=None, limite=5):
+        """
+        {doacao_id: valor} -> {doacao_id: [(outra_doacao_id, distância), ...]}, as
+        `limite` mais próximas de cada uma. Uma única consulta pelas partes indexadas
+        traz os candidatos de todas; a distância exata é conferida aqui.
+        """
+        if distancia_maxima is None:
+            distancia_maxima = getattr(settings, 'SIMILARIDADE_DISTANCIA_MAXIMA', 6)
+        if not assinaturas:
+            return {}
+        raio = similaridade.raio_parte(distancia_maxima)
+        filtro = Q()
+        for i in range(similaridade.PARTES):
+            valores = set()
+            for valor in assinaturas.values():
+                valores.update(similaridade.variantes(similaridade.partes(valor)[i], raio))
+            filtro |= Q(**{f'parte{i}__in': sorted(valores)})
+        candidatos = [
+            (doacao_id, similaridade.do_banco(valor))
+            for doacao_id, valor in AssinaturaImagem.objects.filter(filtro).values_list('doacao_id', 'dhash')
+        ]
+
+        encontrados = {}
+        for doacao_id, valor in assinaturas.items():
+            proximos = []
+            for outro_id, outro_valor in candidatos:
+                if outro_id == doacao_id:
+                    continue
+                d = similaridade.distancia(valor, outro_valor)
+                if d <= distancia_maxima:
+                    proximos.append((outro_id, d))
+            proximos.sort(key=lambda item: (item[1], -item[0]))
+            encontrados[doacao_id] = proximos[:limite]
+        return encontrados
+
+    @staticmethod
+    def anotar(linhas):
+        """
+        Acrescenta `similares` a cada linha serializada (dict com `id`) de doação:
+        [{'id', 'distancia', 'status', 'doador', 'arquivada'}], da mais parecida para a menos.
+        """
+        assinaturas = {
+            doacao_id: similaridade.do_banco(valor)
+            for doacao_id, valor in AssinaturaImagem.objects.filter(
+                doacao_id__in=[linha['id'] for linha in linhas]
+            ).values_list('doacao_id', 'dhash')
+        }
+        encontrados = SimilaridadeImagemService.similares(assinaturas)
+        ids = {outro_id for proximos in encontrados.values() for outro_id, _ in proximos}
+        resumo = {}
+        for modelo, arquivada in ((Doacao, False), (DoacaoArquivada, True)):
+            if ids:
+                for item in modelo.objects.filter(id__in=ids).values('id', 'status', 'doador__username'):
+                    resumo[item['id']] = {
+                        'status': item['status'], 'doador': item['doador__username'], 'arquivada': arquivada,
+                    }
+        for linha in linhas:
+            linha['similares'] = [
+                # Assinaturas de doações já excluídas (sem linha em nenhuma tabela) ficam de fora
+                {'id': outro_id, 'distancia': d, **resumo[outro_id]}
+                for outro_id, d in encontrados.get(linha['id'], [])
+                if outro_id in resumo
+            ]
+        return linhas
@@ -0,0 +1,39 @@
+import logging
+
+from django.db import DatabaseError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalogo, resumos
+from .models import AssinaturaImagem, Badge, Doacao, EventoDoacao, TipoDoacao, eventos_publicados
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_delete, sender=Doacao)
+def registrar_exclusao(sender, instance, **kwargs):
+    """
+    Deixa a lápide da doação no outbox para o modo ?since= das listagens e
+    tira a foto da comparação de similaridade.
+    """
+    EventoDoacao.publicar('DOACAO_EXCLUIDA', instance.doador_id, doacao=instance)
+    AssinaturaImagem.objects.filter(doacao_id=instance.pk).delete()
+
+
+@receiver(eventos_publicados)
+def agendar_resumos(sender, **kwargs):
+    """Eventos novos no outbox: os resumos dos relatórios são consolidados no fim da janela."""
+    try:
+        resumos.agendar_consolidacao()
+    except DatabaseError:
+        # Já depois do COMMIT: a próxima publicação (ou reconstruir_resumos) recupera
+        logger.exception("Falha ao agendar a consolidação dos resumos")
+
+
+@receiver(post_save, sender=TipoDoacao)
+@receiver(post_delete, sender=TipoDoacao)
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def invalidar_catalogo(sender, **kwargs):
+    """TipoDoacao ou Badge alterado: todos os processos recarregam o catálogo."""
+    catalogo.invalidar()
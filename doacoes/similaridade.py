@@ -0,0 +1,93 @@
+"""
+Assinatura perceptual (dHash) das fotos de evidência, para achar reenvios.
+
+O dHash reduz a imagem a 9x8 tons de cinza e grava, para cada linha, se cada
+pixel é mais claro que o vizinho da direita: 64 bits que quase não mudam com
+redimensionamento, recompressão JPEG ou pequenos ajustes de cor. A semelhança
+entre duas fotos é a distância de Hamming entre as assinaturas.
+
+Busca por multi-index hashing: os 64 bits são divididos em 4 partes de 16,
+cada uma indexada no banco. Se duas assinaturas diferem em até 4*r+3 bits,
+ao menos uma das partes difere em até r bits (casa dos pombos); basta então
+procurar, em cada parte, os valores a até r bits da parte consultada
+(17 valores por parte para r=1) e conferir a distância exata só nesses
+candidatos, em vez de comparar com todas as fotos já enviadas.
+
+Este módulo não depende do Django: as funções rodam nos processos do comando
+`calcular_assinaturas`.
+"""
+from io import BytesIO
+from itertools import combinations
+from urllib.request import urlopen
+
+from PIL import Image, ImageOps
+
+BITS = 64
+PARTES = 4
+BITS_PARTE = BITS // PARTES
+_MASCARA = (1 << BITS) - 1
+_MASCARA_PARTE = (1 << BITS_PARTE) - 1
+
+# Arquivo truncado, formato desconhecido, imagem gigante...
+ERROS_IMAGEM = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+def dhash(arquivo):
+    """Assinatura de 64 bits (inteiro sem sinal) de um arquivo de imagem ou caminho."""
+    with Image.open(arquivo) as imagem:
+        # JPEG: decodifica já reduzida (DCT em 1/2, 1/4 ou 1/8), bem mais barato que a foto inteira
+        imagem.draft('L', (64, 64))
+        imagem = ImageOps.exif_transpose(imagem).convert('L')
+        pixels = imagem.resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    valor = 0
+    for linha in range(8):
+        for coluna in range(8):
+            indice = linha * 9 + coluna
+            valor = (valor << 1) | (pixels[indice] > pixels[indice + 1])
+    return valor
+
+
+def distancia(a, b):
+    """Bits diferentes entre duas assinaturas."""
+    return ((a ^ b) & _MASCARA).bit_count()
+
+
+def para_banco(valor):
+    """Sem sinal (0..2^64-1) -> com sinal, para caber num BigIntegerField."""
+    return valor - (1 << BITS) if valor >= 1 << (BITS - 1) else valor
+
+
+def do_banco(valor):
+    return valor & _MASCARA
+
+
+def partes(valor):
+    """As 4 partes de 16 bits, da mais significativa para a menos."""
+    valor = do_banco(valor)
+    return [(valor >> (BITS_PARTE * (PARTES - 1 - i))) & _MASCARA_PARTE for i in range(PARTES)]
+
+
+def raio_parte(distancia_maxima):
+    """Raio por parte que garante achar tudo a até `distancia_maxima` bits."""
+    return max(0, distancia_maxima // PARTES)
+
+
+def variantes(parte, raio):
+    """Valores de 16 bits a até `raio` bits de `parte` (incluindo ela)."""
+    encontradas = [parte]
+    for bits in range(1, raio + 1):
+        for posicoes in combinations(range(BITS_PARTE), bits):
+            mascara = 0
+            for posicao in posicoes:
+                mascara |= 1 << posicao
+            encontradas.append(parte ^ mascara)
+    return encontradas
+
+
+def dhash_de_url(url, timeout=30):
+    """Baixa a imagem e devolve a assinatura, ou None se falhar."""
+    try:
+        with urlopen(url, timeout=timeout) as resposta:
+            return dhash(BytesIO(resposta.read()))
+    except ERROS_IMAGEM:
+        return None
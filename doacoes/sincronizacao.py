@@ -0,0 +1,150 @@
+"""
+Modo de sincronização incremental (?since=<token>) das listagens de doações.
+
+O cliente guarda o token devolvido e, na próxima atualização, recebe apenas
+as doações gravadas depois dele (`alterados`) e os ids que saíram da listagem
+(`removidos`: excluídas, ou que deixaram de atender ao filtro, como uma
+pendente que foi aprovada). `?since=` vazio faz a carga inicial.
+
+O token é a posição (atualizado_em, id) da última linha entregue. Para não
+perder gravações cujo COMMIT chega depois de outras mais novas, ele nunca
+avança além de agora - SINCRONIZACAO_MARGEM_SEGUNDOS; o custo é reenviar as
+poucas linhas dessa janela, que o cliente aplica de forma idempotente.
+
+Enquanto `tem_mais` for verdadeiro o token também carrega a base da rodada:
+- na carga inicial, o momento em que ela começou. As páginas só percorrem as
+  linhas da listagem (o cliente ainda não tem nada a remover) e a última
+  devolve um token nessa base, para a próxima sincronização pegar o que mudou
+  durante a carga;
+- numa atualização, a posição de onde ela partiu. As lápides de exclusão
+  (base, corte] saem só na última página, uma vez por rodada.
+"""
+import base64
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import EventoDoacao
+
+INICIO = (datetime(1970, 1, 1, tzinfo=dt_timezone.utc), 0)
+
+
+@dataclass(frozen=True)
+class Token:
+    posicao: tuple
+    base: datetime = None  # início da rodada em andamento (None: rodada nova a partir de `posicao`)
+    carga_inicial: bool = False
+
+
+def _momento(texto):
+    momento = datetime.fromisoformat(texto)
+    if timezone.is_naive(momento):
+        raise ValueError
+    return momento
+
+
+def _iso(momento):
+    return momento.astimezone(dt_timezone.utc).isoformat()
+
+
+def codificar_token(token):
+    momento, ultimo_id = token.posicao
+    bruto = f"{_iso(momento)}|{ultimo_id}"
+    if token.base is not None:
+        bruto += f"|{_iso(token.base)}|{'c' if token.carga_inicial else 'a'}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_token(texto):
+    """Token do ?since=; None para a carga inicial (?since= vazio)."""
+    if not texto:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4)).decode()
+        partes = bruto.split('|')
+        if len(partes) == 2:
+            momento, ultimo_id = partes
+            return Token((_momento(momento), int(ultimo_id)))
+        momento, ultimo_id, base, modo = partes
+        if modo not in ('c', 'a'):
+            raise ValueError
+        return Token((_momento(momento), int(ultimo_id)), _momento(base), modo == 'c')
+    except (ValueError, UnicodeDecodeError):
+        raise serializers.ValidationError({'since': 'Token de sincronização inválido.'})
+
+
+class SincronizacaoMixin:
+    """
+    Adiciona o modo ?since= a uma ListAPIView de doações.
+
+    A view define:
+    - get_queryset_sincronizacao(): todas as doações visíveis, sem o filtro da listagem;
+    - filtro_sincronizacao(): Q das linhas que pertencem à listagem;
+    - lapides_sincronizacao(): EventoDoacao de exclusão visíveis para o usuário.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.listar_alteracoes(request)
+
+    def listar_alteracoes(self, request):
+        limite = self.paginator.max_page_size if self.paginator else 50
+        corte = (timezone.now() - timedelta(seconds=getattr(settings, 'SINCRONIZACAO_MARGEM_SEGUNDOS', 5)), 0)
+        token = decodificar_token(request.query_params.get('since'))
+        if token is None:
+            token = Token(INICIO, corte[0], carga_inicial=True)
+        desde = token.posicao
+        momento, ultimo_id = desde
+        base = token.base if token.base is not None else momento
+
+        queryset = self.get_queryset_sincronizacao()
+        if token.carga_inicial:
+            # Só as linhas da listagem: na carga inicial não há o que remover
+            queryset = queryset.filter(self.filtro_sincronizacao())
+        if hasattr(self, 'podar_queryset'):
+            queryset = self.podar_queryset(queryset, extras=['atualizado_em'])
+
+        linhas = list(
+            queryset
+            .filter(Q(atualizado_em__gt=momento) | Q(atualizado_em=momento, id__gt=ultimo_id))
+            .annotate(na_listagem=Case(
+                When(self.filtro_sincronizacao(), then=Value(True)), default=Value(False), output_field=BooleanField()
+            ))
+            .order_by('atualizado_em', 'id')[:limite + 1]
+        )
+        tem_mais = len(linhas) > limite
+        linhas = linhas[:limite]
+
+        removidos = []
+        if tem_mais:
+            novo = Token((linhas[-1].atualizado_em, linhas[-1].id), base, token.carga_inicial)
+        elif token.carga_inicial:
+            # A próxima sincronização reenvia o que mudou desde o início da carga
+            novo = Token((base, 0))
+        else:
+            fim = (linhas[-1].atualizado_em, linhas[-1].id) if linhas else corte
+            novo = Token(max(desde, min(fim, corte)))
+            removidos = list(
+                self.lapides_sincronizacao()
+                .filter(criado_em__gt=base, criado_em__lte=corte[0])
+                .values_list('doacao_id', flat=True)
+            )
+
+        alterados = [linha for linha in linhas if linha.na_listagem]
+        removidos += [linha.id for linha in linhas if not linha.na_listagem]
+
+        return Response({
+            'token': codificar_token(novo),
+            'tem_mais': tem_mais,
+            'alterados': self.get_serializer(alterados, many=True).data,
+            'removidos': sorted(set(removidos)),
+        })
+
+    def lapides_sincronizacao(self):
+        return EventoDoacao.objects.filter(tipo='DOACAO_EXCLUIDA')
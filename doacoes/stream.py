@@ -0,0 +1,325 @@
+"""
+Server-Sent Events com as mudanças de status e badges do usuário autenticado.
+
+O fluxo lê o outbox (EventoDoacao) a partir do último id entregue e fica
+parado até ser acordado:
+
+- em PostgreSQL, por LISTEN/NOTIFY (o NOTIFY sai junto com o COMMIT que
+  gravou o evento, então funciona entre processos e máquinas);
+- em modo de nó único (SQLite), pelo difusor em memória, acionado no
+  on_commit de quem publicou.
+
+A notificação leva os ids dos usuários com eventos novos e acorda só as
+conexões deles: cada conexão acordada consulta o outbox, e acordar todas a
+cada evento custaria uma consulta por conexão aberta.
+
+Sem notificação, o fluxo ainda consulta o outbox a cada heartbeat, então
+nenhum evento se perde; a notificação só reduz a latência.
+
+Autenticação: EventSource não envia headers, e um JWT em ?token= iria parar
+nos logs de proxy e de acesso. O cliente troca o JWT por um ticket em
+POST /api/doacoes/eventos/stream/ticket/ e abre o fluxo com ?ticket=: o ticket
+é assinado, vale SSE_TICKET_SEGUNDOS e só abre uma conexão. O fluxo termina
+(evento `expirado`) quando vence o access token que o originou.
+
+Requer o servidor ASGI (core/asgi.py): sob WSGI o Django bufferiza a resposta
+assíncrona inteira e cada conexão prenderia um worker para sempre, então o
+endpoint responde 501.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, connections, transaction
+from django.dispatch import receiver
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+
+from .models import EventoDoacao, TicketStreamUsado, eventos_publicados, CANAL_EVENTOS
+
+logger = logging.getLogger(__name__)
+
+
+class Difusor:
+    """Acorda, neste processo, as conexões SSE abertas dos usuários com eventos novos."""
+
+    def __init__(self):
+        self._assinantes = defaultdict(set)  # usuario_id -> {(usuario_id, loop, evento)}
+        self._lock = threading.Lock()
+
+    def assinar(self, usuario_id):
+        assinatura = (usuario_id, asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._assinantes[usuario_id].add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            assinaturas = self._assinantes.get(assinatura[0])
+            if assinaturas is not None:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinantes[assinatura[0]]
+
+    def notificar(self, usuario_ids=None):
+        """
+        Acorda as conexões dos `usuario_ids`; None acorda todas (notificação
+        sem destinatário). Pode ser chamado de qualquer thread.
+        """
+        with self._lock:
+            if usuario_ids is None:
+                assinantes = [a for assinaturas in self._assinantes.values() for a in assinaturas]
+            else:
+                assinantes = [a for usuario_id in usuario_ids for a in self._assinantes.get(usuario_id, ())]
+        for _, loop, evento in assinantes:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:
+                # Loop já encerrado; a conexão será descartada no finally do fluxo
+                pass
+
+
+difusor = Difusor()
+
+
+@receiver(eventos_publicados)
+def _ao_publicar(sender, usuario_ids=None, **kwargs):
+    difusor.notificar(usuario_ids)
+
+
+def destinatarios(payload):
+    """Ids do payload do NOTIFY, ou None (acordar todos) se vier vazio ou fora do formato."""
+    try:
+        return {int(parte) for parte in payload.split(',')} if payload else None
+    except ValueError:
+        return None
+
+
+class OuvintePostgres(threading.Thread):
+    """Thread que faz LISTEN no canal do outbox e repassa as notificações ao difusor."""
+
+    daemon = True
+    _instancia = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def garantir(cls):
+        if connections['default'].vendor != 'postgresql':
+            return
+        with cls._lock:
+            if cls._instancia is None or not cls._instancia.is_alive():
+                cls._instancia = cls(name='sse-listen')
+                cls._instancia.start()
+
+    def _conectar(self):
+        wrapper = connections['default']
+        conexao = wrapper.get_new_connection(wrapper.get_connection_params())
+        conexao.autocommit = True
+        with conexao.cursor() as cursor:
+            cursor.execute(f'LISTEN "{CANAL_EVENTOS}"')
+        return conexao
+
+    def run(self):
+        while True:
+            try:
+                conexao = self._conectar()
+                try:
+                    self._escutar(conexao)
+                finally:
+                    conexao.close()
+            except Exception:
+                logger.exception("Falha no LISTEN do outbox; reconectando")
+                time.sleep(5)
+
+    def _escutar(self, conexao):
+        if callable(getattr(conexao, 'notifies', None)):  # psycopg 3
+            while True:
+                for notificacao in conexao.notifies(timeout=30):
+                    difusor.notificar(destinatarios(notificacao.payload))
+        while True:  # psycopg2
+            if select.select([conexao], [], [], 30) == ([], [], []):
+                continue
+            conexao.poll()
+            while conexao.notifies:
+                difusor.notificar(destinatarios(conexao.notifies.pop(0).payload))
+
+
+SALT_TICKET = 'doacoes.stream.ticket'
+
+
+def _ticket_segundos():
+    return getattr(settings, 'SSE_TICKET_SEGUNDOS', 30)
+
+
+def emitir_ticket(usuario_id, expira_em):
+    """Ticket assinado para abrir um fluxo; `expira_em` é o exp (epoch) do access token."""
+    return signing.dumps({'u': usuario_id, 'exp': expira_em, 'n': uuid4().hex}, salt=SALT_TICKET)
+
+
+def _resgatar_ticket(ticket):
+    """(usuario_id, expira_em) do ticket válido e ainda não usado, ou None."""
+    try:
+        dados = signing.loads(ticket, salt=SALT_TICKET, max_age=_ticket_segundos())
+    except signing.BadSignature:
+        return None
+    # Uso único: só o primeiro a registrar o nonce abre o fluxo. Nonces mais
+    # velhos que a validade do ticket já são recusados pela assinatura
+    agora = timezone.now()
+    TicketStreamUsado.objects.filter(usado_em__lt=agora - timedelta(seconds=_ticket_segundos() + 5)).delete()
+    try:
+        with transaction.atomic():
+            TicketStreamUsado.objects.create(nonce=dados['n'], usado_em=agora)
+    except IntegrityError:
+        return None
+    return dados['u'], dados['exp']
+
+
+def _autenticar(request):
+    """
+    (usuario, expira_em) pelo JWT do header Authorization ou pelo ?ticket=;
+    None se faltar credencial ou ela for inválida.
+    """
+    autenticacao = JWTAuthentication()
+    header = autenticacao.get_header(request)
+    bruto = autenticacao.get_raw_token(header) if header is not None else None
+    try:
+        if bruto:
+            token = autenticacao.get_validated_token(bruto)
+            usuario, expira_em = autenticacao.get_user(token), token['exp']
+        elif request.GET.get('ticket'):
+            resgatado = _resgatar_ticket(request.GET['ticket'])
+            if resgatado is None:
+                return None
+            usuario_id, expira_em = resgatado
+            usuario = autenticacao.user_model.objects.filter(pk=usuario_id).first()
+        else:
+            return None
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    if usuario is None or not usuario.is_active or expira_em <= time.time():
+        return None
+    return usuario, expira_em
+
+
+def _ultimo_evento_do_usuario(usuario_id):
+    return EventoDoacao.objects.filter(usuario_id=usuario_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _eventos_apos(usuario_id, ultimo_id, limite=100):
+    return list(EventoDoacao.objects.filter(usuario_id=usuario_id, id__gt=ultimo_id).order_by('id')[:limite])
+
+
+def _formatar(evento):
+    dados = {
+        'id': evento.id,
+        'tipo': evento.tipo,
+        'doacao_id': evento.doacao_id,
+        'payload': evento.payload,
+        'criado_em': evento.criado_em.isoformat(),
+    }
+    return f"id: {evento.id}\nevent: {evento.tipo.lower()}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+async def _fluxo(usuario_id, ultimo_id, expira_em):
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_SEGUNDOS', 15)
+    assinatura = difusor.assinar(usuario_id)
+    _, _, acordar = assinatura
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            restante = expira_em - time.time()
+            if restante <= 0:
+                # O cliente pede um ticket novo (com um access token válido) e reconecta
+                yield f"event: expirado\ndata: {json.dumps({'ultimo_id': ultimo_id})}\n\n"
+                return
+            acordar.clear()
+            eventos = await sync_to_async(_eventos_apos)(usuario_id, ultimo_id)
+            for evento in eventos:
+                ultimo_id = evento.id
+                yield _formatar(evento)
+            if eventos:
+                continue
+            try:
+                await asyncio.wait_for(acordar.wait(), timeout=min(heartbeat, restante))
+            except asyncio.TimeoutError:
+                if time.time() < expira_em:
+                    yield ": ping\n\n"
+    finally:
+        difusor.cancelar(assinatura)
+
+
+@require_GET
+async def stream_eventos(request):
+    """
+    GET /api/doacoes/eventos/stream/
+
+    Retoma do header Last-Event-ID (ou ?ultimo_id=); sem ele, entrega apenas
+    os eventos que acontecerem a partir da conexão.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"erro": "O fluxo de eventos só está disponível no servidor ASGI.",
+             "codigo": "NotImplemented", "detalhes": {}},
+            status=501,
+        )
+    autenticado = await sync_to_async(_autenticar)(request)
+    if autenticado is None:
+        return JsonResponse(
+            {"erro": "Credenciais de autenticação não foram fornecidas ou são inválidas.",
+             "codigo": "NotAuthenticated", "detalhes": {}},
+            status=401,
+        )
+    usuario, expira_em = autenticado
+
+    ultimo = request.headers.get('Last-Event-ID') or request.GET.get('ultimo_id')
+    try:
+        ultimo_id = int(ultimo) if ultimo is not None else None
+    except ValueError:
+        ultimo_id = None
+    if ultimo_id is None:
+        ultimo_id = await sync_to_async(_ultimo_evento_do_usuario)(usuario.id)
+
+    OuvintePostgres.garantir()
+    response = StreamingHttpResponse(_fluxo(usuario.id, ultimo_id, expira_em), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não bufferizar o fluxo
+    return response
+
+
+@extend_schema(
+    tags=['Doações'],
+    summary='Ticket do fluxo de eventos',
+    description=(
+        "Troca o JWT por um ticket de uso único para abrir "
+        "/api/doacoes/eventos/stream/?ticket=... (EventSource não envia headers)."
+    ),
+    request=None,
+    responses={201: inline_serializer('TicketStream', {
+        'ticket': serializers.CharField(),
+        'expira_em_segundos': serializers.IntegerField(),
+    })},
+)
+class TicketStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        ticket = emitir_ticket(request.user.id, request.auth['exp'])
+        return Response({'ticket': ticket, 'expira_em_segundos': _ticket_segundos()}, status=201)
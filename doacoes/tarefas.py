@@ -0,0 +1,42 @@
+import cloudinary
+import cloudinary.api
+
+from core.tarefas import batimento, tarefa
+
+from . import resumos
+from .models import Badge, Doacao
+from .services import BadgeService
+
+
+@tarefa('doacoes.premiar_doacao')
+def premiar_doacao(doacao_id):
+    """Credita as moedas e as badges de conquista de uma doação aprovada."""
+    doacao = Doacao.objects.filter(pk=doacao_id, status='APROVADA').first()
+    if doacao is None:
+        # Removida ou recusada depois da aprovação: nada a premiar
+        return
+    BadgeService.premiar_doacao_aprovada(doacao)
+
+
+@tarefa('doacoes.retroagir_badge', atomica=False)
+def retroagir_badge(badge_id):
+    badge = Badge.objects.filter(pk=badge_id).first()
+    if badge is not None:
+        BadgeService.retroagir_badge(badge)
+
+
+@tarefa('doacoes.remover_imagens', atomica=False)
+def remover_imagens(public_ids):
+    """Remove do Cloudinary as evidências de doações excluídas (até 100 por chamada da API)."""
+    if not cloudinary.config().cloud_name:
+        # Sem Cloudinary configurado (dev/testes) não há arquivos remotos
+        return
+    for inicio in range(0, len(public_ids), 100):
+        cloudinary.api.delete_resources(public_ids[inicio:inicio + 100])
+        batimento()
+
+
+@tarefa('doacoes.consolidar_resumos', atomica=False)
+def consolidar_resumos():
+    """Aplica aos resumos diários os eventos do outbox ainda não consumidos."""
+    resumos.consolidar()
@@ -1,13 +1,42 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+import cloudinary
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.test import APITestCase
 from rest_framework.reverse import reverse
 from rest_framework import status
 from django.core.files.uploadedfile import SimpleUploadedFile
 from PIL import Image
-from io import BytesIO
+from io import BytesIO, StringIO
 
-from .models import Doacao, TipoDoacao, Badge, UsuarioBadge
+from . import catalogo, eventos, resumos, similaridade, stream
+from .admin import DoacaoAdmin
+from .views import CustomPagination
+from .services import BadgeService, SimilaridadeImagemService
+from .models import (
+    AssinaturaImagem, Doacao, DoacaoArquivada, DoadorAtivoDia, ResumoDiario, TipoDoacao, Badge, UsuarioBadge,
+    EventoDoacao, OffsetConsumidor, TicketStreamUsado, eventos_publicados, payloads_notify,
+)
 from contas.models import Usuario
-from contas.factories import UsuarioFactory, AdminFactory
+from core.models import ChaveIdempotencia, Tarefa
+from contas.factories import UsuarioFactory, AdminFactory, SuperuserFactory
 from .factories import (
     TipoDoacaoFactory,
     DoacaoPendenteFactory,
@@ -230,6 +259,287 @@ class AdminDoacoesPendentesTestCase(APITestCase):
             self.assertEqual(doacao['status'], 'PENDENTE')
 
 
+# ============================================================================
+# TESTES DE SINCRONIZAÇÃO INCREMENTAL (?since=)
+# ============================================================================
+
+@override_settings(SINCRONIZACAO_MARGEM_SEGUNDOS=0)
+class SincronizacaoDoacoesTestCase(APITestCase):
+    """
+    Testes do modo ?since= das listagens de doações.
+
+    Cobre:
+    - Carga inicial e token sem alterações
+    - Doação que sai da listagem (aprovada) e doação excluída em `removidos`
+    - Carga inicial só com as linhas da listagem e sem lápides
+    - Lápides uma vez por rodada, na última página
+    - Token inválido
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.usuario = UsuarioFactory()
+        self.doacao1 = DoacaoPendenteFactory(doador=self.usuario)
+        self.doacao2 = DoacaoPendenteFactory(doador=self.usuario)
+        DoacaoPendenteFactory()  # De outro usuário
+
+    def test_historico_carga_inicial_e_incremento(self):
+        self.client.force_authenticate(user=self.usuario)
+        url = reverse('doacao_historico')
+
+        response = self.client.get(url, {'since': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({d['id'] for d in response.data['alterados']}, {self.doacao1.id, self.doacao2.id})
+        self.assertFalse(response.data['tem_mais'])
+        token = response.data['token']
+
+        response = self.client.get(url, {'since': token})
+        self.assertEqual(response.data['alterados'], [])
+        self.assertEqual(response.data['removidos'], [])
+
+        self.doacao1.status = 'APROVADA'
+        self.doacao1.save()
+        removida_id = self.doacao2.id
+        self.doacao2.delete()
+
+        response = self.client.get(url, {'since': token, 'status': 'PENDENTE'})
+        self.assertEqual(response.data['alterados'], [])
+        self.assertEqual(response.data['removidos'], [self.doacao1.id, removida_id])
+
+    def test_pendentes_remove_doacao_validada(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('admin_doacoes_pendentes')
+
+        token = self.client.get(url, {'since': ''}).data['token']
+        self.doacao1.status = 'RECUSADA'
+        self.doacao1.save()
+
+        response = self.client.get(url, {'since': token})
+        self.assertEqual(response.data['removidos'], [self.doacao1.id])
+
+    def _sincronizar(self, url, token):
+        """Percorre as páginas de uma rodada; devolve o token final e cada página."""
+        paginas = []
+        while True:
+            response = self.client.get(url, {'since': token})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            paginas.append(response.data)
+            token = response.data['token']
+            if not response.data['tem_mais']:
+                return token, paginas
+
+    def test_pendentes_carga_inicial_so_percorre_pendentes(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('admin_doacoes_pendentes')
+        DoacaoAprovadaFactory.create_batch(3)
+        excluida = DoacaoPendenteFactory()
+        excluida.delete()
+
+        with mock.patch.object(CustomPagination, 'max_page_size', 1), \
+                CaptureQueriesContext(connection) as consultas:
+            token, paginas = self._sincronizar(url, '')
+        self.assertEqual(len(paginas), 3)  # uma pendente por página
+        self.assertEqual(
+            {d['id'] for pagina in paginas for d in pagina['alterados']},
+            set(Doacao.objects.filter(status='PENDENTE').values_list('id', flat=True)),
+        )
+        self.assertTrue(all(pagina['removidos'] == [] for pagina in paginas))
+        self.assertFalse(any('doacoes_eventodoacao' in q['sql'] for q in consultas))
+
+        self.doacao1.aprovar(self.admin)
+        token, paginas = self._sincronizar(url, token)
+        self.assertEqual(paginas[-1]['removidos'], [self.doacao1.id])
+
+    def test_mudanca_durante_carga_inicial_vem_na_proxima_rodada(self):
+        self.client.force_authenticate(user=self.usuario)
+        url = reverse('doacao_historico')
+
+        with mock.patch.object(CustomPagination, 'max_page_size', 1):
+            primeira = self.client.get(url, {'since': ''}).data
+            self.assertTrue(primeira['tem_mais'])
+            entregue = primeira['alterados'][0]['id']
+            Doacao.objects.get(pk=entregue).delete()
+            token, _ = self._sincronizar(url, primeira['token'])
+            token, paginas = self._sincronizar(url, token)
+
+        self.assertIn(entregue, paginas[-1]['removidos'])
+
+    def test_lapides_so_na_ultima_pagina(self):
+        self.client.force_authenticate(user=self.usuario)
+        url = reverse('doacao_historico')
+        token, _ = self._sincronizar(url, '')
+
+        removida_id = self.doacao2.id
+        self.doacao2.delete()
+        DoacaoPendenteFactory.create_batch(2, doador=self.usuario)
+        with mock.patch.object(CustomPagination, 'max_page_size', 1):
+            token, paginas = self._sincronizar(url, token)
+
+        self.assertGreater(len(paginas), 1)
+        self.assertTrue(all(pagina['removidos'] == [] for pagina in paginas[:-1]))
+        self.assertEqual(paginas[-1]['removidos'], [removida_id])
+
+        token, paginas = self._sincronizar(url, token)
+        self.assertEqual(paginas[-1]['removidos'], [])
+
+    def test_token_invalido_retorna_400(self):
+        self.client.force_authenticate(user=self.usuario)
+        response = self.client.get(reverse('doacao_historico'), {'since': 'nao-e-token'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNotNone(_err_field(response.data, 'since'))
+
+
+# ============================================================================
+# TESTES DE CAMPOS ESPARSOS (?fields= / ?omit=)
+# ============================================================================
+
+class CamposEsparsosTestCase(APITestCase):
+    """
+    Testes dos parâmetros ?fields= e ?omit= nas listagens.
+
+    Cobre:
+    - Resposta só com os campos pedidos, inclusive aninhados
+    - SQL sem as colunas e joins dos campos cortados
+    """
+
+    def setUp(self):
+        self.usuario = UsuarioFactory()
+        DoacaoAprovadaFactory(doador=self.usuario, descricao='Texto longo da doação')
+        UsuarioBadgeFactory(usuario=self.usuario)
+        self.client.force_authenticate(user=self.usuario)
+
+    def test_fields_corta_resposta_e_sql(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('doacao_historico'), {'fields': 'id,status,data_submissao'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'data_submissao'})
+        sql = consultas.captured_queries[-1]['sql']
+        self.assertNotIn('descricao', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_omit_remove_campos(self):
+        response = self.client.get(reverse('doacao_historico'), {'omit': 'descricao,evidencia_foto'})
+
+        doacao = response.data['results'][0]
+        self.assertNotIn('descricao', doacao)
+        self.assertNotIn('evidencia_foto', doacao)
+        self.assertIn('tipo_doacao', doacao)
+
+    def test_fields_aninhado_em_minhas_badges(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('badge-minhas-badges'), {'fields': 'data_conquista,badge.nome'})
+
+        self.assertEqual(set(response.data[0]), {'data_conquista', 'badge'})
+        self.assertEqual(set(response.data[0]['badge']), {'nome'})
+        self.assertNotIn('"badges"."descricao"', consultas.captured_queries[-1]['sql'])
+
+
+# ============================================================================
+# TESTES DO CAMINHO RÁPIDO DE LEITURA
+# ============================================================================
+
+class LeituraRapidaTestCase(APITestCase):
+    """
+    Contrato do caminho rápido (values_list) com os serializers.
+
+    Cobre:
+    - JSON byte a byte igual ao do serializer em historico, pendentes e badges/minhas
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.usuario = UsuarioFactory()
+        DoacaoPendenteFactory(doador=self.usuario, descricao='Garrafas PET — ação “especial”')
+        DoacaoAprovadaFactory(doador=self.usuario)
+        DoacaoRecusadaFactory(doador=self.usuario, evidencia_foto='')
+        UsuarioBadgeFactory(usuario=self.usuario, badge=BadgeCompraFactory(icone='badges/icone_teste'))
+        UsuarioBadgeFactory(usuario=self.usuario)
+
+    def _comparar(self, usuario, url, parametros=None):
+        self.client.force_authenticate(user=usuario)
+        with self.settings(API_LEITURA_RAPIDA=False):
+            esperado = self.client.get(url, parametros)
+        with CaptureQueriesContext(connection) as consultas:
+            obtido = self.client.get(url, parametros)
+
+        self.assertEqual(obtido.status_code, status.HTTP_200_OK)
+        self.assertEqual(obtido.content, esperado.content)
+        self.assertNotIn('"contas_usuario"."password"', ' '.join(q['sql'] for q in consultas.captured_queries))
+
+    def test_historico(self):
+        self._comparar(self.usuario, reverse('doacao_historico'))
+        self._comparar(self.usuario, reverse('doacao_historico'), {'status': 'APROVADA', 'page_size': 1})
+
+    def test_pendentes(self):
+        self._comparar(self.admin, reverse('admin_doacoes_pendentes'))
+
+    def test_minhas_badges(self):
+        self._comparar(self.usuario, reverse('badge-minhas-badges'))
+
+
+# ============================================================================
+# TESTES DE ARQUIVAMENTO DE DOAÇÕES
+# ============================================================================
+
+class ArquivamentoDoacoesTestCase(APITestCase):
+    """
+    Testes do arquivamento de doações validadas antigas.
+
+    Cobre:
+    - Comando move só validadas antigas, em lotes retomáveis, sem lápides no outbox
+    - Histórico com ?incluir_arquivadas=true (serializer e caminho rápido)
+    - Critérios de badge contam doações arquivadas
+    """
+
+    def setUp(self):
+        self.usuario = UsuarioFactory()
+        antiga = timezone.now() - timedelta(days=400)
+        self.aprovada = DoacaoAprovadaFactory(doador=self.usuario)
+        self.recusada = DoacaoRecusadaFactory(doador=self.usuario)
+        self.pendente = DoacaoPendenteFactory(doador=self.usuario)
+        Doacao.objects.filter(pk__in=[self.aprovada.pk, self.recusada.pk, self.pendente.pk]).update(data_submissao=antiga)
+        self.recente = DoacaoAprovadaFactory(doador=self.usuario)
+
+    def _arquivar(self, *args):
+        call_command('arquivar_doacoes', '--dias', '365', *args, stdout=StringIO())
+
+    def test_comando_arquiva_em_lotes_retomaveis(self):
+        self._arquivar('--lote', '1', '--limite', '1')
+        self.assertEqual(DoacaoArquivada.objects.count(), 1)
+
+        self._arquivar()
+        self.assertEqual(
+            set(DoacaoArquivada.objects.values_list('id', flat=True)), {self.aprovada.pk, self.recusada.pk}
+        )
+        self.assertEqual(set(Doacao.objects.values_list('id', flat=True)), {self.pendente.pk, self.recente.pk})
+        arquivada = DoacaoArquivada.objects.get(pk=self.recusada.pk)
+        self.assertEqual(arquivada.motivo_recusa, self.recusada.motivo_recusa)
+        self.assertFalse(EventoDoacao.objects.filter(tipo='DOACAO_EXCLUIDA').exists())
+
+    def test_historico_inclui_arquivadas_quando_pedido(self):
+        self._arquivar()
+        self.client.force_authenticate(user=self.usuario)
+        url = reverse('doacao_historico')
+
+        self.assertEqual(self.client.get(url).data['count'], 2)
+
+        response = self.client.get(url, {'incluir_arquivadas': 'true'})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['results'][0]['id'], self.recente.pk)
+        with self.settings(API_LEITURA_RAPIDA=False):
+            self.assertEqual(self.client.get(url, {'incluir_arquivadas': 'true'}).content, response.content)
+
+        response = self.client.get(url, {'incluir_arquivadas': 'true', 'status': 'APROVADA', 'page_size': 1, 'page': 2})
+        self.assertEqual([d['id'] for d in response.data['results']], [self.aprovada.pk])
+
+    def test_badges_contam_doacoes_arquivadas(self):
+        self._arquivar()
+
+        self.assertEqual(BadgeService.totais_aprovados(self.usuario)[0], 2)
+
+
 # ============================================================================
 # TESTES DE VALIDAÇÃO DE DOAÇÃO (ADMIN)
 # ============================================================================
@@ -454,6 +764,7 @@ class BadgeComprarTestCase(APITestCase):
     - Compra bem-sucedida
     - Saldo insuficiente
     - Badge já possuída
+    - Débito sobre o saldo do banco (sem perder créditos concorrentes)
     """
     
     def setUp(self):
@@ -503,6 +814,25 @@ class BadgeComprarTestCase(APITestCase):
         self.assertFalse(response.data['sucesso'])
         self.assertEqual(response.data.get('codigo'), 'JA_POSSUI_BADGE')
     
+    def test_compra_nao_sobrescreve_credito_feito_apos_a_autenticacao(self):
+        """O worker credita moedas enquanto a requisição usa o usuário já carregado"""
+        Usuario.objects.filter(pk=self.usuario_pobre.pk).update(saldo_moedas=300)
+        self.client.force_authenticate(user=self.usuario_pobre)
+
+        response = self.client.post(reverse('badge-comprar'), {'badge_id': self.badge_barata.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['saldo_restante'], 100)
+        self.usuario_pobre.refresh_from_db()
+        self.assertEqual(self.usuario_pobre.saldo_moedas, 100)
+
+    def test_compra_sem_saldo_nao_atribui_badge(self):
+        self.client.force_authenticate(user=self.usuario_pobre)
+        self.client.post(reverse('badge-comprar'), {'badge_id': self.badge_cara.id})
+        self.assertFalse(UsuarioBadge.objects.filter(usuario=self.usuario_pobre).exists())
+        self.usuario_pobre.refresh_from_db()
+        self.assertEqual(self.usuario_pobre.saldo_moedas, 100)
+
     def test_comprar_badge_inexistente_retorna_400(self):
         """Tentar comprar badge inexistente retorna erro"""
         self.client.force_authenticate(user=self.usuario_rico)
@@ -566,4 +896,1110 @@ class ListarTiposDoacaoTestCase(APITestCase):
         nomes = [tipo['nome'] for tipo in data]
         
         # Verifica que estão em ordem alfabética
-        self.assertEqual(nomes, sorted(nomes))
\ No newline at end of file
+        self.assertEqual(nomes, sorted(nomes))
+
+# ============================================================================
+# TESTES DE RETROATRIBUIÇÃO DE BADGES
+# ============================================================================
+
+class RetroagirBadgesTestCase(APITestCase):
+    """
+    Testes para a retroatribuição de badges de conquista.
+
+    Cobre:
+    - Comando retroagir_badges (critério por doações e por moedas)
+    - Batimento da tarefa a cada lote
+    - Evento só para as atribuições realmente inseridas
+    - Disparo automático ao criar badge pela API
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.veterano = UsuarioFactory()
+        self.novato = UsuarioFactory()
+        tipo = TipoDoacaoFactory(moedas_atribuidas=30)
+
+        DoacaoAprovadaFactory.create_batch(3, doador=self.veterano, tipo_doacao=tipo)
+        DoacaoAprovadaFactory(doador=self.novato, tipo_doacao=tipo)
+        DoacaoPendenteFactory.create_batch(3, doador=self.novato, tipo_doacao=tipo)
+
+    def test_comando_atribui_apenas_aos_qualificados(self):
+        badge = BadgeConquistaFactory(criterio_doacoes=3)
+
+        call_command('retroagir_badges', stdout=StringIO())
+
+        premiados = set(UsuarioBadge.objects.filter(badge=badge).values_list('usuario_id', flat=True))
+        self.assertEqual(premiados, {self.veterano.id})
+
+    def test_criterio_por_moedas_e_idempotencia(self):
+        badge = BadgeConquistaFactory(criterio_doacoes=None, criterio_moedas=30)
+        UsuarioBadgeFactory(usuario=self.veterano, badge=badge)
+
+        call_command('retroagir_badges', '--badge', str(badge.id), stdout=StringIO())
+        call_command('retroagir_badges', '--badge', str(badge.id), stdout=StringIO())
+
+        self.assertEqual(UsuarioBadge.objects.filter(badge=badge).count(), 2)
+
+    def test_reexecucao_nao_repete_eventos(self):
+        badge = BadgeConquistaFactory(criterio_doacoes=1)
+        inserir = BadgeService._inserir_atribuicoes
+
+        def ganha_antes_do_insert(badge, lote):
+            # O veterano recebe a badge por outro caminho entre a consulta e o INSERT
+            UsuarioBadge.objects.get_or_create(usuario=self.veterano, badge=badge)
+            return inserir(badge, lote)
+
+        with mock.patch.object(BadgeService, '_inserir_atribuicoes', side_effect=ganha_antes_do_insert):
+            self.assertEqual(BadgeService.retroagir_badge(badge), 1)
+        self.assertEqual(BadgeService.retroagir_badge(badge), 0)
+
+        eventos_badge = EventoDoacao.objects.filter(tipo='BADGE_CONQUISTADA', payload__badge_id=badge.id)
+        self.assertEqual(list(eventos_badge.values_list('usuario_id', flat=True)), [self.novato.id])
+        self.assertEqual(UsuarioBadge.objects.filter(badge=badge).count(), 2)
+
+    def test_renova_a_reserva_da_tarefa_a_cada_lote(self):
+        badge = BadgeConquistaFactory(criterio_doacoes=1)
+
+        with mock.patch('doacoes.services.batimento') as batimento:
+            BadgeService.retroagir_badge(badge, tamanho_lote=1)
+
+        self.assertEqual(batimento.call_count, 2)
+
+    @override_settings(BADGES_RETROAGIR_AO_SALVAR=True)
+    def test_criar_badge_pela_api_retroage(self):
+        self.client.force_authenticate(user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin-badge-list'), {
+                'nome': 'Veterano', 'descricao': 'Três doações aprovadas',
+                'tipo': 'CONQUISTA', 'criterio_doacoes': 3,
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(UsuarioBadge.objects.filter(usuario=self.veterano, badge_id=response.data['id']).exists())
+        self.assertFalse(UsuarioBadge.objects.filter(usuario=self.novato).exists())
+
+
+# ============================================================================
+# TESTES DO OUTBOX DE EVENTOS
+# ============================================================================
+
+class OutboxEventosTestCase(APITestCase):
+    """
+    Testes do outbox de eventos de doações.
+
+    Cobre:
+    - Eventos gravados na criação, aprovação e recusa
+    - Leitura incremental por consumidor
+    - Parada em buracos da sequência, contada de quando o leitor os viu
+    - Espera máxima por um buraco com transação aberta
+    - Evento de transação longa (COMMIT bem depois do INSERT) não é pulado
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.usuario = UsuarioFactory()
+        self.tipo = TipoDoacaoFactory(moedas_atribuidas=10)
+        BadgeConquistaFactory(criterio_doacoes=1)
+
+    def test_fluxo_da_doacao_gera_eventos(self):
+        self.client.force_authenticate(user=self.usuario)
+        self.client.post(reverse('doacao_submeter'), {
+            'tipo_doacao': self.tipo.id, 'evidencia_foto': criar_imagem_teste()
+        }, format='multipart')
+        doacao = Doacao.objects.get(doador=self.usuario)
+
+        self.client.force_authenticate(user=self.admin)
+        self.client.patch(reverse('admin_doacao_validar', kwargs={'pk': doacao.id}), {'status': 'APROVADA'})
+
+        tipos = list(EventoDoacao.objects.filter(usuario=self.usuario).values_list('tipo', flat=True))
+        self.assertEqual(tipos, ['DOACAO_CRIADA', 'DOACAO_APROVADA', 'BADGE_CONQUISTADA'])
+        self.assertEqual(EventoDoacao.objects.get(tipo='DOACAO_APROVADA').doacao_id, doacao.id)
+
+    def test_consumidor_le_apenas_eventos_novos(self):
+        DoacaoPendenteFactory(doador=self.usuario).recusar(self.admin, 'Foto ilegível')
+        vistos = []
+
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 0)
+
+        DoacaoPendenteFactory(doador=self.usuario).aprovar(self.admin)
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+        self.assertEqual([e.tipo for e in vistos], ['DOACAO_RECUSADA', 'DOACAO_APROVADA'])
+        self.assertEqual(eventos.offset('teste'), vistos[-1].id)
+
+    def test_leitura_para_antes_de_buraco_recente(self):
+        primeiro, meio, ultimo = [
+            EventoDoacao.publicar('DOACAO_CRIADA', self.usuario.id) for _ in range(3)
+        ]
+        meio_id = meio.id
+        meio.delete()  # simula transação ainda não confirmada
+
+        lote, buraco = eventos.ler(0)
+        self.assertEqual([e.id for e in lote], [primeiro.id])
+        self.assertEqual(buraco[0], meio_id)
+
+        # O tempo conta de quando o leitor viu o buraco, não do criado_em dos eventos
+        EventoDoacao.objects.filter(pk=ultimo.pk).update(criado_em=timezone.now() - timedelta(minutes=1))
+        self.assertEqual([e.id for e in eventos.ler(0, buraco=buraco)[0]], [primeiro.id])
+
+        buraco = (buraco[0], buraco[1] - timedelta(minutes=1))
+        lote, buraco = eventos.ler(0, buraco=buraco)
+        self.assertEqual([e.id for e in lote], [primeiro.id, ultimo.id])
+        self.assertIsNone(buraco)
+
+    def test_evento_de_transacao_longa_nao_se_perde(self):
+        primeiro, atrasado, seguinte = [
+            EventoDoacao.publicar('DOACAO_CRIADA', self.usuario.id) for _ in range(3)
+        ]
+        # `atrasado` foi inserido por uma transação que segue aberta bem além da margem
+        dados = {'id': atrasado.id, 'tipo': atrasado.tipo, 'usuario_id': atrasado.usuario_id, 'payload': atrasado.payload}
+        atrasado.delete()
+        EventoDoacao.objects.filter(pk__in=[primeiro.pk, seguinte.pk]).update(
+            criado_em=timezone.now() - timedelta(minutes=10)
+        )
+        vistos = []
+
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 0)
+        self.assertEqual(OffsetConsumidor.objects.get(consumidor='teste').buraco_id, dados['id'])
+
+        EventoDoacao.objects.create(**dados)  # o COMMIT chega
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 2)
+        self.assertEqual([e.id for e in vistos], [primeiro.id, dados['id'], seguinte.id])
+        self.assertIsNone(OffsetConsumidor.objects.get(consumidor='teste').buraco_id)
+
+    def test_buraco_vira_rollback_apos_a_margem_desde_que_foi_visto(self):
+        primeiro, perdido, seguinte = [
+            EventoDoacao.publicar('DOACAO_CRIADA', self.usuario.id) for _ in range(3)
+        ]
+        perdido.delete()
+        vistos = []
+
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+        OffsetConsumidor.objects.filter(consumidor='teste').update(
+            buraco_visto_em=timezone.now() - timedelta(seconds=settings.OUTBOX_MARGEM_SEGUNDOS)
+        )
+        self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+        self.assertEqual([e.id for e in vistos], [primeiro.id, seguinte.id])
+
+    def test_transacao_aberta_nao_segura_o_buraco_alem_da_espera_maxima(self):
+        primeiro, perdido, seguinte = [
+            EventoDoacao.publicar('DOACAO_CRIADA', self.usuario.id) for _ in range(3)
+        ]
+        perdido.delete()
+        vistos = []
+
+        # PostgreSQL com uma sessão esquecida em "idle in transaction"
+        with mock.patch.object(eventos, '_transacao_anterior_aberta', return_value=True):
+            self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+            OffsetConsumidor.objects.filter(consumidor='teste').update(
+                buraco_visto_em=timezone.now() - timedelta(seconds=settings.OUTBOX_ESPERA_MAXIMA_SEGUNDOS - 1)
+            )
+            self.assertEqual(eventos.consumir('teste', vistos.extend), 0)
+
+            OffsetConsumidor.objects.filter(consumidor='teste').update(
+                buraco_visto_em=timezone.now() - timedelta(seconds=settings.OUTBOX_ESPERA_MAXIMA_SEGUNDOS)
+            )
+            with self.assertLogs('doacoes.eventos', 'ERROR'):
+                self.assertEqual(eventos.consumir('teste', vistos.extend), 1)
+
+        self.assertEqual([e.id for e in vistos], [primeiro.id, seguinte.id])
+        self.assertIsNone(OffsetConsumidor.objects.get(consumidor='teste').buraco_id)
+
+
+# ============================================================================
+# TESTES DO FLUXO SSE
+# ============================================================================
+
+@override_settings(SSE_HEARTBEAT_SEGUNDOS=0.05)
+class StreamEventosTestCase(TestCase):
+    """
+    Testes do fluxo SSE de eventos do usuário.
+
+    Cobre:
+    - Autenticação por ticket de uso único (o JWT não vai na URL), registrado no banco
+    - Retomada a partir do Last-Event-ID
+    - Heartbeat e entrega de eventos publicados durante a conexão
+    - Notificação só para as conexões dos usuários com eventos novos
+    - Fim do fluxo quando o access token vence
+    - 501 fora do servidor ASGI
+    """
+
+    def setUp(self):
+        self.usuario = UsuarioFactory()
+        self.admin = AdminFactory()
+        self.token = str(RefreshToken.for_user(self.usuario).access_token)
+        self.url = reverse('doacao_eventos_stream')
+        self.url_ticket = reverse('doacao_eventos_ticket')
+
+    async def _ticket(self):
+        response = await self.async_client.post(self.url_ticket, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['ticket']
+
+    async def _abrir(self, headers=None, ticket=None):
+        response = await self.async_client.get(self.url, {'ticket': ticket or await self._ticket()}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response, aiter(response.streaming_content)
+
+    async def test_sem_credencial_retorna_401(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post(self.url_ticket)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_jwt_na_url_nao_e_aceito(self):
+        response = await self.async_client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_ticket_de_uso_unico(self):
+        ticket = await self._ticket()
+        response, fluxo = await self._abrir(ticket=ticket)
+        await fluxo.aclose()
+
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'ticket': ticket + 'x'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_uso_do_ticket_fica_no_banco_e_nao_no_cache(self):
+        # Com cache local por processo, outro worker não veria o uso no cache
+        ticket = await self._ticket()
+        response, fluxo = await self._abrir(ticket=ticket)
+        await fluxo.aclose()
+        await sync_to_async(cache.clear)()
+
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(await TicketStreamUsado.objects.acount(), 1)
+
+    async def test_retoma_do_last_event_id(self):
+        doacao = await sync_to_async(DoacaoPendenteFactory)(doador=self.usuario)
+        await sync_to_async(doacao.recusar)(self.admin, 'Foto ilegível')
+
+        response, fluxo = await self._abrir(headers={'Last-Event-ID': '0'})
+        self.assertIn(b'retry:', await anext(fluxo))
+        mensagem = (await anext(fluxo)).decode()
+        await fluxo.aclose()
+
+        self.assertIn('event: doacao_recusada', mensagem)
+        self.assertIn(f'"doacao_id": {doacao.id}', mensagem)
+
+    async def test_heartbeat_e_evento_novo(self):
+        response, fluxo = await self._abrir()
+        await anext(fluxo)
+        self.assertEqual(await anext(fluxo), b': ping\n\n')
+
+        doacao = await sync_to_async(DoacaoPendenteFactory)(doador=self.usuario)
+        await sync_to_async(doacao.aprovar)(self.admin)
+
+        mensagens = [(await anext(fluxo)).decode() for _ in range(2)]
+        await fluxo.aclose()
+        self.assertTrue(any('event: doacao_aprovada' in m for m in mensagens))
+
+    async def test_fluxo_termina_quando_o_token_vence(self):
+        ticket = stream.emitir_ticket(self.usuario.id, time.time() + 0.2)
+        response, fluxo = await self._abrir(ticket=ticket)
+
+        mensagens = [m.decode() async for m in fluxo]
+        self.assertTrue(mensagens[-1].startswith('event: expirado'))
+
+    async def test_difusor_acorda_so_as_conexoes_do_destinatario(self):
+        difusor = stream.Difusor()
+        minha = difusor.assinar(self.usuario.id)
+        outra = difusor.assinar(self.admin.id)
+
+        difusor.notificar({self.usuario.id})
+        await asyncio.sleep(0)
+        self.assertTrue(minha[2].is_set())
+        self.assertFalse(outra[2].is_set())
+
+        # Sem destinatário (payload vazio de outra versão): acorda todas
+        difusor.notificar(None)
+        await asyncio.sleep(0)
+        self.assertTrue(outra[2].is_set())
+
+        difusor.cancelar(minha)
+        difusor.cancelar(outra)
+        self.assertEqual(difusor._assinantes, {})
+
+    def test_publicacao_avisa_apenas_os_usuarios_dos_eventos(self):
+        recebidos = []
+
+        def receptor(sender, usuario_ids=None, **kwargs):
+            recebidos.append(usuario_ids)
+
+        eventos_publicados.connect(receptor)
+        self.addCleanup(eventos_publicados.disconnect, receptor)
+        with self.captureOnCommitCallbacks(execute=True):
+            EventoDoacao.publicar_em_lote([
+                EventoDoacao(tipo='BADGE_CONQUISTADA', usuario_id=usuario_id)
+                for usuario_id in (self.admin.id, self.usuario.id, self.admin.id)
+            ])
+
+        self.assertEqual(recebidos, [sorted({self.usuario.id, self.admin.id})])
+
+    def test_payload_do_notify(self):
+        payloads = list(payloads_notify(range(1, 3000), tamanho=100))
+        self.assertTrue(all(len(payload) <= 100 for payload in payloads))
+        self.assertEqual(set().union(*map(stream.destinatarios, payloads)), set(range(1, 3000)))
+        self.assertIsNone(stream.destinatarios(''))
+        self.assertIsNone(stream.destinatarios('abc'))
+
+    def test_sob_wsgi_retorna_501(self):
+        response = self.client.get(self.url, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 501)
+
+
+# ============================================================================
+# TESTES DO ADMIN EM TABELAS GRANDES
+# ============================================================================
+
+class AdminEscalavelTestCase(TestCase):
+    """
+    Cobre:
+    - Lista de doações sem COUNT(*) da tabela inteira e com select_related
+    - Próxima página por keyset (?apos=) sem repetir nem pular linhas
+    - ?apos= inválido não derruba a página
+    - Demais listas grandes (badges conquistadas, arquivo, outbox, usuários, tarefas) abrem
+    - Doador/validador com autocomplete em vez de <select> de todos os usuários
+    """
+
+    def setUp(self):
+        self.client.force_login(SuperuserFactory())
+        self.url = reverse('admin:doacoes_doacao_changelist')
+        agora = timezone.now()
+        self.doacoes = DoacaoPendenteFactory.create_batch(5)
+        for i, doacao in enumerate(self.doacoes):
+            # Duas com a mesma data: o desempate é o id
+            Doacao.objects.filter(pk=doacao.pk).update(data_submissao=agora - timedelta(days=min(i, 3)))
+
+    def _ids_da_pagina(self, response):
+        return [doacao.pk for doacao in response.context['cl'].result_list]
+
+    def test_lista_sem_contagem_total_e_sem_n_mais_1(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Só a contagem do paginador (a do total sem filtros fica desligada)
+        contagens = [q['sql'] for q in consultas if 'COUNT(*)' in q['sql'] and 'doacoes_doacao' in q['sql']]
+        self.assertEqual(len(contagens), 1)
+
+        # Doador, tipo e validador vêm no mesmo SELECT: mais linhas, mesmas consultas
+        DoacaoPendenteFactory.create_batch(5, validado_por=UsuarioFactory())
+        with CaptureQueriesContext(connection) as consultas_com_mais_linhas:
+            self.client.get(self.url)
+        self.assertEqual(len(consultas_com_mais_linhas), len(consultas))
+
+    def test_paginacao_keyset(self):
+        esperados = list(Doacao.objects.order_by('-data_submissao', '-pk').values_list('pk', flat=True))
+
+        with mock.patch.object(DoacaoAdmin, 'list_per_page', 2):
+            vistos, url = [], self.url
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                vistos += self._ids_da_pagina(response)
+                proxima = response.context['cl'].url_proxima_pagina
+                url = self.url + proxima if proxima else None
+
+        self.assertEqual(vistos, esperados)
+
+    def test_demais_listas_grandes_abrem(self):
+        UsuarioBadgeFactory()
+        for nome in ('doacoes_usuariobadge', 'doacoes_doacaoarquivada', 'doacoes_eventodoacao',
+                     'contas_usuario', 'core_tarefa'):
+            with self.subTest(nome):
+                self.assertEqual(self.client.get(reverse(f'admin:{nome}_changelist')).status_code, 200)
+
+    def test_apos_invalido(self):
+        response = self.client.get(self.url, {'apos': 'isso-nao-e-data|x'})
+
+        # IncorrectLookupParameters: o admin redireciona com ?e=1
+        self.assertEqual(response.status_code, 302)
+
+    def test_autocomplete_de_usuarios(self):
+        response = self.client.get(reverse('admin:doacoes_doacao_add'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'admin-autocomplete')
+
+
+# ============================================================================
+# TESTES DE IDEMPOTÊNCIA (Idempotency-Key)
+# ============================================================================
+
+class IdempotenciaTestCase(APITestCase):
+    """
+    Cobre:
+    - Repetição de submeter/ com a mesma chave devolve a resposta original sem criar outra doação
+    - Compra repetida debita uma vez só
+    - Mesma chave com outro corpo: 422; chave ainda em andamento: 409
+    - Sem o cabeçalho nada muda; chave expirada volta a executar
+    - Erro de validação não consome a chave
+    - Comando limpar_idempotencia
+    """
+
+    def setUp(self):
+        self.usuario = UsuarioFactory(saldo_moedas=1000)
+        self.tipo = TipoDoacaoFactory()
+        self.client.force_authenticate(self.usuario)
+        self.url = reverse('doacao_submeter')
+
+    def _submeter(self, chave, **extra):
+        dados = {'tipo_doacao': self.tipo.id, 'evidencia_foto': criar_imagem_teste(), **extra}
+        headers = {'Idempotency-Key': chave} if chave else {}
+        return self.client.post(self.url, dados, format='multipart', headers=headers)
+
+    def test_repeticao_devolve_resposta_original(self):
+        primeira = self._submeter('abc-1')
+        segunda = self._submeter('abc-1')
+
+        self.assertEqual(primeira.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(Doacao.objects.filter(doador=self.usuario).count(), 1)
+
+    def test_sem_cabecalho_cria_de_novo(self):
+        self._submeter(None)
+        self._submeter(None)
+
+        self.assertEqual(Doacao.objects.filter(doador=self.usuario).count(), 2)
+
+    def test_mesma_chave_com_outro_corpo_retorna_422(self):
+        self._submeter('abc-2')
+        response = self._submeter('abc-2', descricao='outra coisa')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.data['codigo'], 'ChaveIdempotenciaReutilizada')
+
+    def test_chave_em_andamento_retorna_409(self):
+        ChaveIdempotencia.objects.create(
+            usuario=self.usuario, escopo='doacoes_submeter', chave='abc-3', impressao='x',
+            expira_em=timezone.now() + timedelta(hours=1),
+        )
+        with mock.patch('core.idempotencia.impressao_requisicao', return_value='x'):
+            response = self._submeter('abc-3')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Doacao.objects.filter(doador=self.usuario).exists())
+
+    def test_chave_expirada_executa_de_novo(self):
+        self._submeter('abc-4')
+        ChaveIdempotencia.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+        response = self._submeter('abc-4')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Doacao.objects.filter(doador=self.usuario).count(), 2)
+
+    def test_erro_de_validacao_nao_consome_a_chave(self):
+        response = self.client.post(self.url, {}, format='multipart', headers={'Idempotency-Key': 'abc-5'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+        self.assertEqual(self._submeter('abc-5').status_code, status.HTTP_201_CREATED)
+
+    def test_compra_repetida_debita_uma_vez(self):
+        badge = BadgeCompraFactory(custo_moedas=300)
+        url = reverse('badge-comprar')
+        for _ in range(2):
+            response = self.client.post(url, {'badge_id': badge.id}, format='json', headers={'Idempotency-Key': 'c-1'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['saldo_restante'], 700)
+
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.saldo_moedas, 700)
+
+    def test_limpar_idempotencia(self):
+        self._submeter('abc-6')
+        self._submeter('abc-7')
+        ChaveIdempotencia.objects.filter(chave='abc-6').update(expira_em=timezone.now() - timedelta(seconds=1))
+
+        call_command('limpar_idempotencia', stdout=StringIO())
+
+        self.assertEqual(list(ChaveIdempotencia.objects.values_list('chave', flat=True)), ['abc-7'])
+
+
+# ============================================================================
+# TESTES DE FOTOS REPETIDAS (dHash)
+# ============================================================================
+
+def imagem_com_padrao(semente, tamanho=(120, 90), formato='JPEG'):
+    """Bytes de uma imagem com blocos aleatórios (fixos pela semente), ampliada para `tamanho`."""
+    import random
+    gerador = random.Random(semente)
+    base = Image.new('L', (12, 9))
+    base.putdata([gerador.randrange(256) for _ in range(12 * 9)])
+    buffer = BytesIO()
+    base.resize(tamanho, Image.Resampling.BILINEAR).convert('RGB').save(buffer, format=formato)
+    return buffer.getvalue()
+
+
+class FotosRepetidasTestCase(APITestCase):
+    """
+    Cobre:
+    - dHash estável com redimensionamento/recompressão e distante para outra foto
+    - Busca pelas partes indexadas acha tudo até a distância máxima e nada além
+    - Submissão grava a assinatura; pendentes/ mostra doações com foto parecida
+    - ?omit=similares e exclusão da doação tiram a comparação
+    - Comando calcular_assinaturas preenche as doações antigas
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.usuario = UsuarioFactory()
+        self.tipo = TipoDoacaoFactory()
+        self.url_pendentes = reverse('admin_doacoes_pendentes')
+
+    def _submeter(self, conteudo):
+        self.client.force_authenticate(self.usuario)
+        arquivo = SimpleUploadedFile('foto.jpg', conteudo, content_type='image/jpeg')
+        response = self.client.post(
+            reverse('doacao_submeter'), {'tipo_doacao': self.tipo.id, 'evidencia_foto': arquivo}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Doacao.objects.latest('id')
+
+    def _pendentes(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url_pendentes, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {linha['id']: linha for linha in response.data['results']}
+
+    def test_dhash_resiste_a_redimensionamento(self):
+        original = similaridade.dhash(BytesIO(imagem_com_padrao(1, (480, 360))))
+        reduzida = similaridade.dhash(BytesIO(imagem_com_padrao(1, (200, 150), formato='PNG')))
+        outra = similaridade.dhash(BytesIO(imagem_com_padrao(2, (480, 360))))
+
+        self.assertLessEqual(similaridade.distancia(original, reduzida), 3)
+        self.assertGreater(similaridade.distancia(original, outra), 16)
+
+    def test_busca_por_partes_respeita_a_distancia(self):
+        base = 0x0123456789ABCDEF
+        # Bits invertidos espalhados pelas 4 partes (o pior caso do multi-index)
+        perto = base ^ 0b11 ^ (0b11 << 16) ^ (0b11 << 32)
+        longe = base ^ 0b111 ^ (0b111 << 16) ^ (0b111 << 32)
+        for doacao_id, valor in ((1, base), (2, perto), (3, longe)):
+            SimilaridadeImagemService.registrar(doacao_id, valor)
+
+        encontrados = SimilaridadeImagemService.similares({1: base}, distancia_maxima=6)
+
+        self.assertEqual(encontrados, {1: [(2, 6)]})
+        self.assertEqual(AssinaturaImagem.objects.get(doacao_id=1).dhash, base)
+
+    def test_assinatura_sem_sinal_cabe_no_banco(self):
+        valor = 0xFFFF00000000FFFF
+        SimilaridadeImagemService.registrar(7, valor)
+
+        assinatura = AssinaturaImagem.objects.get(doacao_id=7)
+        self.assertLess(assinatura.dhash, 0)
+        self.assertEqual(similaridade.do_banco(assinatura.dhash), valor)
+        self.assertEqual([assinatura.parte0, assinatura.parte3], [0xFFFF, 0xFFFF])
+
+    def test_pendentes_mostram_foto_reenviada(self):
+        primeira = self._submeter(imagem_com_padrao(1, (480, 360)))
+        Doacao.objects.filter(pk=primeira.pk).update(status='APROVADA')
+        reenvio = self._submeter(imagem_com_padrao(1, (240, 180)))
+        diferente = self._submeter(imagem_com_padrao(2))
+
+        linhas = self._pendentes()
+
+        self.assertEqual(AssinaturaImagem.objects.count(), 3)
+        similares = linhas[reenvio.id]['similares']
+        self.assertEqual([s['id'] for s in similares], [primeira.id])
+        self.assertEqual(similares[0]['status'], 'APROVADA')
+        self.assertEqual(similares[0]['doador'], self.usuario.username)
+        self.assertFalse(similares[0]['arquivada'])
+        self.assertEqual(linhas[diferente.id]['similares'], [])
+
+    def test_foto_de_doacao_arquivada_continua_comparavel(self):
+        primeira = self._submeter(imagem_com_padrao(3))
+        Doacao.objects.filter(pk=primeira.pk).update(status='APROVADA', data_submissao=timezone.now() - timedelta(days=400))
+        call_command('arquivar_doacoes', dias=365, stdout=StringIO())
+        reenvio = self._submeter(imagem_com_padrao(3))
+
+        similares = self._pendentes()[reenvio.id]['similares']
+
+        self.assertEqual([(s['id'], s['distancia'], s['arquivada']) for s in similares], [(primeira.id, 0, True)])
+
+    def test_omit_e_exclusao(self):
+        primeira = self._submeter(imagem_com_padrao(4))
+        reenvio = self._submeter(imagem_com_padrao(4))
+
+        self.assertNotIn('similares', self._pendentes(omit='similares')[reenvio.id])
+        self.assertEqual(len(self._pendentes()[reenvio.id]['similares']), 1)
+
+        primeira.delete()
+
+        self.assertFalse(AssinaturaImagem.objects.filter(doacao_id=primeira.id).exists())
+        self.assertEqual(self._pendentes()[reenvio.id]['similares'], [])
+
+    def test_calcular_assinaturas_preenche_doacoes_antigas(self):
+        antigas = [DoacaoPendenteFactory(evidencia_foto=f'evidencias/antiga_{i}') for i in range(3)]
+        SimilaridadeImagemService.registrar(antigas[0].id, 42)
+        conteudo = imagem_com_padrao(5)
+
+        def baixar(url, timeout):
+            self.assertIn('w_256', url)
+            if 'antiga_2' in url:
+                raise OSError('404')
+            return BytesIO(conteudo)
+
+        with mock.patch.object(similaridade, 'urlopen', side_effect=baixar), \
+                mock.patch.object(cloudinary.config(), 'cloud_name', 'teste'):
+            saida = StringIO()
+            call_command('calcular_assinaturas', workers=0, lote=2, stdout=saida)
+
+        valores = dict(AssinaturaImagem.objects.values_list('doacao_id', 'dhash'))
+        self.assertEqual(valores[antigas[0].id], 42)
+        self.assertEqual(valores[antigas[1].id], similaridade.para_banco(similaridade.dhash(BytesIO(conteudo))))
+        self.assertNotIn(antigas[2].id, valores)
+        self.assertIn('1 assinatura(s) calculada(s); 1 foto(s)', saida.getvalue())
+
+
+# ============================================================================
+# TESTES DOS RESUMOS DIÁRIOS (RELATÓRIOS)
+# ============================================================================
+
+@override_settings(OUTBOX_MARGEM_SEGUNDOS=0)
+class ResumosDiariosTestCase(APITestCase):
+    """
+    Cobre:
+    - Consolidação incremental a partir do outbox (envios, validações, moedas, doadores ativos)
+    - Latência de aprovação pelo esboço de quantis
+    - Consolidar de novo não conta em dobro; reconstruir_resumos chega aos mesmos números
+    - Publicação de eventos agenda a consolidação
+    - API de relatório: permissões, período e filtro por tipo
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.doador1 = UsuarioFactory()
+        self.doador2 = UsuarioFactory()
+        self.papel = TipoDoacaoFactory(nome='Papel', moedas_atribuidas=10)
+        self.vidro = TipoDoacaoFactory(nome='Vidro', moedas_atribuidas=30)
+        self.url = reverse('admin_relatorio_resumo')
+
+    def _submeter(self, usuario, tipo):
+        self.client.force_authenticate(usuario)
+        response = self.client.post(
+            reverse('doacao_submeter'), {'tipo_doacao': tipo.id, 'evidencia_foto': criar_imagem_teste()},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Doacao.objects.latest('id')
+
+    def _validar(self, doacao, novo_status, horas_antes=0):
+        if horas_antes:
+            Doacao.objects.filter(pk=doacao.pk).update(data_submissao=timezone.now() - timedelta(hours=horas_antes))
+        self.client.force_authenticate(self.admin)
+        dados = {'status': novo_status, 'motivo_recusa': 'Foto ilegível.'}
+        response = self.client.patch(reverse('admin_doacao_validar', kwargs={'pk': doacao.id}), dados)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def _movimento(self):
+        d1 = self._submeter(self.doador1, self.papel)
+        d2 = self._submeter(self.doador1, self.papel)
+        d3 = self._submeter(self.doador2, self.vidro)
+        self._validar(d1, 'APROVADA', horas_antes=2)
+        self._validar(d3, 'APROVADA', horas_antes=4)
+        self._validar(d2, 'RECUSADA')
+
+    def _linhas(self):
+        return list(ResumoDiario.objects.order_by('dia', 'tipo_doacao_id').values(
+            'dia', 'tipo_doacao_id', 'submetidas', 'aprovadas', 'recusadas', 'moedas', 'latencia',
+        ))
+
+    def test_consolidacao_incremental(self):
+        self._movimento()
+        resumos.consolidar()
+
+        hoje = timezone.localdate()
+        papel = ResumoDiario.objects.get(dia=hoje, tipo_doacao=self.papel)
+        vidro = ResumoDiario.objects.get(dia=hoje, tipo_doacao=self.vidro)
+        self.assertEqual((papel.submetidas, papel.aprovadas, papel.recusadas, papel.moedas), (2, 1, 1, 10))
+        self.assertEqual((vidro.submetidas, vidro.aprovadas, vidro.recusadas, vidro.moedas), (1, 1, 0, 30))
+        self.assertEqual(DoadorAtivoDia.objects.filter(dia=hoje).count(), 2)
+
+        # Nada novo no outbox: consolidar de novo não muda os totais
+        antes = self._linhas()
+        self.assertEqual(resumos.consolidar(), 0)
+        self.assertEqual(self._linhas(), antes)
+
+    def test_reconstrucao_igual_ao_incremental(self):
+        self._movimento()
+        resumos.consolidar()
+        incremental = self._linhas()
+
+        saida = StringIO()
+        call_command('reconstruir_resumos', stdout=saida)
+
+        self.assertEqual(self._linhas(), incremental)
+        self.assertIn('2 resumo(s)', saida.getvalue())
+        # O consumidor foi posicionado no fim: nada é aplicado em dobro
+        self.assertEqual(resumos.consolidar(), 0)
+
+    def test_reconstrucao_a_partir_de_um_dia(self):
+        antiga = DoacaoAprovadaFactory(doador=self.doador1, tipo_doacao=self.papel)
+        Doacao.objects.filter(pk=antiga.pk).update(
+            data_submissao=timezone.now() - timedelta(days=10, hours=5),
+            data_validacao=timezone.now() - timedelta(days=10),
+        )
+        call_command('reconstruir_resumos', stdout=StringIO())
+        self._submeter(self.doador2, self.vidro)
+
+        call_command('reconstruir_resumos', desde=timezone.localdate().isoformat(), stdout=StringIO())
+
+        dias = set(ResumoDiario.objects.values_list('dia', flat=True))
+        self.assertEqual(dias, {timezone.localdate() - timedelta(days=10), timezone.localdate()})
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_resumos', desde='ontem', stdout=StringIO())
+
+    def test_publicacao_agenda_consolidacao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._submeter(self.doador1, self.papel)
+
+        self.assertEqual(ResumoDiario.objects.get(tipo_doacao=self.papel).submetidas, 1)
+
+    def test_relatorio(self):
+        self._movimento()
+        resumos.consolidar()
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        totais = response.data['totais']
+        self.assertEqual((totais['submetidas'], totais['aprovadas'], totais['recusadas']), (3, 2, 1))
+        self.assertEqual((totais['moedas'], totais['doadores_ativos']), (40, 2))
+        latencia = totais['latencia_aprovacao']
+        self.assertEqual(latencia['amostras'], 2)
+        self.assertAlmostEqual(latencia['p99'], 4 * 3600, delta=4 * 3600 * 0.02)
+        self.assertEqual(len(response.data['por_dia']), 1)
+        self.assertEqual(response.data['por_dia'][0]['doadores_ativos'], 2)
+        self.assertIsNotNone(response.data['atualizado_ate'])
+
+        response = self.client.get(self.url, {'tipo_doacao': self.vidro.id})
+        self.assertEqual(response.data['totais']['submetidas'], 1)
+        self.assertAlmostEqual(response.data['totais']['latencia_aprovacao']['p50'], 4 * 3600, delta=4 * 3600 * 0.02)
+
+    def test_relatorio_permissoes_e_periodo(self):
+        self.client.force_authenticate(self.doador1)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'desde': '2025-01-10', 'ate': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'desde': '2024-01-01', 'ate': '2025-06-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'ate': '2025-01-31'})
+        self.assertEqual(response.data['desde'], '2025-01-02')
+        self.assertEqual(response.data['totais']['latencia_aprovacao']['p50'], None)
+
+
+# ============================================================================
+# TESTES DO CATÁLOGO EM MEMÓRIA (TIPOS E BADGES)
+# ============================================================================
+
+@override_settings(CATALOGO_TTL_SEGUNDOS=30)
+class CatalogoTestCase(APITestCase):
+    """
+    Cobre:
+    - Submissão, compra e badges disponíveis sem consultar TipoDoacao/Badge a cada chamada
+    - Tipo inexistente ou inválido continua recusado com 400
+    - Salvar ou excluir tipo/badge invalida o retrato e troca a versão compartilhada
+    - Com cache compartilhado, versão trocada por outro processo força a recarga
+    - Instâncias devolvidas são cópias
+    """
+
+    def setUp(self):
+        catalogo.limpar()
+        self.addCleanup(catalogo.limpar)
+        self.usuario = UsuarioFactory(saldo_moedas=1000)
+        self.tipo = TipoDoacaoFactory(nome='Papel', moedas_atribuidas=10)
+        self.compra = BadgeCompraFactory(custo_moedas=100)
+        self.inativa = BadgeCompraFactory(custo_moedas=50, ativo=False)
+        self.client.force_authenticate(self.usuario)
+
+    def _consultas_ao_catalogo(self, funcao):
+        with CaptureQueriesContext(connection) as ctx:
+            funcao()
+        tabelas = (TipoDoacao._meta.db_table, Badge._meta.db_table)
+        return [q['sql'] for q in ctx.captured_queries if any(f'FROM "{t}"' in q['sql'] for t in tabelas)]
+
+    def _submeter(self, tipo_id):
+        return self.client.post(
+            reverse('doacao_submeter'), {'tipo_doacao': tipo_id, 'evidencia_foto': criar_imagem_teste()},
+            format='multipart',
+        )
+
+    def test_submissao_usa_catalogo(self):
+        self.assertEqual(self._submeter(self.tipo.id).status_code, status.HTTP_201_CREATED)
+        consultas = self._consultas_ao_catalogo(
+            lambda: self.assertEqual(self._submeter(self.tipo.id).status_code, status.HTTP_201_CREATED)
+        )
+        self.assertEqual(consultas, [])
+        self.assertEqual(Doacao.objects.filter(tipo_doacao=self.tipo).count(), 2)
+
+    def test_tipo_inexistente_ou_invalido(self):
+        for valor in (999999, 'abc'):
+            response = self._submeter(valor)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('tipo_doacao', response.data['detalhes'])
+
+    def test_compra_e_disponiveis_usam_catalogo(self):
+        self.client.get(reverse('badge-disponiveis'))
+        consultas = self._consultas_ao_catalogo(lambda: self.client.get(reverse('badge-disponiveis')))
+        self.assertEqual(consultas, [])
+
+        consultas = self._consultas_ao_catalogo(
+            lambda: self.client.post(reverse('badge-comprar'), {'badge_id': self.compra.id})
+        )
+        self.assertEqual(consultas, [])
+        self.assertTrue(UsuarioBadge.objects.filter(usuario=self.usuario, badge=self.compra).exists())
+        self.assertEqual(self.client.get(reverse('badge-disponiveis')).data, [])
+
+    def test_compra_recusa_badge_inativa_ou_de_conquista(self):
+        conquista = BadgeConquistaFactory()
+        for badge in (self.inativa, conquista):
+            response = self.client.post(reverse('badge-comprar'), {'badge_id': badge.id})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['codigo'], 'BADGE_INEXISTENTE')
+
+    def test_salvar_invalida(self):
+        self.assertEqual([b.id for b in catalogo.badges('COMPRA')], [self.compra.id])
+        self.inativa.ativo = True
+        self.inativa.save()
+        self.assertEqual([b.id for b in catalogo.badges('COMPRA')], [self.inativa.id, self.compra.id])
+
+        self.assertIsNotNone(catalogo.tipo_doacao(self.tipo.id))
+        self.tipo.delete()
+        self.assertIsNone(catalogo.tipo_doacao(self.tipo.id))
+
+    def test_versao_trocada_no_commit(self):
+        cache = catalogo._cache()
+        cache.set(catalogo.CHAVE_VERSAO, 'antiga')
+        with self.captureOnCommitCallbacks(execute=True):
+            BadgeCompraFactory()
+        self.assertNotEqual(cache.get(catalogo.CHAVE_VERSAO), 'antiga')
+
+    def test_cache_compartilhado_confere_versao(self):
+        with mock.patch.object(catalogo, '_compartilhado', return_value=True):
+            catalogo.badge(self.compra.id)
+            self.assertEqual(self._consultas_ao_catalogo(lambda: catalogo.badge(self.compra.id)), [])
+
+            # Outro processo alterou a badge e trocou a versão
+            Badge.objects.filter(pk=self.compra.pk).update(nome='Renomeada')
+            catalogo._cache().set(catalogo.CHAVE_VERSAO, 'de-outro-processo')
+            self.assertEqual(catalogo.badge(self.compra.id).nome, 'Renomeada')
+
+    def test_ttl_zero_desliga(self):
+        with override_settings(CATALOGO_TTL_SEGUNDOS=0):
+            catalogo.tipo_doacao(self.tipo.id)
+            self.assertEqual(len(self._consultas_ao_catalogo(lambda: catalogo.tipo_doacao(self.tipo.id))), 1)
+
+    def test_devolve_copias(self):
+        badge = catalogo.badge(self.compra.id)
+        badge.nome = 'Alterada'
+        self.assertEqual(catalogo.badge(self.compra.id).nome, self.compra.nome)
+
+
+# ============================================================================
+# TESTES DAS MOEDAS CREDITADAS POR DOAÇÃO
+# ============================================================================
+
+@override_settings(OUTBOX_MARGEM_SEGUNDOS=0)
+class MoedasCreditadasTestCase(APITestCase):
+    """
+    Cobre:
+    - Aprovação grava as moedas do tipo na doação; recusada fica com zero
+    - Validação definitiva: trocar aprovação por recusa (e vice-versa) é 409
+    - Mudar moedas_atribuidas do tipo não reescreve totais, saldo futuro nem resumos
+    - Totais do doador sem JOIN com TipoDoacao
+    - Coluna preservada no arquivamento e preenchida pela migração
+    """
+
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.doador = UsuarioFactory(saldo_moedas=0)
+        self.tipo = TipoDoacaoFactory(moedas_atribuidas=20)
+
+    def _validar(self, doacao, novo_status):
+        self.client.force_authenticate(self.admin)
+        dados = {'status': novo_status, 'motivo_recusa': 'Foto ilegível.'}
+        response = self.client.patch(reverse('admin_doacao_validar', kwargs={'pk': doacao.id}), dados)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        doacao.refresh_from_db()
+
+    def test_aprovacao_grava_e_historico_fica_estavel(self):
+        doacao = DoacaoPendenteFactory(doador=self.doador, tipo_doacao=self.tipo)
+        self._validar(doacao, 'APROVADA')
+        self.assertEqual(doacao.moedas_creditadas, 20)
+        self.doador.refresh_from_db()
+        self.assertEqual(self.doador.saldo_moedas, 20)
+
+        self.tipo.moedas_atribuidas = 50
+        self.tipo.save()
+        self.assertEqual(BadgeService.totais_aprovados(self.doador), (1, 20))
+
+        resumos.consolidar()
+        self.assertEqual(ResumoDiario.objects.get(tipo_doacao=self.tipo).moedas, 20)
+        resumos.reconstruir()
+        self.assertEqual(ResumoDiario.objects.get(tipo_doacao=self.tipo).moedas, 20)
+
+    def test_aprovar_recusar_aprovar_nao_descasa_coluna_e_saldo(self):
+        doacao = DoacaoPendenteFactory(doador=self.doador, tipo_doacao=self.tipo)
+        url = reverse('admin_doacao_validar', kwargs={'pk': doacao.id})
+        self._validar(doacao, 'APROVADA')
+
+        self.tipo.moedas_atribuidas = 50
+        self.tipo.save()
+        response = self.client.patch(url, {'status': 'RECUSADA', 'motivo_recusa': 'Foto ilegível.'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self._validar(doacao, 'APROVADA')  # mesma decisão repetida: nada muda
+
+        self.assertEqual(doacao.status, 'APROVADA')
+        self.assertEqual(doacao.moedas_creditadas, 20)
+        self.doador.refresh_from_db()
+        self.assertEqual(self.doador.saldo_moedas, 20)
+        self.assertEqual(Tarefa.objects.filter(nome='doacoes.premiar_doacao').count(), 1)
+        self.assertEqual(EventoDoacao.objects.filter(doacao_id=doacao.id, tipo='DOACAO_APROVADA').count(), 1)
+
+    def test_recusada_nao_pode_ser_aprovada(self):
+        doacao = DoacaoPendenteFactory(doador=self.doador, tipo_doacao=self.tipo)
+        self._validar(doacao, 'RECUSADA')
+        self.assertEqual(doacao.moedas_creditadas, 0)
+
+        response = self.client.patch(reverse('admin_doacao_validar', kwargs={'pk': doacao.id}), {'status': 'APROVADA'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.doador.refresh_from_db()
+        self.assertEqual(self.doador.saldo_moedas, 0)
+
+    def test_totais_sem_join(self):
+        DoacaoAprovadaFactory(doador=self.doador, tipo_doacao=self.tipo)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(BadgeService.totais_aprovados(self.doador), (1, 20))
+        self.assertFalse(any(TipoDoacao._meta.db_table in q['sql'] for q in ctx.captured_queries))
+
+    def test_arquivamento_preserva(self):
+        doacao = DoacaoAprovadaFactory(doador=self.doador, tipo_doacao=self.tipo)
+        Doacao.objects.filter(pk=doacao.pk).update(data_submissao=timezone.now() - timedelta(days=400))
+        call_command('arquivar_doacoes', '--dias', '365', stdout=StringIO())
+        self.assertEqual(DoacaoArquivada.objects.get(pk=doacao.pk).moedas_creditadas, 20)
+        self.assertEqual(BadgeService.totais_aprovados(self.doador), (1, 20))
+
+    def test_migracao_preenche_aprovadas(self):
+        migracao = import_module('doacoes.migrations.0012_moedas_creditadas')
+
+        aprovada = DoacaoAprovadaFactory(doador=self.doador, tipo_doacao=self.tipo, moedas_creditadas=0)
+        pendente = DoacaoPendenteFactory(doador=self.doador, tipo_doacao=self.tipo)
+        migracao.preencher_moedas(apps, None)
+
+        aprovada.refresh_from_db()
+        pendente.refresh_from_db()
+        self.assertEqual((aprovada.moedas_creditadas, pendente.moedas_creditadas), (20, 0))
+
+
+# ============================================================================
+# TESTES DAS VARIANTES DE IMAGEM NAS LISTAGENS
+# ============================================================================
+
+class VariantesImagemTestCase(APITestCase):
+    """
+    Cobre:
+    - Histórico e fila de moderação devolvem a miniatura por padrão
+    - ?variante=card/full e recusa de variante desconhecida
+    - Caminho rápido e serializer devolvem as mesmas URLs
+    - Sem Cloudinary: upload no MEDIA_ROOT e miniatura gerada localmente (uma vez)
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(cloudinary.config(), 'cloud_name', 'teste')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.usuario = UsuarioFactory()
+        self.admin = AdminFactory()
+        self.doacao = DoacaoPendenteFactory(doador=self.usuario)
+
+    def _fotos(self, url, usuario, **parametros):
+        self.client.force_authenticate(usuario)
+        response = self.client.get(url, parametros)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [linha['evidencia_foto'] for linha in response.data['results']]
+
+    def test_listagens_devolvem_miniatura(self):
+        for url, usuario in ((reverse('doacao_historico'), self.usuario), (reverse('admin_doacoes_pendentes'), self.admin)):
+            [foto] = self._fotos(url, usuario)
+            self.assertIn('w_200', foto)
+            self.assertIn('c_fill', foto)
+            self.assertIn(self.doacao.evidencia_foto.rsplit(".", 1)[0], foto)
+
+    def test_variantes_pedidas(self):
+        url = reverse('doacao_historico')
+        [card] = self._fotos(url, self.usuario, variante='card')
+        self.assertIn('w_600', card)
+        [full] = self._fotos(url, self.usuario, variante='full')
+        self.assertEqual(full, Doacao.objects.get(pk=self.doacao.pk).evidencia_foto.url)
+
+        response = self.client.get(url, {'variante': 'gigante'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_caminho_rapido_igual_ao_serializer(self):
+        url = reverse('doacao_historico')
+        for variante in ('thumb', 'card', 'full'):
+            rapido = self._fotos(url, self.usuario, variante=variante)
+            with override_settings(API_LEITURA_RAPIDA=False):
+                self.assertEqual(self._fotos(url, self.usuario, variante=variante), rapido)
+            self.assertEqual(
+                self._fotos(url, self.usuario, variante=variante, incluir_arquivadas='true'), rapido,
+            )
+
+    def test_sem_cloudinary_e_sem_arquivo_local(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with mock.patch.object(cloudinary.config(), 'cloud_name', None), override_settings(MEDIA_ROOT=media):
+            self.assertEqual(self._fotos(reverse('doacao_historico'), self.usuario), [None])
+
+    def test_sem_cloudinary_gera_miniatura_local(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        url = reverse('doacao_historico')
+        with mock.patch.object(cloudinary.config(), 'cloud_name', None), override_settings(MEDIA_ROOT=media):
+            Image.new('RGB', (800, 600), 'green').save(os.path.join(media, 'original.jpg'))
+            os.makedirs(os.path.join(media, 'evidencias'))
+            os.rename(os.path.join(media, 'original.jpg'), os.path.join(media, self.doacao.evidencia_foto))
+
+            [thumb] = self._fotos(url, self.usuario)
+            self.assertEqual(thumb, f"/media/variantes/200x200/{self.doacao.evidencia_foto}")
+            with Image.open(os.path.join(media, 'variantes', '200x200', self.doacao.evidencia_foto)) as gerada:
+                self.assertEqual(gerada.size, (200, 200))
+
+            # Já gerada: a próxima leitura não abre a original de novo
+            with mock.patch('core.imagens._gerar_local') as gerar:
+                self.assertEqual(self._fotos(url, self.usuario), [thumb])
+            gerar.assert_not_called()
+
+            [full] = self._fotos(url, self.usuario, variante='full')
+            self.assertEqual(full, f"/media/{self.doacao.evidencia_foto}")
+            [card] = self._fotos(url, self.usuario, variante='card')
+            self.assertEqual(card, f"/media/variantes/600x450/{self.doacao.evidencia_foto}")
+            with override_settings(API_LEITURA_RAPIDA=False):
+                self.assertEqual(self._fotos(url, self.usuario, variante='card'), [card])
+
+    @override_settings(TESTING=False)
+    def test_sem_cloudinary_upload_vai_para_o_media(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.client.force_authenticate(self.usuario)
+        with mock.patch.object(cloudinary.config(), 'cloud_name', None), override_settings(MEDIA_ROOT=media):
+            response = self.client.post(reverse('doacao_submeter'), {
+                'tipo_doacao': self.doacao.tipo_doacao_id, 'descricao': 'Garrafas PET limpas',
+                'evidencia_foto': criar_imagem_teste(),
+            }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            foto = Doacao.objects.latest('id').evidencia_foto
+            self.assertEqual(os.listdir(os.path.join(media, 'evidencias')), [f"{os.path.basename(foto.public_id)}.jpg"])
@@ -9,6 +9,7 @@ from .views import (
     ListarTiposDoacaoView
 )
 from . import views
+from .stream import TicketStreamView, stream_eventos
 
 router = DefaultRouter()
 router.register(r'badges', views.BadgeViewSet, basename='badge')
@@ -27,12 +28,19 @@ urlpatterns = [
     # <int:pk> significa que a URL vai ser ex: /api/doacoes/admin/validar/1/
     path('admin/validar/<int:pk>/', AdminAtualizarDoacaoView.as_view(), name='admin_doacao_validar'),
 
+    # Relatório diário (resumos consolidados do outbox)
+    path('admin/relatorios/resumo/', views.AdminRelatorioResumoView.as_view(), name='admin_relatorio_resumo'),
+
     # Rota para o Histórico do Usuário
     path('historico/', HistoricoDoacoesView.as_view(), name='doacao_historico'),
 
     # Tipos de Doação
     path('tipos/', ListarTiposDoacaoView.as_view(), name='doacao_tipos'),
 
+    # Fluxo SSE de eventos do usuário (requer ASGI)
+    path('eventos/stream/', stream_eventos, name='doacao_eventos_stream'),
+    path('eventos/stream/ticket/', TicketStreamView.as_view(), name='doacao_eventos_ticket'),
+
     path('', include(router.urls)),
     path('', include(admin_router.urls))
 ]
\ No newline at end of file
@@ -1,12 +1,15 @@
+from django.db import transaction
+from django.db.models import BooleanField, Q, Value
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-from .models import Doacao, Badge, UsuarioBadge, TipoDoacao
+from .models import Doacao, DoacaoArquivada, DoacaoJaValidada, Badge, UsuarioBadge, TipoDoacao
 from .serializers import (
     DoacaoSerializer, 
     CriarDoacaoSerializer, 
@@ -16,8 +19,19 @@ from .serializers import (
     ComprarBadgeSerializer,
     DashboardUsuarioSerializer,
     TipoDoacaoSerializer,
+    FiltroRelatorioSerializer,
+    RelatorioResumoSerializer,
 )
-from .services import BadgeService
+from . import catalogo, resumos
+from .services import BadgeService, SimilaridadeImagemService
+from .sincronizacao import SincronizacaoMixin
+from .leitura import LeitorDoacoes, LeitorUsuarioBadges
+from core.campos import CamposEsparsosMixin, PARAMETROS_CAMPOS
+from core.idempotencia import PARAMETRO_IDEMPOTENCIA, idempotente
+from core.imagens import PARAMETRO_VARIANTE, VarianteImagemMixin
+from core.leitura import LeituraRapidaMixin
+from core.tarefas import enfileirar
+from core.throttling import BaldeTokensThrottle
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
@@ -39,20 +53,46 @@ class ListarTiposDoacaoView(generics.ListAPIView):
 # DOAÇÕES
 # ============================================================================
 
-@extend_schema(tags=['Doações'], summary='Criar doação')
+@extend_schema(tags=['Doações'], summary='Criar doação', parameters=[PARAMETRO_IDEMPOTENCIA])
 class CriarDoacaoView(generics.CreateAPIView):
     serializer_class = CriarDoacaoSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    # Verificado antes de o upload ser lido (request.data é preguiçoso)
+    throttle_classes = [BaldeTokensThrottle]
+    throttle_scope = 'doacoes_submeter'
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
-@extend_schema(tags=['Doações'], summary='Histórico de doações do usuário')
-class HistoricoDoacoesView(generics.ListAPIView):
+    @idempotente('doacoes_submeter')
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+PARAMETRO_SINCE = OpenApiParameter(
+    name='since', type=str, location=OpenApiParameter.QUERY, required=False,
+    description='Token de sincronização. Retorna só as doações alteradas/removidas desde o token, '
+                'mais um novo token. Vazio = carga inicial.',
+)
+
+
+PARAMETRO_INCLUIR_ARQUIVADAS = OpenApiParameter(
+    name='incluir_arquivadas', type=bool, location=OpenApiParameter.QUERY, required=False,
+    description='Inclui as doações antigas já movidas para o arquivo (padrão: false).',
+)
+
+
+@extend_schema(
+    tags=['Doações'], summary='Histórico de doações do usuário',
+    parameters=[PARAMETRO_SINCE, PARAMETRO_INCLUIR_ARQUIVADAS, PARAMETRO_VARIANTE, *PARAMETROS_CAMPOS],
+)
+class HistoricoDoacoesView(
+    CamposEsparsosMixin, SincronizacaoMixin, VarianteImagemMixin, LeituraRapidaMixin, generics.ListAPIView,
+):
     serializer_class = DoacaoSerializer
+    leitor_rapido = LeitorDoacoes
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
 
@@ -68,6 +108,68 @@ class HistoricoDoacoesView(generics.ListAPIView):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        incluir = request.query_params.get('incluir_arquivadas', '').lower() in ('true', '1', 'yes')
+        if incluir and 'since' not in request.query_params:
+            return self.listar_com_arquivadas(request)
+        return super().list(request, *args, **kwargs)
+
+    def listar_com_arquivadas(self, request):
+        """
+        Pagina a união das chaves (id, data) das duas tabelas e só então carrega
+        as linhas da página de cada tabela, pelo serializer ou pelo caminho rápido.
+        """
+        filtros = {'doador': request.user}
+        status_param = request.query_params.get('status')
+        if status_param:
+            filtros['status'] = status_param.upper()
+
+        def chaves(modelo, arquivada):
+            return (
+                modelo.objects.filter(**filtros)
+                .annotate(arquivada=Value(arquivada, output_field=BooleanField()))
+                .values_list('id', 'data_submissao', 'arquivada')
+                .order_by()
+            )
+
+        uniao = chaves(Doacao, False).union(chaves(DoacaoArquivada, True), all=True).order_by('-data_submissao', '-id')
+        pagina = self.paginate_queryset(uniao)
+        linhas = pagina if pagina is not None else list(uniao)
+        ids = {False: [], True: []}
+        for id_, _, arquivada in linhas:
+            ids[bool(arquivada)].append(id_)
+
+        rapida = self.leitura_rapida_ativa()
+        carregadas = {}
+        for arquivada, modelo in ((False, Doacao), (True, DoacaoArquivada)):
+            if not ids[arquivada]:
+                continue
+            queryset = modelo.objects.filter(id__in=ids[arquivada])
+            if rapida:
+                for item in self.leitor_rapido.listar(queryset, **self.opcoes_leitor()):
+                    carregadas[(arquivada, item['id'])] = item
+            else:
+                queryset = self.podar_queryset(queryset.select_related('doador', 'tipo_doacao', 'validado_por'))
+                for item in queryset:
+                    carregadas[(arquivada, item.id)] = item
+
+        dados = [carregadas[(bool(arquivada), id_)] for id_, _, arquivada in linhas]
+        if not rapida:
+            dados = self.get_serializer(dados, many=True).data
+        if pagina is not None:
+            return self.get_paginated_response(dados)
+        return Response(dados)
+
+    def get_queryset_sincronizacao(self):
+        return Doacao.objects.filter(doador=self.request.user).select_related('doador', 'tipo_doacao', 'validado_por')
+
+    def filtro_sincronizacao(self):
+        status_param = self.request.query_params.get('status')
+        return Q(status=status_param.upper()) if status_param else Q(pk__isnull=False)
+
+    def lapides_sincronizacao(self):
+        return super().lapides_sincronizacao().filter(usuario=self.request.user)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
@@ -77,9 +179,15 @@ class HistoricoDoacoesView(generics.ListAPIView):
 # ADMIN
 # ============================================================================
 
-@extend_schema(tags=['Admin'], summary='Listar doações pendentes')
-class AdminDoacoesPendentesView(generics.ListAPIView):
+@extend_schema(
+    tags=['Admin'], summary='Listar doações pendentes',
+    parameters=[PARAMETRO_SINCE, PARAMETRO_VARIANTE, *PARAMETROS_CAMPOS],
+)
+class AdminDoacoesPendentesView(
+    CamposEsparsosMixin, SincronizacaoMixin, VarianteImagemMixin, LeituraRapidaMixin, generics.ListAPIView,
+):
     serializer_class = DoacaoSerializer
+    leitor_rapido = LeitorDoacoes
     permission_classes = [IsAdminUser]
     pagination_class = CustomPagination
 
@@ -88,14 +196,37 @@ class AdminDoacoesPendentesView(generics.ListAPIView):
             'doador', 'tipo_doacao'
         ).order_by('-data_submissao')
 
+    def get_queryset_sincronizacao(self):
+        return Doacao.objects.select_related('doador', 'tipo_doacao', 'validado_por')
+
+    def filtro_sincronizacao(self):
+        return Q(status='PENDENTE')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Fotos parecidas com evidências já enviadas; fora do modo ?since= e se pedido por ?fields=/?omit=
+        linhas = response.data.get('results') if isinstance(response.data, dict) else None
+        selecao = self.selecao_campos()
+        pedido = 'similares' in selecao.get('campos', ['similares']) and 'similares' not in selecao.get('omitir', [])
+        if linhas and pedido and all('id' in linha for linha in linhas):
+            SimilaridadeImagemService.anotar(linhas)
+        return response
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+class DoacaoJaValidadaConflito(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Esta doação já foi validada; a aprovação ou recusa não pode ser trocada.'
+    default_code = 'doacao_ja_validada'
+
+
 @extend_schema(tags=['Admin'], summary='Validar doação')
 class AdminAtualizarDoacaoView(generics.UpdateAPIView):
-    queryset = Doacao.objects.all()
+    # aprovar() copia as moedas do tipo
+    queryset = Doacao.objects.select_related('tipo_doacao')
     serializer_class = ValidarDoacaoSerializer
     permission_classes = [IsAdminUser]
 
@@ -107,22 +238,48 @@ class AdminAtualizarDoacaoView(generics.UpdateAPIView):
         novo_status = serializer.validated_data['status']
         motivo_recusa = serializer.validated_data.get('motivo_recusa')
 
-        if novo_status == 'APROVADA':
-            doacao.aprovar(request.user)
-            BadgeService.premiar_doacao_aprovada(doacao)
-            resultado = {'sucesso': True, 'mensagem': 'Doação aprovada com sucesso.'}
-        else:
-            doacao.recusar(request.user, motivo_recusa)
-            resultado = {'sucesso': True, 'mensagem': 'Doação recusada.'}
+        try:
+            if novo_status == 'APROVADA':
+                with transaction.atomic():
+                    doacao.aprovar(request.user)
+                    # Moedas e badges são creditadas pelo worker; a chave evita crédito em dobro
+                    enfileirar('doacoes.premiar_doacao', {'doacao_id': doacao.id}, chave=f'premiar-doacao:{doacao.id}')
+                resultado = {'sucesso': True, 'mensagem': 'Doação aprovada com sucesso.'}
+            else:
+                doacao.recusar(request.user, motivo_recusa)
+                resultado = {'sucesso': True, 'mensagem': 'Doação recusada.'}
+        except DoacaoJaValidada as erro:
+            if erro.status != novo_status:
+                raise DoacaoJaValidadaConflito()
+            # Mesma decisão repetida (clique duplo do moderador): nada muda
+            resultado = {'sucesso': True, 'mensagem': 'A doação já estava com esse status.'}
 
         return Response(resultado, status=status.HTTP_200_OK)
 
+@extend_schema(
+    tags=['Admin'], summary='Relatório de doações por dia e tipo',
+    parameters=[FiltroRelatorioSerializer], responses=RelatorioResumoSerializer,
+)
+class AdminRelatorioResumoView(generics.GenericAPIView):
+    """Envios, validações, moedas, latência de aprovação e doadores ativos, lidos dos resumos diários."""
+    serializer_class = RelatorioResumoSerializer
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        filtro = FiltroRelatorioSerializer(data=request.query_params)
+        filtro.is_valid(raise_exception=True)
+        dados = resumos.relatorio(
+            filtro.validated_data['desde'], filtro.validated_data['ate'],
+            filtro.validated_data.get('tipo_doacao'),
+        )
+        return Response(self.get_serializer(dados).data)
+
 # ============================================================================
 # BADGES
 # ============================================================================
 
-@extend_schema(tags=['Admin'])
-class AdminBadgeViewSet(viewsets.ModelViewSet):
+@extend_schema(tags=['Admin'], parameters=PARAMETROS_CAMPOS)
+class AdminBadgeViewSet(CamposEsparsosMixin, viewsets.ModelViewSet):
     queryset = Badge.objects.all()
     serializer_class = BadgeSerializer
     permission_classes = [IsAdminUser]
@@ -134,8 +291,16 @@ class AdminBadgeViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
-@extend_schema(tags=['Badges'])
-class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
+    def perform_create(self, serializer):
+        badge = serializer.save()
+        BadgeService.retroagir_se_configurado(badge)
+
+    def perform_update(self, serializer):
+        badge = serializer.save()
+        BadgeService.retroagir_se_configurado(badge)
+
+@extend_schema(tags=['Badges'], parameters=PARAMETROS_CAMPOS)
+class BadgeViewSet(CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Badge.objects.filter(ativo=True)
     serializer_class = BadgeSerializer
     permission_classes = [IsAuthenticated]
@@ -150,20 +315,25 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'], url_path='minhas')
     def minhas_badges(self, request):
         qs = UsuarioBadge.objects.filter(usuario=request.user).select_related('badge').order_by('-data_conquista')
-        ser = UsuarioBadgeSerializer(qs, many=True, context={'request': request})
+        if self.leitura_rapida_ativa(LeitorUsuarioBadges):
+            return Response(LeitorUsuarioBadges.listar(qs))
+        qs = self.podar_queryset(qs, serializer_class=UsuarioBadgeSerializer)
+        ser = UsuarioBadgeSerializer(qs, many=True, context={'request': request}, **self.selecao_campos())
         return Response(ser.data)
 
     @extend_schema(summary='Listar badges disponíveis para compra')
     @action(detail=False, methods=['get'], url_path='disponiveis')
     def disponiveis(self, request):
-        badges_usuario = UsuarioBadge.objects.filter(usuario=request.user).values_list('badge_id', flat=True)
-        qs = Badge.objects.filter(ativo=True, tipo='COMPRA').exclude(id__in=badges_usuario)
-        ser = BadgeSerializer(qs, many=True, context={'request': request})
+        possuidas = set(UsuarioBadge.objects.filter(usuario=request.user).values_list('badge_id', flat=True))
+        # Badges do catálogo em memória: por requisição só sai a consulta das possuídas
+        badges = [b for b in catalogo.badges('COMPRA') if b.id not in possuidas]
+        ser = BadgeSerializer(badges, many=True, context={'request': request}, **self.selecao_campos())
         return Response(ser.data)
 
     @extend_schema(
         summary='Comprar badge',
         request=ComprarBadgeSerializer,
+        parameters=[PARAMETRO_IDEMPOTENCIA],
         responses={200: {'type': 'object', 'properties': {
             'sucesso': {'type': 'boolean'},
             'mensagem': {'type': 'string'},
@@ -171,6 +341,7 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
         }}}
     )
     @action(detail=False, methods=['post'], url_path='comprar')
+    @idempotente('badges_comprar')
     def comprar(self, request):
         ser = ComprarBadgeSerializer(data=request.data)
         ser.is_valid(raise_exception=True)